@@ -1,11 +1,16 @@
 from fastapi import FastAPI, Request, status
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from src.routes import seller_routes
+from src.services.image_service import shutdown_executor
+from src.services.reservation_service import run_reservation_sweeper
+from src.services.lifecycle_service import run_lifecycle_scheduler
+from src.services.order_events_service import order_event_hub
+import asyncio
 from src.routes import auth_routes, product_routes, user_routes, cart_routes, order_routes, complaint_routes, contactus_routes, coupon_routes, reviewproduct_routes
+from src.routes import image_routes
 app = FastAPI()
 
 # CORS settings
@@ -17,6 +22,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
@@ -29,12 +35,8 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
-# Static files for uploaded images
-app.mount(
-    "/upload_images", StaticFiles(directory="uploaded_images"), name="upload_images"
-)
-
 # Include routers
+app.include_router(image_routes.router)
 app.include_router(auth_routes.router)
 app.include_router(product_routes.router)
 app.include_router(cart_routes.router)
@@ -45,6 +47,38 @@ app.include_router(contactus_routes.router)
 app.include_router(coupon_routes.router)
 app.include_router(reviewproduct_routes.router)
 app.include_router(seller_routes.router)
+
+
+@app.on_event("startup")
+async def start_reservation_sweeper():
+    app.state.reservation_sweeper = asyncio.create_task(run_reservation_sweeper())
+
+
+@app.on_event("startup")
+async def start_lifecycle_scheduler():
+    app.state.lifecycle_scheduler = asyncio.create_task(run_lifecycle_scheduler())
+
+
+@app.on_event("shutdown")
+async def shutdown_image_workers():
+    shutdown_executor()
+
+
+@app.on_event("shutdown")
+async def stop_reservation_sweeper():
+    app.state.reservation_sweeper.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_lifecycle_scheduler():
+    app.state.lifecycle_scheduler.cancel()
+
+
+@app.on_event("shutdown")
+async def stop_order_events():
+    order_event_hub.close()
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the E-commerce API"}
@@ -1,27 +1,58 @@
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import os
 import smtplib
 
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_TIMEOUT = int(os.getenv("SMTP_TIMEOUT", "30"))
+SENDER_EMAIL = os.getenv("SMTP_SENDER", "randrteamsmtp@gmail.com")
+SENDER_PASSWORD = os.getenv("SMTP_PASSWORD", "nbvs isya khzx tnjq")
+# "sink" records messages in SmtpSink instead of contacting a server (local runs, tests)
+SMTP_BACKEND = os.getenv("SMTP_BACKEND", "smtp")
+
+
+def build_message(email, subject, body):
+    message = MIMEMultipart()
+    message["From"] = SENDER_EMAIL
+    message["To"] = email
+    message["Subject"] = subject
+
+    message.attach(MIMEText(body, "plain"))
+    return message
+
+
+class SmtpSink:
+    """Stand-in SMTP connection that keeps every message it is given"""
+    messages = []
+
+    def sendmail(self, sender, to, message):
+        SmtpSink.messages.append({"from": sender, "to": to, "message": message})
+
+    def quit(self):
+        pass
+
+
+def open_connection():
+    """Open an authenticated SMTP connection"""
+    if SMTP_BACKEND == "sink":
+        return SmtpSink()
+    server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    server.starttls()
+    server.login(SENDER_EMAIL, SENDER_PASSWORD)
+    return server
+
+
 class Smtp:
     def __init__(self) -> None:
         pass
     def trigger_email(email,subject,body):
-        sender_email = "randrteamsmtp@gmail.com"  
-        sender_password = "nbvs isya khzx tnjq"  
-        
-
-        message = MIMEMultipart()
-        message["From"] = sender_email
-        message["To"] = email
-        message["Subject"] = subject
-
-        message.attach(MIMEText(body, "plain"))
+        """Send one message over a fresh connection; blocks, prefer the email outbox"""
+        message = build_message(email, subject, body)
 
         try:
-            server = smtplib.SMTP("smtp.gmail.com", 587)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, email, message.as_string())
+            server = open_connection()
+            server.sendmail(SENDER_EMAIL, email, message.as_string())
             server.quit()
             print(f"Registration email sent to {email}")
         except Exception as e:
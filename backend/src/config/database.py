@@ -3,6 +3,16 @@ from src.models.user import User
 
 client=motor.motor_asyncio.AsyncIOMotorClient('mongodb://localhost:27017/')
 database =client.RandR 
+
+
+def run_with_client(coro):
+    """
+    Run a standalone entrypoint (worker, migration) to completion. The index
+    calls below bind the client to the event loop current at import time,
+    so the coroutine must run on that loop rather than a new asyncio.run loop.
+    """
+    return client.get_io_loop().run_until_complete(coro)
+
 users = database.Users
 
 product_collection = database.ProductDetails
@@ -13,9 +23,58 @@ orders = database.Orders
 complaint_collection = database.Complaints
 coupon_collection = database.Coupons
 reviews_collection = database.Reviews
+image_blobs = database.ImageBlobs
+import_jobs = database.ImportJobs
+email_outbox = database.EmailOutbox
+email_campaigns = database.EmailCampaigns
+seller_sales_rollups = database.SellerSalesRollups
+seller_sales_summary = database.SellerSalesSummary
 
 # Add index for faster seller product queries
 product_collection.create_index([("seller_id", 1)])
+# Compound indexes backing the keyset-paginated buyer catalog
+product_collection.create_index([("status", 1), ("sold_at", 1), ("_id", -1)])
+product_collection.create_index(
+    [("status", 1), ("sold_at", 1), ("price", 1), ("_id", 1)]
+)
+# Text index for product search; the status prefix narrows every $text
+# query to the approved listings
+product_collection.create_index(
+    [("status", 1), ("product_name", "text"), ("description", "text")],
+    weights={"product_name": 3, "description": 1},
+    name="product_search_text",
+)
+# Supports category filters and facet counts in product search
+product_collection.create_index([("status", 1), ("category", 1), ("price", 1)])
+# Sparse index so the reservation sweeper only scans held items
+product_collection.create_index([("reserved_until", 1)], sparse=True)
+# One cart per buyer; add_to_cart upserts on email
+cart.create_index([("email", 1)], unique=True)
+# Finds the carts to reprice when a product's price changes
+cart.create_index([("products.productId", 1)])
+# Dispatcher polls for due messages; dedup keys are unique when present
+email_outbox.create_index([("status", 1), ("next_attempt_at", 1)])
+email_outbox.create_index(
+    [("dedup_key", 1)],
+    unique=True,
+    partialFilterExpression={"dedup_key": {"$type": "string"}},
+)
+email_campaigns.create_index([("status", 1), ("created_at", 1)])
+# Coupon codes are unique; redemption matches on code
+coupon_collection.create_index([("code", 1)], unique=True)
+# Seller dashboard reads one seller's daily rollups
+seller_sales_rollups.create_index([("seller_id", 1), ("day", 1)])
 # Add index for order queries
 orders.create_index([("items.product_id", 1)])
-orders.create_index([("status", 1)])
\ No newline at end of file
+# Seller-scoped order queries match on the stamped item seller
+orders.create_index([("items.seller_id", 1), ("order_date", -1)])
+orders.create_index([("status", 1)])
+# Buyer order history, newest first, keyset-paginated
+orders.create_index([("buyer_email", 1), ("order_date", -1), ("_id", -1)])
+# Lifecycle scheduler polls for orders whose next transition is due
+orders.create_index([("next_transition_at", 1)], sparse=True)
+# Scheduler re-drives orders whose rollups or restock were interrupted
+orders.create_index([("rollup_pending", 1)], sparse=True)
+orders.create_index([("restock_pending", 1)], sparse=True)
+# Garbage collection of unreferenced image blobs
+image_blobs.create_index([("refs", 1), ("released_at", 1)])
@@ -0,0 +1,73 @@
+"""
+Stamps seller_id and category onto the items of orders placed before
+order items carried them. Safe to re-run; only unstamped orders are read.
+
+    python -m src.migrations.backfill_order_sellers
+"""
+import logging
+import os
+from typing import List
+from pymongo import UpdateOne
+from src.config.database import orders, run_with_client
+from src.services.rollup_service import product_sellers
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "500"))
+
+UNSTAMPED = {"items": {"$elemMatch": {"seller_id": {"$exists": False}}}}
+
+
+def stamped_items(items: List[dict], products: dict) -> List[dict]:
+    stamped = []
+    for item in items:
+        if "seller_id" not in item:
+            product = products.get(item["product_id"], {})
+            item = {**item, "seller_id": product.get("seller_id"), "category": product.get("category")}
+        stamped.append(item)
+    return stamped
+
+
+async def backfill_batch(last_id=None, batch_size: int = BACKFILL_BATCH_SIZE):
+    """Stamp one batch of orders after last_id; returns (orders updated, last _id seen)"""
+    query = dict(UNSTAMPED)
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+    batch = await orders.find(query, {"items": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+    if not batch:
+        return 0, None
+
+    products = await product_sellers(list({
+        item["product_id"] for order in batch for item in order["items"] if "seller_id" not in item
+    }))
+    result = await orders.bulk_write(
+        [
+            UpdateOne(
+                {"_id": order["_id"], "items": order["items"]},
+                {"$set": {"items": stamped_items(order["items"], products)}},
+            )
+            for order in batch
+        ],
+        ordered=False,
+    )
+    return result.modified_count, batch[-1]["_id"]
+
+
+async def backfill_order_sellers(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    updated, last_id = 0, None
+    while True:
+        modified, last_id = await backfill_batch(last_id, batch_size)
+        if last_id is None:
+            break
+        updated += modified
+        logger.info(f"Stamped sellers on {updated} orders")
+    return updated
+
+
+def main():
+    return run_with_client(backfill_order_sellers())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Sets next_transition_at on in-flight orders created before the lifecycle
+scheduler, so it picks them up. Safe to re-run; only unscheduled orders
+are read.
+
+    python -m src.migrations.schedule_order_lifecycle
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from pymongo import UpdateOne
+from src.config.database import orders, run_with_client
+from src.services.order_services import LIFECYCLE_SCHEDULE, next_transition_time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "500"))
+
+UNSCHEDULED = {"status": {"$in": list(LIFECYCLE_SCHEDULE)}, "next_transition_at": {"$exists": False}}
+
+
+def flow_started_at(order: dict) -> datetime:
+    """
+    Start of the order's current flow in UTC: the latest return request for
+    orders being returned, otherwise the order date. Both are stored as
+    local ISO timestamps.
+    """
+    started = order["order_date"]
+    if order["status"].startswith("return_"):
+        for entry in reversed(order.get("tracking_history", [])):
+            if entry["status"] == "return_requested":
+                started = entry["timestamp"]
+                break
+    return datetime.fromisoformat(started).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def schedule_batch(last_id=None, batch_size: int = BACKFILL_BATCH_SIZE):
+    """Schedule one batch of orders after last_id; returns (orders updated, last _id seen)"""
+    query = dict(UNSCHEDULED)
+    if last_id is not None:
+        query["_id"] = {"$gt": last_id}
+    batch = await orders.find(
+        query, {"status": 1, "order_date": 1, "tracking_history": 1}
+    ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+    if not batch:
+        return 0, None
+
+    result = await orders.bulk_write(
+        [
+            UpdateOne(
+                {"_id": order["_id"], "status": order["status"], "next_transition_at": {"$exists": False}},
+                {"$set": {"next_transition_at": next_transition_time(order["status"], flow_started_at(order))}},
+            )
+            for order in batch
+        ],
+        ordered=False,
+    )
+    return result.modified_count, batch[-1]["_id"]
+
+
+async def schedule_order_lifecycle(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    updated, last_id = 0, None
+    while True:
+        modified, last_id = await schedule_batch(last_id, batch_size)
+        if last_id is None:
+            break
+        updated += modified
+        logger.info(f"Scheduled {updated} orders")
+    return updated
+
+
+def main():
+    return run_with_client(schedule_order_lifecycle())
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,9 @@ class OrderItem(BaseModel):
     quantity: int
     price: float
     images: List[str] = Field(default_factory=list)
+    # Stamped from the product at purchase time
+    seller_id: Optional[str] = None
+    category: Optional[str] = None
 
 class OrderModel(BaseModel):
     id: str = Field(default_factory=lambda: str(ObjectId()), alias="_id")
@@ -27,6 +30,8 @@ class OrderModel(BaseModel):
     tracking_history: List[TrackingHistory] = Field(default_factory=list)
     can_cancel: bool = Field(default=True)
     can_return: bool = Field(default=False)
+    # When the lifecycle scheduler next advances the order (UTC)
+    next_transition_at: Optional[datetime] = None
     
     class Config:
         allow_population_by_field_name = True
@@ -11,6 +11,8 @@ class ProductModel(BaseModel):
     seller_id: Optional[str] = None
     category: Optional[str] = None
     images: List[str] = Field(default_factory=list)
+    # Generated variants per uploaded image: original, thumb, medium, webp, ...
+    image_variants: List[dict] = Field(default_factory=list)
     status: str = "pending"  # "pending", "approved", "rejected", "resubmitted"
     admin_comments: Optional[str] = None
     reviewed_at: Optional[str] = None
@@ -4,6 +4,7 @@ from src.schemas.cart_schema import (
     UpdateCart,
     DeleteCartProduct,
     UpdatePaymentStatus,
+    StartCheckout,
     CartResponse
 )
 from src.services.cart_service import (
@@ -13,6 +14,7 @@ from src.services.cart_service import (
     delete_cart_product,
     clear_cart,
     get_cart_total,
+    start_checkout,
     update_payment_status
 )
 
@@ -48,6 +50,11 @@ async def get_cart_total_route(email: str = Query(...)):
     """Get total price of cart"""
     return await get_cart_total(email)
 
+@router.post("/cart/checkout/start")
+async def start_checkout_route(request: StartCheckout):
+    """Reserve the cart's items for the duration of checkout"""
+    return await start_checkout(request.email)
+
 @router.put("/cart/payment-status")
 async def update_payment_route(request: UpdatePaymentStatus):
     """Update payment status of cart"""
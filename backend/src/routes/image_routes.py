@@ -0,0 +1,72 @@
+import mimetypes
+import os
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from src.services.image_service import (
+    resolve_image_path,
+    negotiate_format,
+    image_etag,
+    etag_matches,
+    parse_range,
+    read_file_range,
+    is_content_addressed,
+    IMMUTABLE_CACHE_CONTROL,
+    LEGACY_CACHE_CONTROL,
+    NEGOTIABLE_EXTENSIONS,
+)
+
+router = APIRouter(prefix="/upload_images", tags=["images"])
+
+
+@router.api_route("/{filename:path}", methods=["GET", "HEAD"])
+async def serve_image(filename: str, request: Request):
+    """Serve a stored image with long-lived caching, ETags, ranges and WebP/AVIF negotiation"""
+    if not resolve_image_path(filename):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    served = negotiate_format(filename, request.headers.get("accept"))
+    path = resolve_image_path(served)
+    etag = await image_etag(served, path)
+
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL
+        if is_content_addressed(filename)
+        else LEGACY_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+    if os.path.splitext(filename)[1].lower() in NEGOTIABLE_EXTENSIONS:
+        headers["Vary"] = "Accept"
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    size = os.path.getsize(path)
+    media_type = mimetypes.guess_type(served)[0] or "application/octet-stream"
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if not if_range or if_range == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(
+        read_file_range(path, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type,
+    )
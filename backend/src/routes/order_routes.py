@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, Query
-from typing import List
-from src.schemas.order_schema import OrderCreateSchema, OrderUpdateSchema
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+import json
+from src.schemas.order_schema import OrderCreateSchema, OrderUpdateSchema, BulkCancelSchema
 from src.models.order import OrderModel
 from src.services.order_services import (
     create_order,
+    cancel_orders,
     get_user_orders,
+    get_user_orders_page,
     get_order_by_id,
     update_order_status,
+    ORDER_DEFAULT_PAGE_SIZE,
+    ORDER_MAX_PAGE_SIZE,
 )
-from src.config.auth_middleware import buyer_only
+from src.services.order_events_service import order_events
+from src.config.auth_middleware import buyer_only, admin_only
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
@@ -20,9 +27,23 @@ async def create_order_route(order_data: OrderCreateSchema):
 
 
 @router.get("/user", response_model=List[OrderModel])
-async def get_user_orders_route(email: str = Query(...)):
-    """Get all orders for a user"""
-    return await get_user_orders(email)
+async def get_user_orders_route(
+    response: Response,
+    email: str = Query(...),
+    limit: Optional[int] = Query(None, ge=1, le=ORDER_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = Query(False, description="Leave out tracking history"),
+):
+    """
+    Get a user's orders, newest first. With limit or cursor the result is
+    one page, and the cursor of the next page is sent in X-Next-Cursor.
+    """
+    if limit is None and cursor is None:
+        return await get_user_orders(email, summary)
+    page, next_cursor = await get_user_orders_page(email, limit or ORDER_DEFAULT_PAGE_SIZE, cursor, summary)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return page
 
 
 @router.get("/{order_id}", response_model=OrderModel)
@@ -31,7 +52,36 @@ async def get_order_route(order_id: str):
     return await get_order_by_id(order_id)
 
 
+@router.get("/{order_id}/events")
+async def order_events_route(order_id: str):
+    """
+    Server-Sent Events stream of an order's tracking state: an "order" event
+    with the current state, then one per change, with keepalive comments in
+    between. Use this instead of polling the order.
+    """
+    await get_order_by_id(order_id)
+
+    async def event_stream():
+        async for event in order_events(order_id):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: order\ndata: {json.dumps(event, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.put("/{order_id}/status", response_model=OrderModel)
 async def update_order_status_route(order_id: str, status_update: OrderUpdateSchema):
     """Update order status"""
     return await update_order_status(order_id, status_update.status)
+
+
+@router.post("/cancel", dependencies=[Depends(admin_only)])
+async def cancel_orders_route(request: BulkCancelSchema):
+    """Cancel several orders; those that can no longer be cancelled are skipped"""
+    return {"cancelled": await cancel_orders(request.order_ids)}
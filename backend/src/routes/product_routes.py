@@ -1,16 +1,26 @@
 from datetime import datetime
-from fastapi import APIRouter, Form, UploadFile, File, HTTPException, Depends, Body, BackgroundTasks
+from fastapi import APIRouter, Form, UploadFile, File, HTTPException, Depends, Body, BackgroundTasks, Query
 from typing import List, Optional
 from src.config.database import product_collection
 from src.services.product_service import (
-    upload_products,
+    bulk_upload_products,
     get_unapproved_products,
     update_product_status,
     get_approved_products,
+    get_catalog_page,
     update_product_info,
     get_seller_products,
     fetch_product_by_id,
     review_product,
+    invalidate_product_cache,
+    CATALOG_DEFAULT_PAGE_SIZE,
+    CATALOG_MAX_PAGE_SIZE,
+)
+from src.services.import_service import start_import, get_import_job
+from src.services.search_service import (
+    search_products,
+    SEARCH_DEFAULT_PAGE_SIZE,
+    SEARCH_MAX_PAGE_SIZE,
 )
 from src.services.category_service import (
     create_category,
@@ -24,8 +34,12 @@ from src.schemas.product_schema import (
     UpdateProductDetails,
     CategoryCreate,
     CategoryUpdate,
+    CatalogPage,
 )
-from src.config.auth_middleware import admin_only, get_current_user
+from src.services.cache_service import get_cache_stats
+from src.services.outbox_service import get_outbox_stats
+from src.services.image_service import collect_unreferenced_images
+from src.config.auth_middleware import admin_only, seller_only, get_current_user
 
 router = APIRouter()
 
@@ -40,39 +54,59 @@ async def upload_product(
     images: List[UploadFile] = File(...),
     background_tasks: BackgroundTasks = BackgroundTasks(),
 ):
-    products = []
+    """Bulk product submission; reports a result for every row"""
+    columns = [product_names, descriptions, prices, categories, seller_ids]
+    if len({len(column) for column in columns}) != 1:
+        raise HTTPException(
+            status_code=400, detail="All product fields must have the same number of entries"
+        )
+
     try:
-        image_index = 0
+        # Images are split evenly between products, in order
         images_per_product = len(images) // len(product_names)
-
+        rows = []
+        row_images = []
         for i, (product_name, description, price, category, seller_id) in enumerate(
             zip(product_names, descriptions, prices, categories, seller_ids)
         ):
-            # Get images for this product
-            product_images = images[image_index : image_index + images_per_product]
-            image_index += images_per_product
-
-            # Prepare product data
-            product_data = {
-                "product_name": product_name,
-                "description": description,
-                "price": float(price),
-                "category": category,
-                "seller_id": seller_id,
-            }
-
-            # Upload product
-            #product = await upload_products(product_data, product_images)
-            product = await upload_products(product_data, product_images, background_tasks)
-            products.append(product)
-
-        return {"products": products}
+            rows.append(
+                {
+                    "product_name": product_name,
+                    "description": description,
+                    "price": price,
+                    "category": category,
+                    "seller_id": seller_id,
+                }
+            )
+            row_images.append(
+                images[i * images_per_product : (i + 1) * images_per_product]
+            )
+
+        return await bulk_upload_products(rows, row_images, background_tasks)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in upload_product endpoint: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/products/import", response_description="Import a CSV/NDJSON catalog")
+async def import_products(
+    file: UploadFile = File(..., description="CSV or NDJSON with product_name, description, price, category, images"),
+    images: Optional[UploadFile] = File(None, description="Zip archive holding the images named in the file"),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
+    current_user: dict = Depends(seller_only),
+):
+    """Start a background catalog import; poll the returned job id for progress"""
+    return await start_import(current_user["business_name"], file, images, background_tasks)
+
+
+@router.get("/products/import/{job_id}", response_description="Catalog import progress")
+async def get_import_status(job_id: str, current_user: dict = Depends(seller_only)):
+    return await get_import_job(job_id, current_user["business_name"])
+
+
 # Existing seller products endpoint
 @router.get("/products/seller/{seller_id}", response_model=List[ProductModel])
 async def get_seller_products_endpoint(seller_id: str):
@@ -91,6 +125,32 @@ async def get_product():
     return await get_approved_products()
 
 
+@router.get("/products/catalog", response_model=CatalogPage)
+async def get_catalog(
+    limit: int = Query(CATALOG_DEFAULT_PAGE_SIZE, ge=1, le=CATALOG_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated fields to return"),
+    sort: str = Query("newest", description="newest, price_asc or price_desc"),
+):
+    """Paginated buyer catalog; pass next_cursor back as cursor for the next page"""
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    return await get_catalog_page(limit, cursor, field_list, sort)
+
+
+@router.get("/products/search", response_description="Search approved products")
+async def search_products_endpoint(
+    q: Optional[str] = Query(None, description="Text searched in name and description"),
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    seller_id: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(SEARCH_DEFAULT_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+):
+    """Search products with category and price facet counts"""
+    return await search_products(q, category, min_price, max_price, seller_id, page, limit)
+
+
 # Existing update product status endpoint
 @router.put("/products/{product_id}", response_model=ProductModel)
 async def update_product(product_id: str, isApproved: UpdateProductRequest):
@@ -123,6 +183,7 @@ async def resubmit_product(product_id: str, update_data: dict = Body(...),
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Product not found")
 
+        await invalidate_product_cache(product_id)
         updated_product = await product_collection.find_one({"_id": product_id})
         return ProductModel(**updated_product)
     except Exception as e:
@@ -139,6 +200,7 @@ async def update_product_details(
     category: Optional[str] = Form(None),
     existing_images: List[str] = Form(None),
     new_images: List[UploadFile] = File(None),
+    background_tasks: BackgroundTasks = BackgroundTasks(),
 ):
     product_data = {
         "product_name": product_name,
@@ -148,7 +210,9 @@ async def update_product_details(
         "images": existing_images if existing_images else [],
     }
 
-    updated_product = await update_product_info(productId, product_data, new_images)
+    updated_product = await update_product_info(
+        productId, product_data, new_images, background_tasks
+    )
     return updated_product
 
 
@@ -192,3 +256,22 @@ async def update_category_endpoint(category_id: str, name: str = Form(...)):
 async def delete_category_endpoint(category_id: str):
     """Delete a category"""
     return await delete_category(category_id)
+
+
+@router.get("/cache/stats", dependencies=[Depends(admin_only)])
+async def cache_stats():
+    """Hit and miss counters of the read caches"""
+    return get_cache_stats()
+
+
+@router.get("/outbox/stats", dependencies=[Depends(admin_only)])
+async def outbox_stats():
+    """Email outbox message counts by status"""
+    return await get_outbox_stats()
+
+
+@router.post("/images/gc", dependencies=[Depends(admin_only)])
+async def collect_images():
+    """Delete stored images no product references anymore"""
+    removed = await collect_unreferenced_images()
+    return {"removed": removed}
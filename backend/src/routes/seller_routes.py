@@ -1,9 +1,16 @@
 from fastapi import APIRouter, Depends
 from src.services.seller_service import get_seller_analytics
-from src.config.auth_middleware import seller_only
+from src.services.rollup_service import rebuild_rollups
+from src.config.auth_middleware import seller_only, admin_only
 
 router = APIRouter(tags=["seller"])
 
 @router.get("/seller/sales-data", dependencies=[Depends(seller_only)])
 async def get_sales_data(current_user: dict = Depends(seller_only)):
-    return await get_seller_analytics(current_user["business_name"])
\ No newline at end of file
+    return await get_seller_analytics(current_user["business_name"])
+
+
+@router.post("/seller/rollups/rebuild", dependencies=[Depends(admin_only)])
+async def rebuild_sales_rollups():
+    """Recompute seller sales rollups from the order history"""
+    return {"orders_replayed": await rebuild_rollups()}
@@ -21,6 +21,9 @@ class UpdatePaymentStatus(BaseModel):
     shipping_address: Optional[Dict] = None
     coupon_code: Optional[str] = None 
 
+class StartCheckout(BaseModel):
+    email: str
+
 class CartProduct(BaseModel):
     productId: str
     quantity: int
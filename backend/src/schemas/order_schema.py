@@ -7,6 +7,8 @@ class OrderItemSchema(BaseModel):
     quantity: int
     price: float
     images: List[str] = []
+    seller_id: Optional[str] = None
+    category: Optional[str] = None
 
 class TrackingUpdate(BaseModel):
     status: str
@@ -29,4 +31,7 @@ class OrderUpdateSchema(BaseModel):
     status: str = Field(
         ..., 
         description="Order status (placed, shipped, in_transit, delivered, cancelled, return_requested, returned)"
-    )
\ No newline at end of file
+    )
+
+class BulkCancelSchema(BaseModel):
+    order_ids: List[str] = Field(..., min_items=1, max_items=500)
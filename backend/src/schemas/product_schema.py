@@ -31,6 +31,11 @@ class UpdateProductDetails(BaseModel):
     images: Optional[List[str]] = None
 
 
+class CatalogPage(BaseModel):
+    products: List[dict]
+    next_cursor: Optional[str] = None
+
+
 class ProductReviewRequest(BaseModel):
     isApproved: bool
     admin_comments: str
@@ -2,7 +2,7 @@ from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from src.models.user import User
 from src.config.database import users  # Updated to use single collection
-from smtp import Smtp
+from src.services.outbox_service import enqueue_email
 from src.schemas.user_schema import (
     UserResponseModel,
     LoginResponse,
@@ -19,6 +19,8 @@ from bson import ObjectId
 import os
 from dotenv import load_dotenv
 from src.services.mfa_service import mfa_service
+from src.services.cache_service import principal_cache, MISSING
+from pymongo import ReturnDocument
 from src.schemas.user_schema import LoginResponse
 load_dotenv()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -39,13 +41,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
 
-    user = await users.find_one({"email": email})
-    if not user:
-        raise credentials_exception
+    user = await principal_cache.get(email)
+    if user is MISSING:
+        user = await users.find_one({"email": email}, {"password": 0})
+        if not user:
+            raise credentials_exception
+        await principal_cache.set(email, user)
 
     return user
 
 
+async def invalidate_principal(*emails: str):
+    """Drop cached principals so the next request re-reads the user"""
+    await principal_cache.invalidate(*[email for email in emails if email])
+
+
 async def get_user_profile(current_user: dict):
     response_data = {
         "email": current_user["email"],
@@ -87,7 +97,7 @@ async def create_user(register: User):
     register_data["role"] = "buyer"  # Set default role as buyer
     await users.insert_one(register_data)
 
-    Smtp.trigger_email(
+    await enqueue_email(
     register.email,
     "Welcome to Revive & Rewear – Happy Shopping!",
     f"""
@@ -207,7 +217,7 @@ async def generate_auth_code(password):
     random_number = str(random.randint(1000, 9999))
     response_data = {"code": random_number}
 
-    Smtp.trigger_email(
+    await enqueue_email(
         password.email, "Hello user ", f"Here is your auth code {random_number}"
     )
     return AuthCode(**response_data)
@@ -241,7 +251,7 @@ async def create_seller(register):
     register_data["role"] = "seller"  # Set role as seller
     await users.insert_one(register_data)
 
-    Smtp.trigger_email(
+    await enqueue_email(
     register.email,
     "Welcome to Revive & Rewear – Let’s Get Selling!",
     f"""
@@ -325,6 +335,8 @@ async def updateDetails(details):
     if update_result.modified_count == 0:
         raise HTTPException(status_code=400, detail="No changes were made")
 
+    await invalidate_principal(details.email)
+
     return {"message": "Details updated successfully"}
 
 
@@ -370,23 +382,32 @@ async def update_user_role_service(user_id: str, new_role: str):
     if new_role not in ["buyer", "seller", "admin"]:
         raise HTTPException(status_code=400, detail="Invalid role specified")
 
-    update_result = await users.update_one(
-        {"_id": ObjectId(user_id)}, {"$set": {"role": new_role}}
+    user = await users.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"role": new_role}},
+        projection={"email": 1},
+        return_document=ReturnDocument.AFTER,
     )
 
-    if update_result.modified_count == 0:
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    await invalidate_principal(user.get("email"))
+
     return {"message": f"User role updated to {new_role}"}
 
 
 async def delete_user_service(user_id: str):
     """Delete a user (admin only)"""
-    delete_result = await users.delete_one({"_id": ObjectId(user_id)})
+    user = await users.find_one_and_delete(
+        {"_id": ObjectId(user_id)}, projection={"email": 1}
+    )
 
-    if delete_result.deleted_count == 0:
+    if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    await invalidate_principal(user.get("email"))
+
     return {"message": "User deleted successfully"}
 
 
@@ -429,7 +450,7 @@ async def create_first_admin(register: RegisterModel):
     register_data = register.dict()
     register_data["role"] = "admin"
     await users.insert_one(register_data)
-    Smtp.trigger_email(
+    await enqueue_email(
     register.email,
     "Welcome to Revive & Rewear – Admin Access Granted!",
     f"""
@@ -486,6 +507,8 @@ async def bulk_update_users(user_ids: list, update_data: dict):
         result = await users.update_many(
             {"_id": {"$in": object_ids}}, {"$set": update_data}
         )
+        # Any of the updated users may be cached; drop them all
+        await principal_cache.clear()
         return {
             "modified_count": result.modified_count,
             "matched_count": result.matched_count,
@@ -0,0 +1,193 @@
+import os
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Upper bound, in seconds, on how long a buyer can see a stale listing when
+# an invalidation is missed (e.g. a write made by another API process)
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# Upper bound on how long a role change or deletion can go unnoticed by another process
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+# Coupon validation results, including "invalid", are reused for this long
+COUPON_CACHE_TTL = int(os.getenv("COUPON_CACHE_TTL", "10"))
+
+# Returned by Cache.get when a key is absent, since None is a cacheable value
+MISSING = object()
+
+
+class CacheBackend:
+    """Interface implemented by cache stores. Values must be treated as read-only."""
+
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix: str) -> None:
+        raise NotImplementedError
+
+    async def clear(self) -> None:
+        raise NotImplementedError
+
+
+class InMemoryCache(CacheBackend):
+    """Process-local LRU cache where each entry also expires after its TTL"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return MISSING
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (self.clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """Cache stored in Redis (or any server speaking the Redis protocol), shared by all API processes"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(key)
+        return MISSING if raw is None else pickle.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.client.set(key, pickle.dumps(value), ex=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*keys)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        keys = [key async for key in self.client.scan_iter(match=f"{prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def clear(self) -> None:
+        await self.delete_prefix("")
+
+
+class Cache:
+    """Namespaced view over a backend that keeps hit/miss counters"""
+
+    def __init__(self, backend: CacheBackend, namespace: str, default_ttl: int):
+        self.backend = backend
+        self.namespace = namespace
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Any:
+        try:
+            value = await self.backend.get(self._key(key))
+        except Exception as e:
+            print(f"Cache get failed for {key}: {e}")
+            value = MISSING
+        if value is MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        try:
+            await self.backend.set(self._key(key), value, ttl or self.default_ttl)
+        except Exception as e:
+            print(f"Cache set failed for {key}: {e}")
+
+    async def invalidate(self, *keys: str) -> None:
+        try:
+            await self.backend.delete(*[self._key(key) for key in keys])
+        except Exception as e:
+            print(f"Cache invalidation failed for {keys}: {e}")
+
+    async def invalidate_prefix(self, prefix: str) -> None:
+        try:
+            await self.backend.delete_prefix(self._key(prefix))
+        except Exception as e:
+            print(f"Cache invalidation failed for prefix {prefix}: {e}")
+
+    async def clear(self) -> None:
+        await self.backend.delete_prefix(f"{self.namespace}:")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_backend(name: str = CACHE_BACKEND) -> CacheBackend:
+    if name == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            print("redis package not installed, falling back to in-memory cache")
+            return InMemoryCache()
+        return RedisCache(redis.from_url(REDIS_URL))
+    return InMemoryCache()
+
+
+cache_backend = create_backend()
+
+# Product listings, single products and categories
+catalog_cache = Cache(cache_backend, "catalog", CATALOG_CACHE_TTL)
+
+# Authenticated users resolved from access tokens, keyed by token subject
+principal_cache = Cache(cache_backend, "principal", PRINCIPAL_CACHE_TTL)
+
+# Read-only coupon validation, keyed by code
+coupon_cache = Cache(cache_backend, "coupon", COUPON_CACHE_TTL)
+
+
+def get_cache_stats() -> dict:
+    return {
+        "catalog": catalog_cache.stats(),
+        "principal": principal_cache.stats(),
+        "coupon": coupon_cache.stats(),
+    }
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+from string import Template
+from typing import Optional
+import logging
+import os
+import uuid
+from pymongo import ReturnDocument
+from src.config.database import email_campaigns, users
+from src.services.outbox_service import enqueue_emails, outbox_message
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Buyers read and written to the outbox per checkpoint
+CAMPAIGN_CHUNK_SIZE = int(os.getenv("CAMPAIGN_CHUNK_SIZE", "500"))
+# A campaign whose runner died is picked up again after this long
+CAMPAIGN_LOCK_SECONDS = int(os.getenv("CAMPAIGN_LOCK_SECONDS", "300"))
+
+COUPON_SUBJECT = "Exclusive Offer from a Seller – Use Your Coupon Code!"
+
+# Compiled once; only the recipient's name changes per message
+COUPON_TEMPLATE = Template("""
+    Hi $first_name,
+
+    Great news! Your favorite seller is offering an exclusive coupon code just for you. Don’t miss out on this chance to snag your favorite preloved items at a discounted price.
+
+    **Your Coupon Details:**  
+    - **Code:** $code 
+    - **Discount:** $discount_percentage% off  
+    - **Valid Until:** $expiry_date
+
+    **How to Redeem:**  
+    1. Enter the coupon code at checkout.  
+    2. Enjoy your discounted purchase and feel great about shopping sustainably!
+
+    Don’t wait too long—this offer won’t last forever!
+
+    If you have any questions or need help, Use 'contact us' form to reach out to our friendly team.
+
+    Happy shopping,  
+    The Revive & Rewear Team  
+    "Where Style Meets Sustainability"  
+    """)
+
+
+async def create_coupon_campaign(coupon: dict) -> str:
+    """Record a coupon announcement to every buyer; the dispatcher worker fans it out"""
+    now = datetime.utcnow()
+    campaign_id = str(uuid.uuid4())
+    await email_campaigns.insert_one({
+        "_id": campaign_id,
+        "kind": "coupon",
+        "coupon": {
+            "code": coupon["code"],
+            "discount_percentage": coupon["discount_percentage"],
+            "expiry_date": str(coupon.get("expiry_date")),
+        },
+        "status": "pending",
+        "last_user_id": None,
+        "enqueued": 0,
+        "locked_until": None,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return campaign_id
+
+
+async def claim_campaign() -> Optional[dict]:
+    """Lock the oldest unfinished campaign that no other runner holds"""
+    now = datetime.utcnow()
+    return await email_campaigns.find_one_and_update(
+        {
+            "status": {"$in": ["pending", "running"]},
+            "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}],
+        },
+        {"$set": {
+            "status": "running",
+            "locked_until": now + timedelta(seconds=CAMPAIGN_LOCK_SECONDS),
+        }},
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def run_campaign_chunk(chunk_size: int = CAMPAIGN_CHUNK_SIZE) -> int:
+    """
+    Advance one campaign by one chunk of buyers, read with a keyset cursor
+    on _id after the last checkpoint. Messages carry a per-recipient dedup
+    key, so a chunk replayed after a crash does not email anyone twice.
+    Returns the number of messages written.
+    """
+    campaign = await claim_campaign()
+    if not campaign:
+        return 0
+
+    query = {"role": "buyer", "email": {"$type": "string"}}
+    if campaign["last_user_id"] is not None:
+        query["_id"] = {"$gt": campaign["last_user_id"]}
+    buyers = await users.find(query, {"email": 1, "first_name": 1}).sort("_id", 1).limit(chunk_size).to_list(chunk_size)
+
+    coupon = campaign["coupon"]
+    messages = [
+        outbox_message(
+            buyer["email"],
+            COUPON_SUBJECT,
+            COUPON_TEMPLATE.safe_substitute(coupon, first_name=buyer.get("first_name", "")),
+            dedup_key=f"coupon:{coupon['code']}:{buyer['email']}",
+        )
+        for buyer in buyers
+    ]
+    written = await enqueue_emails(messages)
+
+    update = {"locked_until": None, "updated_at": datetime.utcnow()}
+    if buyers:
+        update["last_user_id"] = buyers[-1]["_id"]
+    if len(buyers) < chunk_size:
+        update["status"] = "done"
+        logger.info(f"Campaign {campaign['_id']} finished")
+    await email_campaigns.update_one(
+        {"_id": campaign["_id"]}, {"$set": update, "$inc": {"enqueued": written}}
+    )
+    return written
+
+
+async def get_campaign(campaign_id: str) -> Optional[dict]:
+    return await email_campaigns.find_one({"_id": campaign_id})
@@ -1,15 +1,22 @@
 from fastapi import HTTPException
-from src.services.coupon_service import validate_coupon
-from src.config.database import cart, product_collection, users, coupon_collection
+from src.config.database import cart, product_collection, users
 from src.models.cart import Cart
 from src.schemas.cart_schema import UpdateCart, DeleteCartProduct, UpdatePaymentStatus
-from fastapi.encoders import jsonable_encoder
 from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
 from src.services.buyer_service import verify_buyer
 from datetime import datetime
 import logging
-from src.services.order_services import create_order
-from src.schemas.order_schema import OrderCreateSchema, OrderItemSchema
+from src.services.checkout_service import checkout
+from src.services.reservation_service import reserve_products, release_reservations
+from src.utils.cart_totals import (
+    CART_TOTALS_STAGE,
+    EMPTY_CART_TOTALS,
+    line_is_stale,
+    line_snapshot,
+    remove_line,
+    set_line_fields,
+)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -17,93 +24,134 @@ logger = logging.getLogger(__name__)
 
 
 async def add_to_cart(request: Cart):
-    """Add items to user's cart"""
+    """
+    Add items to user's cart in two round trips: one $in query validates
+    every product, then a single ordered bulk_write upserts the cart and
+    applies an atomic per-item $push/$inc, so concurrent adds never
+    overwrite each other. Each line keeps a snapshot of the product price
+    and the final step recomputes the cart's subtotal and item_count.
+    """
     try:
         await verify_buyer(request.email)
         logger.info(f"Adding items to cart for user: {request.email}")
 
+        quantities = {}
         for item in request.products:
-            product = await product_collection.find_one({"_id": item.productId})
+            quantities[item.productId] = quantities.get(item.productId, 0) + item.quantity
 
-            if not product:
-                raise HTTPException(status_code=404, detail=f"Product not found")
+        products = await product_collection.find(
+            {"_id": {"$in": list(quantities)}}, {"status": 1, "price": 1}
+        ).to_list(None)
+        statuses = {str(product["_id"]): product.get("status") for product in products}
+        prices = {str(product["_id"]): product.get("price", 0) for product in products}
 
-            if product.get("status") != "approved":
+        for product_id in quantities:
+            if product_id not in statuses:
+                raise HTTPException(status_code=404, detail=f"Product not found")
+            if statuses[product_id] != "approved":
                 raise HTTPException(
                     status_code=400, detail=f"Product is not approved for purchase"
                 )
 
-        existing_cart = await cart.find_one({"email": request.email})
-
-        if existing_cart:
-            logger.info(f"Updating existing cart for user: {request.email}")
-            updated_products = existing_cart.get("products", [])
-
-            for new_item in request.products:
-                product_found = False
-                for cart_item in updated_products:
-                    if cart_item["productId"] == new_item.productId:
-                        cart_item["quantity"] += new_item.quantity
-                        product_found = True
-                        break
-                if not product_found:
-                    updated_products.append(
-                        {"productId": new_item.productId, "quantity": new_item.quantity}
-                    )
-
-            await cart.update_one(
-                {"email": request.email}, {"$set": {"products": updated_products}}
+        operations = [
+            UpdateOne(
+                {"email": request.email},
+                {"$setOnInsert": {"products": [], "buyed": False}},
+                upsert=True,
             )
-        else:
-            logger.info(f"Creating new cart for user: {request.email}")
-            new_cart = {
-                "email": request.email,
-                "products": [
-                    {"productId": item.productId, "quantity": item.quantity}
-                    for item in request.products
-                ],
-                "buyed": False,
-            }
-            await cart.insert_one(new_cart)
+        ]
+        for product_id, quantity in quantities.items():
+            # Push a zero-quantity line only if absent, then increment it; any
+            # interleaving of concurrent adds leaves one line with the summed quantity
+            operations.append(UpdateOne(
+                {"email": request.email, "products.productId": {"$ne": product_id}},
+                {"$push": {"products": {
+                    "productId": product_id,
+                    "quantity": 0,
+                    "price": prices[product_id],
+                }}},
+            ))
+            operations.append(UpdateOne(
+                {"email": request.email, "products.productId": product_id},
+                {
+                    "$inc": {"products.$.quantity": quantity},
+                    "$set": {"products.$.price": prices[product_id]},
+                },
+            ))
+        operations.append(UpdateOne({"email": request.email}, [CART_TOTALS_STAGE]))
+        await cart.bulk_write(operations, ordered=True)
 
         return {"message": "Products added to cart successfully"}
 
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error in add_to_cart: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Product fields the cart page renders for each line
+CART_ITEM_FIELDS = ["product_name", "description", "price", "category", "images", "seller_id", "status"]
+
+
+def cart_view_pipeline(email: str) -> list:
+    """
+    Aggregation rooted at the user: checks the buyer role and joins the
+    cart lines to their products server side. Lines whose product is gone
+    are dropped; sold, unapproved or otherwise held items are flagged
+    with available: false.
+    """
+    product = {field: f"$product.{field}" for field in CART_ITEM_FIELDS}
+    held_by_other = {"$and": [
+        {"$ne": [{"$ifNull": ["$product.reserved_by", email]}, email]},
+        {"$gt": ["$product.reserved_until", "$$NOW"]},
+    ]}
+    return [
+        {"$match": {"email": email}},
+        {"$project": {"_id": 0, "role": 1}},
+        {"$lookup": {
+            "from": cart.name,
+            "pipeline": [
+                {"$match": {"email": email}},
+                {"$unwind": "$products"},
+                {"$lookup": {
+                    "from": product_collection.name,
+                    "localField": "products.productId",
+                    "foreignField": "_id",
+                    "as": "product",
+                }},
+                {"$unwind": "$product"},
+                {"$replaceWith": {
+                    "_id": {"$toString": "$product._id"},
+                    **product,
+                    "quantity": "$products.quantity",
+                    "available": {"$and": [
+                        {"$eq": ["$product.status", "approved"]},
+                        {"$eq": [{"$ifNull": ["$product.sold_at", None]}, None]},
+                        {"$not": [held_by_other]},
+                    ]},
+                }},
+            ],
+            "as": "items",
+        }},
+    ]
+
+
 async def fetch_cart_items(email: str):
-    """Fetch cart items with product details"""
+    """Fetch cart items with product details in a single aggregation"""
     try:
-        await verify_buyer(email)
         logger.info(f"Fetching cart items for user: {email}")
 
-        user_cart = await cart.find_one({"email": email})
-
-        if not user_cart or not user_cart.get("products"):
-            return []
-
-        product_ids = [item["productId"] for item in user_cart["products"]]
-        all_products = await product_collection.find(
-            {"_id": {"$in": product_ids}}
-        ).to_list(None)
-
-        quantity_map = {
-            item["productId"]: item["quantity"] for item in user_cart["products"]
-        }
-
-        matched_products = []
-        for product in all_products:
-            product_id_str = str(product["_id"])
-            if product_id_str in quantity_map:
-                product_copy = dict(product)
-                product_copy["_id"] = product_id_str
-                product_copy["quantity"] = quantity_map[product_id_str]
-                matched_products.append(product_copy)
+        result = await users.aggregate(cart_view_pipeline(email)).to_list(1)
+        if not result or result[0].get("role") != "buyer":
+            raise HTTPException(
+                status_code=403, detail="Only buyers can perform this action"
+            )
 
-        return jsonable_encoder(matched_products)
+        return result[0]["items"]
 
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error in fetch_cart_items: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -116,7 +164,7 @@ async def update_cart_quantity(request: UpdateCart):
 
         result = await cart.update_one(
             {"email": request.email, "products.productId": request.id},
-            {"$set": {"products.$.quantity": request.quantity}},
+            [set_line_fields(request.id, {"quantity": request.quantity}), CART_TOTALS_STAGE],
         )
 
         if result.modified_count == 0:
@@ -134,13 +182,14 @@ async def delete_cart_product(request: DeleteCartProduct):
         await verify_buyer(request.email)
 
         result = await cart.update_one(
-            {"email": request.email},
-            {"$pull": {"products": {"productId": request.productId}}},
+            {"email": request.email, "products.productId": request.productId},
+            [remove_line(request.productId), CART_TOTALS_STAGE],
         )
 
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Product not found in cart")
 
+        await release_reservations(request.email, [request.productId])
         return {"message": "Product removed from cart successfully"}
     except Exception as e:
         logger.error(f"Error in delete_cart_product: {str(e)}")
@@ -158,6 +207,7 @@ async def clear_cart(email: str):
             {
                 "$set": {
                     "products": [],
+                    **EMPTY_CART_TOTALS,
                     "buyed": True,
                     "purchased_at": str(datetime.utcnow()),
                 }
@@ -167,125 +217,99 @@ async def clear_cart(email: str):
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Cart not found")
 
+        await release_reservations(email)
         return {"message": "Cart cleared successfully"}
     except Exception as e:
         logger.error(f"Error in clear_cart: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Product fields a cart line's snapshot is taken from
+CART_LINE_PRODUCT_FIELDS = {"price": 1, "status": 1, "sold_at": 1}
+
+
+async def cart_line_products(product_ids: list) -> dict:
+    products = await product_collection.find(
+        {"_id": {"$in": product_ids}}, CART_LINE_PRODUCT_FIELDS
+    ).to_list(None)
+    return {str(product["_id"]): product for product in products}
+
+
+async def reprice_cart(email: str, products: dict = None):
+    """
+    Snapshot current prices and availability onto every line of a cart and
+    recompute its totals, so deleted or sold products drop out of the subtotal
+    """
+    user_cart = await cart.find_one({"email": email}, {"products.productId": 1})
+    if not user_cart:
+        return None
+    product_ids = [item["productId"] for item in user_cart.get("products", [])]
+    if products is None:
+        products = await cart_line_products(product_ids)
+    stages = [
+        set_line_fields(product_id, line_snapshot(products.get(product_id)))
+        for product_id in product_ids
+    ]
+    return await cart.find_one_and_update(
+        {"email": email},
+        stages + [CART_TOTALS_STAGE],
+        projection={"subtotal": 1, "item_count": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
 async def get_cart_total(email: str):
-    """Calculate total price of cart items"""
+    """
+    Read the cart's running subtotal. One $in query checks the line
+    snapshots against their products; carts written before totals were
+    tracked, or holding a product that was deleted, sold or repriced since,
+    are repriced first.
+    """
     try:
-        items = await fetch_cart_items(email)
-        total = sum(item.get("price", 0) * item.get("quantity", 1) for item in items)
-        return {"total": total}
+        await verify_buyer(email)
+        totals = await cart.find_one(
+            {"email": email},
+            {"subtotal": 1, "item_count": 1, "products.productId": 1, "products.price": 1, "products.available": 1},
+        )
+        if not totals:
+            return {"total": 0, "item_count": 0}
+        lines = totals.get("products", [])
+        products = await cart_line_products([line["productId"] for line in lines])
+        if "subtotal" not in totals or any(
+            line_is_stale(line, products.get(line["productId"])) for line in lines
+        ):
+            totals = await reprice_cart(email, products)
+        if not totals:
+            return {"total": 0, "item_count": 0}
+        return {"total": totals["subtotal"], "item_count": totals["item_count"]}
+    except HTTPException as he:
+        raise he
     except Exception as e:
         logger.error(f"Error calculating cart total: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def update_payment_status(request: UpdatePaymentStatus):
+async def start_checkout(email: str):
+    """Hold every item in the buyer's cart while they complete payment"""
     try:
-        await verify_buyer(request.email)
-        logger.info(f"Updating payment status for user: {request.email}")
-
-        # Find the user's cart
-        user_cart = await cart.find_one({"email": request.email})
-        if not user_cart:
-            logger.error(f"Cart not found for user: {request.email}")
-            raise HTTPException(status_code=404, detail="Cart not found")
-
-        # Fetch full cart items with product details
-        cart_items = await fetch_cart_items(request.email)
-        total_amount = sum(
-            item.get("price", 0) * item.get("quantity", 1) for item in cart_items
-        )
-
-        # Update product statuses first
-        for item in cart_items:
-            await product_collection.update_one(
-                {"_id": item["_id"]},
-                {
-                    "$set": {
-                        "status": "sold",
-                        "buyer_email": request.email,
-                        "sold_at": datetime.utcnow().isoformat(),
-                    }
-                },
-            )
-
-        # Update the payment status and clear cart
-        result = await cart.update_one(
-            {"email": request.email},
-            {
-                "$set": {
-                    "products": [],  # Clear cart
-                    "buyed": request.buyed,
-                    "purchased_at": datetime.utcnow().isoformat(),
-                }
-            },
-        )
-
-        if result.modified_count == 0:
-            logger.error(f"Failed to update payment status for user: {request.email}")
-            raise HTTPException(
-                status_code=500, detail="Failed to update payment status"
-            )
-        # Apply coupon if provided
-        applied_discount = 0
-        if request.coupon_code:
-            coupon = await validate_coupon(request.coupon_code)
-            if coupon:
-                applied_discount = (total_amount * coupon['discount_percentage']) / 100
-                total_amount -= applied_discount
-                print("Applied discount:", applied_discount)
-                # Update coupon usage
-                await coupon_collection.update_one(
-                    {"code": request.coupon_code},
-                    {"$inc": {"used_count": 1}}
-                )
-
-        # Create order with applied discount
-        # If payment is successful, create order
-        if request.buyed:
-            # Get user address and payment method
-            user = await users.find_one({"email": request.email})
-            shipping_address = request.shipping_address
-            """shipping_address = {
-                "name": f"{user['first_name']} {user['last_name']}",
-                "address": user.get("address", ""),
-                "postal_code": user.get("postal_code", ""),
-            }"""
-
-            # Create order items from cart items
-            order_items = [
-                OrderItemSchema(
-                    product_id=str(item["_id"]),
-                    product_name=item["product_name"],
-                    quantity=item["quantity"],
-                    price=float(item["price"]),
-                    images=item.get("images", [])
-                    if isinstance(item.get("images"), list)
-                    else [item.get("image")]
-                    if item.get("image")
-                    else [],
-                )
-                for item in cart_items
-            ]
-
-            # Create order
-            order_data = OrderCreateSchema(
-                buyer_email=request.email,
-                items=order_items,
-                total_amount=total_amount,
-                shipping_address=shipping_address,
-                payment_method=request.payment_method,
-            )
-
-            await create_order(order_data)
+        await verify_buyer(email)
+        user_cart = await cart.find_one({"email": email}, {"products.productId": 1})
+        if not user_cart or not user_cart.get("products"):
+            raise HTTPException(status_code=404, detail="Cart is empty")
 
-        logger.info(f"Successfully updated payment status for user: {request.email}")
-        return {"message": "Payment status updated successfully"}
+        product_ids = [item["productId"] for item in user_cart["products"]]
+        reserved_until = await reserve_products(email, product_ids)
+        logger.info(f"Reserved {len(product_ids)} products for user: {email}")
+        return {"product_ids": product_ids, "reserved_until": reserved_until.isoformat()}
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        logger.error(f"Error in start_checkout: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
+async def update_payment_status(request: UpdatePaymentStatus):
+    """Complete checkout for the buyer's cart"""
+    try:
+        return await checkout(request)
     except HTTPException as he:
         raise he
     except Exception as e:
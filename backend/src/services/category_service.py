@@ -1,6 +1,7 @@
 from fastapi import HTTPException
 from bson import ObjectId
 from src.config.database import category
+from src.services.cache_service import catalog_cache, MISSING
 
 
 async def create_category(category_data):
@@ -13,6 +14,7 @@ async def create_category(category_data):
     new_category = {"name": category_data.name}
 
     result = await category.insert_one(new_category)
+    await catalog_cache.invalidate("categories")
 
     # Fetch and return the created category
     created_category = await category.find_one({"_id": result.inserted_id})
@@ -22,11 +24,16 @@ async def create_category(category_data):
 
 async def get_all_categories():
     """Get all categories"""
+    cached = await catalog_cache.get("categories")
+    if cached is not MISSING:
+        return cached
+
     categories = []
     cursor = category.find({})
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
         categories.append(doc)
+    await catalog_cache.set("categories", categories)
     return categories
 
 
@@ -42,6 +49,7 @@ async def update_category(category_id: str, category_update):
         await category.update_one(
             {"_id": ObjectId(category_id)}, {"$set": {"name": category_update.name}}
         )
+        await catalog_cache.invalidate("categories")
 
         # Fetch and return updated category
         updated_category = await category.find_one({"_id": ObjectId(category_id)})
@@ -62,6 +70,7 @@ async def delete_category(category_id: str):
 
         # Delete the category
         await category.delete_one({"_id": ObjectId(category_id)})
+        await catalog_cache.invalidate("categories")
         return {"message": "Category deleted successfully"}
 
     except Exception as e:
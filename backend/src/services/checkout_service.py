@@ -0,0 +1,175 @@
+from fastapi import HTTPException
+from datetime import datetime
+import logging
+import os
+from pymongo.errors import PyMongoError
+from src.config.database import client, cart, product_collection, orders
+from src.schemas.cart_schema import UpdatePaymentStatus
+from src.schemas.order_schema import OrderCreateSchema, OrderItemSchema
+from src.services.buyer_service import verify_buyer
+from src.services.coupon_service import redeem_coupon
+from src.services.order_services import build_order, send_order_status_email
+from src.services.product_service import invalidate_product_cache
+from src.services.rollup_service import apply_pending_rollups, ROLLUP_PENDING
+from src.services.reservation_service import claimable_filter, RESERVATION_FIELDS
+from src.utils.cart_totals import EMPTY_CART_TOTALS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fields of a product needed to price the cart and build order items
+CHECKOUT_PRODUCT_FIELDS = {
+    "product_name": 1, "price": 1, "images": 1, "image": 1, "seller_id": 1, "category": 1
+}
+
+# Attempts made when MongoDB reports a transient transaction error, and
+# commits retried when it cannot tell whether a commit applied
+CHECKOUT_TRANSACTION_ATTEMPTS = int(os.getenv("CHECKOUT_TRANSACTION_ATTEMPTS", "5"))
+
+
+def _order_item(product: dict, quantity: int) -> OrderItemSchema:
+    images = product.get("images")
+    if not isinstance(images, list):
+        images = [product["image"]] if product.get("image") else []
+    return OrderItemSchema(
+        product_id=str(product["_id"]),
+        product_name=product["product_name"],
+        quantity=quantity,
+        price=float(product["price"]),
+        images=images,
+        seller_id=product.get("seller_id"),
+        category=product.get("category"),
+    )
+
+
+async def _checkout_transaction(request: UpdatePaymentStatus, session):
+    """All checkout reads and writes; runs inside one multi-document transaction"""
+    user_cart = await cart.find_one({"email": request.email}, session=session)
+    if not user_cart:
+        logger.error(f"Cart not found for user: {request.email}")
+        raise HTTPException(status_code=404, detail="Cart not found")
+
+    quantities = {
+        item["productId"]: item["quantity"] for item in user_cart.get("products", [])
+    }
+    products = await product_collection.find(
+        {"_id": {"$in": list(quantities)}}, CHECKOUT_PRODUCT_FIELDS, session=session
+    ).to_list(None)
+
+    total_amount = sum(
+        product.get("price", 0) * quantities[str(product["_id"])] for product in products
+    )
+    product_ids = [str(product["_id"]) for product in products]
+
+    order = None
+    if request.buyed:
+        # Validate the order before anything is written
+        order = build_order(
+            OrderCreateSchema(
+                buyer_email=request.email,
+                items=[
+                    _order_item(product, quantities[str(product["_id"])])
+                    for product in products
+                ],
+                total_amount=total_amount,
+                shipping_address=request.shipping_address,
+                payment_method=request.payment_method,
+            )
+        )
+
+    now = datetime.utcnow()
+    if product_ids:
+        # Only items still free or held by this buyer may be sold; anything
+        # else was taken by a concurrent checkout and aborts the transaction
+        result = await product_collection.update_many(
+            claimable_filter(product_ids, request.email, now),
+            {"$set": {
+                "status": "sold",
+                "buyer_email": request.email,
+                "sold_at": now.isoformat(),
+            }, "$unset": RESERVATION_FIELDS},
+            session=session,
+        )
+        if result.modified_count != len(product_ids):
+            logger.info(f"Checkout conflict for user: {request.email}")
+            raise HTTPException(
+                status_code=409, detail="Some products in your cart are no longer available"
+            )
+
+    result = await cart.update_one(
+        {"email": request.email},
+        {"$set": {
+            "products": [],
+            **EMPTY_CART_TOTALS,
+            "buyed": request.buyed,
+            "purchased_at": now.isoformat(),
+        }},
+        session=session,
+    )
+    if result.modified_count == 0:
+        logger.error(f"Failed to update payment status for user: {request.email}")
+        raise HTTPException(status_code=500, detail="Failed to update payment status")
+
+    # Apply coupon if provided; claiming the use is part of the transaction
+    if request.coupon_code:
+        coupon = await redeem_coupon(request.coupon_code, session=session)
+        if coupon:
+            applied_discount = (total_amount * coupon["discount_percentage"]) / 100
+            total_amount -= applied_discount
+            logger.info(f"Applied discount: {applied_discount}")
+
+    if order is not None:
+        order.total_amount = total_amount
+        # Its sales reach the seller rollups once the transaction committed
+        await orders.insert_one({**order.dict(by_alias=True), **ROLLUP_PENDING}, session=session)
+        # The confirmation is committed with the order
+        await send_order_status_email(order, "placed", session=session)
+
+    return product_ids, order
+
+
+async def _commit(session):
+    """Commit the session's transaction, retrying while its outcome is unknown"""
+    for attempt in range(1, CHECKOUT_TRANSACTION_ATTEMPTS + 1):
+        try:
+            await session.commit_transaction()
+            return
+        except PyMongoError as e:
+            if not e.has_error_label("UnknownTransactionCommitResult") or attempt == CHECKOUT_TRANSACTION_ATTEMPTS:
+                raise
+            logger.warning(f"Retrying checkout commit after unknown result: {e}")
+
+
+async def checkout(request: UpdatePaymentStatus):
+    """
+    Complete a purchase atomically: mark the cart's products sold, clear the
+    cart, count the coupon use and create the order in one transaction, so a
+    failure midway leaves nothing half-applied.
+    """
+    await verify_buyer(request.email)
+    logger.info(f"Updating payment status for user: {request.email}")
+
+    async with await client.start_session() as session:
+        for attempt in range(1, CHECKOUT_TRANSACTION_ATTEMPTS + 1):
+            try:
+                async with session.start_transaction():
+                    product_ids, order = await _checkout_transaction(request, session)
+                    await _commit(session)
+                break
+            except PyMongoError as e:
+                transient = e.has_error_label("TransientTransactionError")
+                if not transient or attempt == CHECKOUT_TRANSACTION_ATTEMPTS:
+                    raise
+                logger.warning(f"Retrying checkout for {request.email} after transient error: {e}")
+
+    # Side effects only after the transaction committed
+    await invalidate_product_cache(*product_ids)
+    if order is not None:
+        try:
+            await apply_pending_rollups([order.id])
+        except Exception as e:
+            # The order stays marked and the lifecycle scheduler applies it later
+            logger.error(f"Error updating seller rollups for order {order.id}: {str(e)}")
+
+    logger.info(f"Successfully updated payment status for user: {request.email}")
+    return {"message": "Payment status updated successfully"}
@@ -1,18 +1,11 @@
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from src.config.database import complaint_collection, users
 from src.schemas.complaint_schema import ComplaintCreate
 from fastapi import HTTPException, BackgroundTasks
 from typing import Optional
 from bson import ObjectId
-from smtp import Smtp 
+from src.services.outbox_service import enqueue_email
 from src.config.database import orders
 
-# Async wrapper for sending emails
-async def send_email_async(to_email, subject, body):
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as pool:
-        await loop.run_in_executor(pool, lambda: Smtp.trigger_email(to_email, subject, body))
 
 async def create_complaint(complaint_data: dict, background_tasks: BackgroundTasks):
     """
@@ -93,7 +86,7 @@ async def create_complaint(complaint_data: dict, background_tasks: BackgroundTas
         for admin in admin_users:
             email = admin.get("email")
             if email:
-                background_tasks.add_task(send_email_async, email, subject, body)
+                await enqueue_email(email, subject, body)
 
         return {
             "success": True,
@@ -177,7 +170,7 @@ Description: {complaint['details']}
             email_content += f"Resolution: {resolution}\n\nThank you for your patience.\n\nRegards,\nRevive & Rewear Team"
 
             # Send the email
-            background_tasks.add_task(send_email_async, complaint["email"], "Complaint Resolved", email_content)
+            await enqueue_email(complaint["email"], "Complaint Resolved", email_content)
 
             # Transform complaint into a response-friendly format
             complaint["id"] = str(complaint["_id"])
@@ -1,18 +1,6 @@
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from fastapi import HTTPException, BackgroundTasks
 from src.config.database import users, complaint_collection
-from smtp import Smtp
-
-
-# Async wrapper for sending emails
-async def send_email_async(to_email, subject, body):
-    """
-    Async wrapper for sending emails using SMTP.
-    """
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as pool:
-        await loop.run_in_executor(pool, lambda: Smtp.trigger_email(to_email, subject, body))
+from src.services.outbox_service import enqueue_email
 
 
 async def handle_contact_us_service(contact_data: dict, background_tasks: BackgroundTasks):
@@ -65,7 +53,7 @@ async def handle_contact_us_service(contact_data: dict, background_tasks: Backgr
         Regards,
         Support Team
         """
-        background_tasks.add_task(send_email_async, email, user_subject, user_body)
+        await enqueue_email(email, user_subject, user_body)
 
         # Notify admin users via email
         admin_users = await users.find({"role": "admin"}).to_list(100)
@@ -90,7 +78,7 @@ async def handle_contact_us_service(contact_data: dict, background_tasks: Backgr
         for admin in admin_users:
             admin_email = admin.get("email")
             if admin_email:
-                background_tasks.add_task(send_email_async, admin_email, admin_subject, admin_body)
+                await enqueue_email(admin_email, admin_subject, admin_body)
 
         # Return a success response
         return {
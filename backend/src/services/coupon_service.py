@@ -1,6 +1,10 @@
 from src.config.database import database
 from datetime import datetime
-from smtp import Smtp
+from src.services.outbox_service import enqueue_email
+from src.services.campaign_service import create_coupon_campaign
+from src.services.cache_service import coupon_cache, MISSING
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from fastapi import HTTPException, BackgroundTasks
 from bson import ObjectId
 
@@ -29,76 +33,75 @@ async def create_coupon(coupon_data: dict, seller_id: str, background_tasks: Bac
             "used_count": 0
         }
 
-        result = await coupon_collection.insert_one(coupon_doc)
+        try:
+            result = await coupon_collection.insert_one(coupon_doc)
+        except DuplicateKeyError:
+            return JSONResponse(
+                status_code=400,
+                content={"detail": "Coupon code already exists", "error": True}
+            )
+        await coupon_cache.invalidate(coupon_data["code"])
         
         # Send email notification
         seller = await database.Users.find_one({"business_name": seller_id})
         if seller and seller.get("email"):
-            background_tasks.add_task(
-                Smtp.trigger_email,
+            await enqueue_email(
                 seller["email"],
                 "Coupon Code Created",
                 f"Your coupon {coupon_data['code']} ({coupon_data['discount_percentage']}% discount) has been created."
             )
-        # Send notification to all admins
-        buyers = users.find({"role": "buyer"})
-        async for current_buyer  in buyers:
-                if current_buyer and current_buyer.get("email"):
-                    background_tasks.add_task(
-                        Smtp.trigger_email,
-                        current_buyer["email"],
-                        "Exclusive Offer from a Seller – Use Your Coupon Code!",
-                        f"""
-    Hi {current_buyer['first_name']},
-
-    Great news! Your favorite seller is offering an exclusive coupon code just for you. Don’t miss out on this chance to snag your favorite preloved items at a discounted price.
-
-    **Your Coupon Details:**  
-    - **Code:** {coupon_data['code']} 
-    - **Discount:** {coupon_data['discount_percentage']}% off  
-    - **Valid Until:** {coupon_data['expiry_date']}
-
-    **How to Redeem:**  
-    1. Enter the coupon code at checkout.  
-    2. Enjoy your discounted purchase and feel great about shopping sustainably!
-
-    Don’t wait too long—this offer won’t last forever!
-
-    If you have any questions or need help, Use 'contact us' form to reach out to our friendly team.
+        # Announce to all buyers; the dispatcher worker fans this out
+        campaign_id = await create_coupon_campaign(coupon_doc)
 
-    Happy shopping,  
-    The Revive & Rewear Team  
-    "Where Style Meets Sustainability"  
-    """
-                    )
-        
-
-        return {"success": True, "coupon_id": str(result.inserted_id)}
+        return {"success": True, "coupon_id": str(result.inserted_id), "campaign_id": campaign_id}
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def redeemable_filter(code: str, now: datetime) -> dict:
+    """Active, unexpired coupons with uses left; max_uses of None or 0 means unlimited"""
+    return {
+        "code": code,
+        "is_active": True,
+        "$and": [
+            {"$or": [{"expiry_date": None}, {"expiry_date": {"$gt": now}}]},
+            {"$or": [
+                {"max_uses": {"$in": [None, 0]}},
+                {"$expr": {"$lt": ["$used_count", "$max_uses"]}},
+            ]},
+        ],
+    }
+
+
 async def validate_coupon(code: str):
-    coupon = await coupon_collection.find_one({"code": code})
-    
-    if not coupon:
-        return None
-        
-    if not coupon["is_active"]:
-        return None
-        
-    if coupon["expiry_date"] and datetime.now() > coupon["expiry_date"]:
-        await coupon_collection.update_one(
-            {"_id": coupon["_id"]},
-            {"$set": {"is_active": False}}
-        )
-        return None
-        
-    if coupon["max_uses"] and coupon["used_count"] >= coupon["max_uses"]:
-        await coupon_collection.update_one(
-            {"_id": coupon["_id"]},
-            {"$set": {"is_active": False}}
+    """Read-only check whether a coupon can currently be used; results are briefly cached"""
+    coupon = await coupon_cache.get(code)
+    if coupon is MISSING:
+        coupon = await coupon_collection.find_one(
+            redeemable_filter(code, datetime.now()),
+            {"_id": 0, "code": 1, "discount_percentage": 1, "expiry_date": 1},
         )
+        await coupon_cache.set(code, coupon)
+
+    # A cached coupon may have expired since it was stored
+    if coupon and coupon.get("expiry_date") and datetime.now() > coupon["expiry_date"]:
         return None
-        
-    return coupon
\ No newline at end of file
+    return coupon
+
+
+async def redeem_coupon(code: str, session=None):
+    """
+    Claim one use of a coupon. The check and the used_count increment are
+    a single conditional update, so concurrent checkouts cannot go past
+    max_uses. Returns the coupon, or None if it cannot be redeemed.
+    """
+    coupon = await coupon_collection.find_one_and_update(
+        redeemable_filter(code, datetime.now()),
+        {"$inc": {"used_count": 1}},
+        projection={"code": 1, "discount_percentage": 1, "used_count": 1, "max_uses": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if coupon and coupon.get("max_uses") and coupon["used_count"] >= coupon["max_uses"]:
+        await coupon_cache.invalidate(code)
+    return coupon
@@ -0,0 +1,492 @@
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from uuid import uuid4
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from src.config.database import image_blobs
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional; without it no variants are generated
+    Image = None
+
+load_dotenv()
+
+UPLOAD_DIRECTORY = "./uploaded_images"
+
+# Longest edge, in pixels, of each resized variant
+IMAGE_VARIANTS = {"thumb": 240, "medium": 720}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+# Uploads are read and written this many bytes at a time, which bounds the
+# memory held per upload
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(10 * 1024 * 1024)))
+
+# Uploads land here before being moved to their content address
+INCOMING_DIRECTORY = os.path.join(UPLOAD_DIRECTORY, "incoming")
+# Unreferenced blobs are only deleted after this long, so a concurrent
+# re-upload of the same content can still claim them
+BLOB_GC_GRACE_MINUTES = int(os.getenv("BLOB_GC_GRACE_MINUTES", "60"))
+# A blob being collected is held this long; an upload of the same content
+# waits for the collection, or takes over a claim left by a collector that died
+BLOB_COLLECT_LEASE_SECONDS = int(os.getenv("BLOB_COLLECT_LEASE_SECONDS", "60"))
+BLOB_COLLECT_WAIT_SECONDS = 0.1
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def stream_upload_to_file(
+    upload: UploadFile,
+    path: str,
+    max_size: int = MAX_UPLOAD_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> Tuple[int, str]:
+    """
+    Copy an upload to `path` chunk by chunk without blocking the event loop.
+    The data is written to a temporary file that is only renamed into place
+    once complete. Returns the size and SHA-256 hex digest of the content.
+    Raises 413 as soon as the upload grows past max_size.
+    """
+    partial_path = f"{path}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    buffer = await run_in_threadpool(open, partial_path, "wb")
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Image {upload.filename} exceeds the {max_size // (1024 * 1024)} MB limit",
+                )
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        await run_in_threadpool(_remove_file, partial_path)
+        raise
+
+    await run_in_threadpool(buffer.close)
+    await run_in_threadpool(os.replace, partial_path, path)
+    return size, digest.hexdigest()
+
+
+def blob_name(digest: str, original_filename: str) -> str:
+    """Content address of an upload: sharded by the first bytes of its SHA-256"""
+    extension = os.path.splitext(original_filename or "")[1].lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,5}", extension):
+        extension = ""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+
+def is_content_addressed(filename: str) -> bool:
+    """Legacy uploads are stored flat as <uuid>_<name>; blobs live in shard directories"""
+    return "/" in filename
+
+
+def _move_into_store(temp_path: str, final_path: str):
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(temp_path, final_path)
+
+
+def copy_stream_to_file(source, path: str, max_size: int = MAX_UPLOAD_SIZE) -> Tuple[int, str]:
+    """
+    Blocking counterpart of stream_upload_to_file for file-like objects
+    (zip members, HTTP responses). Call it through the threadpool.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as buffer:
+            for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+                size += len(chunk)
+                if size > max_size:
+                    raise ValueError(f"Image exceeds the {max_size // (1024 * 1024)} MB limit")
+                digest.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        _remove_file(path)
+        raise
+    return size, digest.hexdigest()
+
+
+def incoming_path() -> str:
+    os.makedirs(INCOMING_DIRECTORY, exist_ok=True)
+    return os.path.join(INCOMING_DIRECTORY, uuid4().hex)
+
+
+async def commit_blob(temp_path: str, size: int, digest: str, original_filename: str) -> str:
+    """
+    Move a fully written incoming file to its content address and take a
+    reference on it. Identical content is stored once; the returned name is
+    relative to UPLOAD_DIRECTORY and never changes content.
+    """
+    name = blob_name(digest, original_filename)
+
+    # Take the reference before touching the file so garbage collection
+    # cannot remove a blob that is being re-uploaded. A blob that is being
+    # collected counts as absent: its document only goes away once its
+    # files are deleted, so wait for that and store the upload afresh.
+    while True:
+        try:
+            result = await image_blobs.update_one(
+                {"_id": name, "collecting_until": {"$exists": False}},
+                {
+                    "$inc": {"refs": 1},
+                    "$set": {"released_at": None},
+                    "$setOnInsert": {"size": size, "created_at": datetime.utcnow()},
+                },
+                upsert=True,
+            )
+            fresh = result.upserted_id is not None
+            break
+        except DuplicateKeyError:
+            taken = await image_blobs.update_one(
+                {"_id": name, "collecting_until": {"$lt": datetime.utcnow()}},
+                {"$set": {"refs": 1, "released_at": None}, "$unset": {"collecting_until": ""}},
+            )
+            if taken.modified_count:
+                fresh = True
+                break
+            await asyncio.sleep(BLOB_COLLECT_WAIT_SECONDS)
+
+    final_path = os.path.join(UPLOAD_DIRECTORY, name)
+    if not fresh and os.path.exists(final_path):
+        await run_in_threadpool(_remove_file, temp_path)
+    else:
+        await run_in_threadpool(_move_into_store, temp_path, final_path)
+    return name
+
+
+async def store_upload(upload: UploadFile) -> str:
+    """Save an upload in the content-addressed store and take a reference on it"""
+    temp_path = incoming_path()
+    size, digest = await stream_upload_to_file(upload, temp_path)
+    return await commit_blob(temp_path, size, digest, upload.filename)
+
+
+async def store_file_object(source, original_filename: str) -> str:
+    """Save a blocking file-like object in the content-addressed store"""
+    temp_path = incoming_path()
+    size, digest = await run_in_threadpool(copy_stream_to_file, source, temp_path)
+    return await commit_blob(temp_path, size, digest, original_filename)
+
+
+async def release_images(filenames: List[str]):
+    """Drop one reference per occurrence; unreferenced blobs are collected later"""
+    counts = Counter(name for name in filenames if name and is_content_addressed(name))
+    if not counts:
+        return
+    now = datetime.utcnow()
+    await image_blobs.bulk_write(
+        [
+            UpdateOne({"_id": name}, {"$inc": {"refs": -count}, "$set": {"released_at": now}})
+            for name, count in counts.items()
+        ],
+        ordered=False,
+    )
+
+
+def blob_files(name: str) -> List[str]:
+    """The blob and every variant generated from it"""
+    files = [name]
+    if not is_webp(name):
+        files.append(variant_filename(name, "", "webp"))
+    for variant in IMAGE_VARIANTS:
+        files.append(variant_filename(name, variant, "jpg"))
+        files.append(variant_filename(name, variant, "webp"))
+    return files
+
+
+async def collect_unreferenced_images(limit: int = 500) -> int:
+    """Delete blobs (and their variants) that have had no references for the grace period"""
+    cutoff = datetime.utcnow() - timedelta(minutes=BLOB_GC_GRACE_MINUTES)
+    candidates = await image_blobs.find(
+        {"refs": {"$lte": 0}, "released_at": {"$lte": cutoff}}, {"_id": 1}
+    ).to_list(limit)
+
+    removed = 0
+    for blob in candidates:
+        # Mark the blob as being collected, unless it was re-referenced
+        # meanwhile; uploads of the same content wait until the files are
+        # gone and the document is deleted
+        now = datetime.utcnow()
+        until = now + timedelta(seconds=BLOB_COLLECT_LEASE_SECONDS)
+        claimed = await image_blobs.update_one(
+            {
+                "_id": blob["_id"],
+                "refs": {"$lte": 0},
+                "released_at": {"$lte": cutoff},
+                "collecting_until": {"$not": {"$gt": now}},
+            },
+            {"$set": {"collecting_until": until}},
+        )
+        if not claimed.modified_count:
+            continue
+        for filename in blob_files(blob["_id"]):
+            await run_in_threadpool(_remove_file, os.path.join(UPLOAD_DIRECTORY, filename))
+        result = await image_blobs.delete_one({"_id": blob["_id"], "collecting_until": until})
+        removed += result.deleted_count
+    return removed
+
+
+def variant_filename(filename: str, variant: str, extension: str) -> str:
+    """Name of a variant stored next to the original, e.g. abc_thumb.webp"""
+    stem = os.path.splitext(filename)[0]
+    suffix = f"_{variant}" if variant else ""
+    return f"{stem}{suffix}.{extension}"
+
+
+def is_webp(filename: str) -> bool:
+    """WebP uploads are served as their own full-size WebP variant"""
+    return os.path.splitext(filename)[1].lower() == ".webp"
+
+
+def full_size_webp(filename: str) -> str:
+    """Name of the full-size WebP of an upload; the upload itself when it already is one"""
+    return filename if is_webp(filename) else variant_filename(filename, "", "webp")
+
+
+def generate_variants(directory: str, filename: str) -> dict:
+    """
+    Write resized JPEG and WebP variants of an uploaded image.
+    Runs in a worker process, so it only takes and returns plain data.
+    """
+    variants = {"original": filename}
+    names = blob_files(filename)[1:]
+    if all(os.path.exists(os.path.join(directory, name)) for name in names):
+        # Deduplicated blob whose variants were already generated
+        variants["webp"] = full_size_webp(filename)
+        for variant in IMAGE_VARIANTS:
+            variants[variant] = variant_filename(filename, variant, "jpg")
+            variants[f"{variant}_webp"] = variant_filename(filename, variant, "webp")
+        return variants
+
+    with Image.open(os.path.join(directory, filename)) as source:
+        source.load()
+        image = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+
+        # Re-encoding a WebP upload under its own name would change the
+        # bytes behind its content-addressed name
+        if not is_webp(filename):
+            image.save(os.path.join(directory, full_size_webp(filename)), "WEBP", quality=WEBP_QUALITY)
+        variants["webp"] = full_size_webp(filename)
+
+        for variant, size in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail((size, size))
+
+            jpeg_name = variant_filename(filename, variant, "jpg")
+            resized.convert("RGB").save(
+                os.path.join(directory, jpeg_name), "JPEG", quality=JPEG_QUALITY, optimize=True
+            )
+            variants[variant] = jpeg_name
+
+            webp_variant = variant_filename(filename, variant, "webp")
+            resized.save(os.path.join(directory, webp_variant), "WEBP", quality=WEBP_QUALITY)
+            variants[f"{variant}_webp"] = webp_variant
+
+    return variants
+
+
+async def build_image_variants(filenames: List[str]) -> List[dict]:
+    """Generate variants for the given uploads in the process pool"""
+    if Image is None or not filenames:
+        return []
+
+    loop = asyncio.get_event_loop()
+    results = await asyncio.gather(
+        *[
+            loop.run_in_executor(get_executor(), generate_variants, UPLOAD_DIRECTORY, filename)
+            for filename in filenames
+        ],
+        return_exceptions=True,
+    )
+
+    variants = []
+    for filename, result in zip(filenames, results):
+        if isinstance(result, Exception):
+            print(f"Failed to generate variants for {filename}: {result}")
+        else:
+            variants.append(result)
+    return variants
+
+
+def pick_thumbnail(product: dict):
+    """Smallest variant of the product's first image, or the original if none exists"""
+    images = product.get("images") or []
+    if not images:
+        return None
+    for variants in product.get("image_variants") or []:
+        if variants.get("original") == images[0]:
+            return variants.get("thumb", images[0])
+    return images[0]
+
+
+# ---- Delivery ----
+
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Legacy uploads are never rewritten either, but their names carry no
+# content hash, so caches revalidate them with the ETag once a day
+LEGACY_CACHE_CONTROL = "public, max-age=86400"
+
+# Formats offered instead of JPEG/PNG when the browser accepts them, best first
+NEGOTIABLE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+PREFERRED_FORMATS = [("image/avif", "avif"), ("image/webp", "webp")]
+
+_LEGACY_ETAGS_MAX = 4096
+_legacy_etags = OrderedDict()
+
+
+def resolve_image_path(filename: str) -> Optional[str]:
+    """Absolute path of a stored image, or None if it is missing or outside the store"""
+    root = os.path.realpath(UPLOAD_DIRECTORY)
+    path = os.path.realpath(os.path.join(root, filename))
+    if not path.startswith(root + os.sep):
+        return None
+    if path.startswith(os.path.realpath(INCOMING_DIRECTORY) + os.sep):
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def negotiate_format(filename: str, accept: str) -> str:
+    """Swap a JPEG/PNG name for an AVIF/WebP sibling the client accepts, if one exists"""
+    stem, extension = os.path.splitext(filename)
+    if extension.lower() not in NEGOTIABLE_EXTENSIONS:
+        return filename
+    accept = (accept or "").lower()
+    for media_type, alternative in PREFERRED_FORMATS:
+        candidate = f"{stem}.{alternative}"
+        if media_type in accept and resolve_image_path(candidate):
+            return candidate
+    return filename
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def image_etag(filename: str, path: str) -> str:
+    """
+    Strong ETag. Content-addressed names (and their variants) already
+    identify their bytes; legacy files are hashed once and remembered.
+    """
+    if is_content_addressed(filename):
+        return f'"{os.path.basename(filename)}"'
+
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    etag = _legacy_etags.get(key)
+    if etag is None:
+        etag = f'"{await run_in_threadpool(_hash_file, path)}"'
+        _legacy_etags[key] = etag
+        if len(_legacy_etags) > _LEGACY_ETAGS_MAX:
+            _legacy_etags.popitem(last=False)
+    else:
+        _legacy_etags.move_to_end(key)
+    return etag
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison used for If-None-Match"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Inclusive (start, end) of a single `bytes=` range.
+    Returns None when the header should be ignored (absent, malformed or
+    multiple ranges) and raises ValueError when it cannot be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    start_text, end_text = (part.strip() for part in spec.split("-", 1))
+    if not (start_text or end_text):
+        return None
+    if not all(text.isdigit() for text in (start_text, end_text) if text):
+        return None
+
+    if start_text:
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    else:
+        # Suffix range: the last N bytes
+        suffix = int(end_text)
+        if suffix == 0:
+            raise ValueError("Range not satisfiable")
+        start = max(size - suffix, 0)
+        end = size - 1
+
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, min(end, size - 1)
+
+
+async def read_file_range(path: str, start: int, end: int):
+    """Yield bytes start..end (inclusive) of a file in chunks without blocking the loop"""
+    f = await run_in_threadpool(open, path, "rb")
+    try:
+        await run_in_threadpool(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await run_in_threadpool(f.read, min(UPLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await run_in_threadpool(f.close)
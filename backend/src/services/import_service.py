@@ -0,0 +1,433 @@
+import asyncio
+import csv
+import http.client
+import ipaddress
+import json
+import os
+import socket
+import ssl
+import zipfile
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import urlsplit
+from bson import ObjectId
+from dotenv import load_dotenv
+from fastapi import BackgroundTasks, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pymongo.errors import BulkWriteError
+from src.services.outbox_service import enqueue_email
+from src.config.database import import_jobs, product_collection, users
+from src.models.product import ProductModel
+from src.services.image_service import (
+    stream_upload_to_file,
+    store_file_object,
+    release_images,
+    _remove_file,
+    MAX_UPLOAD_SIZE,
+)
+from src.services.product_service import process_product_images
+
+load_dotenv()
+
+IMPORT_DIRECTORY = "./imports"
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+IMPORT_MAX_FILE_SIZE = int(os.getenv("IMPORT_MAX_FILE_SIZE", str(200 * 1024 * 1024)))
+IMPORT_IMAGE_TIMEOUT = int(os.getenv("IMPORT_IMAGE_TIMEOUT", "15"))
+# Image fetches (URL downloads and archive reads) running at once per import
+IMPORT_IMAGE_CONCURRENCY = int(os.getenv("IMPORT_IMAGE_CONCURRENCY", "8"))
+# Products of a batch whose image variants are generated at once
+IMPORT_VARIANT_CONCURRENCY = int(os.getenv("IMPORT_VARIANT_CONCURRENCY", "4"))
+# Only the first errors are kept on the job so it stays small
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+IMPORT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+IMAGE_SEPARATORS = (";", "|")
+
+
+def detect_format(filename: str) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise HTTPException(
+            status_code=400, detail="Catalog file must be .csv, .ndjson or .jsonl"
+        )
+    return IMPORT_FORMATS[extension]
+
+
+def open_rows(path: str, file_format: str):
+    """
+    Lazily yield (line_number, row) from the import file.
+    Rows that cannot be parsed are yielded as the exception so the rest of
+    the file is still imported.
+    """
+    handle = open(path, newline="", encoding="utf-8-sig")
+    try:
+        if file_format == "csv":
+            reader = csv.DictReader(handle)
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    break
+                except csv.Error as e:
+                    yield reader.line_num, e
+                    continue
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(handle, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as e:
+                    yield line_number, e
+    finally:
+        handle.close()
+
+
+def read_batch(rows, size: int) -> list:
+    """Pull up to `size` parsed rows from open_rows"""
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= size:
+            break
+    return batch
+
+
+def split_images(value) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    for separator in IMAGE_SEPARATORS:
+        value = value.replace(separator, ",")
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def resolve_public_address(host: str, port: int) -> str:
+    """
+    Resolve host and return an address to connect to, refusing hosts that
+    resolve to private, loopback, link-local or otherwise non-public ranges.
+    Sellers choose these URLs, so they must not reach internal services.
+    """
+    try:
+        addresses = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise ValueError(f"Could not resolve image host {host}")
+    ips = [ipaddress.ip_address(info[4][0]) for info in addresses]
+    if not ips or any(not ip.is_global or ip.is_multicast for ip in ips):
+        raise ValueError(f"Image host {host} is not a public address")
+    return str(ips[0])
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """Connects to the address that was checked, not a fresh DNS answer"""
+
+    def __init__(self, host, address, **kwargs):
+        super().__init__(host, **kwargs)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, host, address, **kwargs):
+        super().__init__(host, context=ssl.create_default_context(), **kwargs)
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def fetch_image_url(url: str):
+    """
+    Open an http(s) image URL for reading. Redirects are not followed, the
+    response must be an image and its declared size within MAX_UPLOAD_SIZE;
+    copy_stream_to_file enforces the same limit on the bytes actually read.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Image URL {url} must be http or https")
+    port = parts.port or (443 if parts.scheme == "https" else 80)
+    address = resolve_public_address(parts.hostname, port)
+
+    connection_class = _PinnedHTTPSConnection if parts.scheme == "https" else _PinnedHTTPConnection
+    connection = connection_class(parts.hostname, address, port=port, timeout=IMPORT_IMAGE_TIMEOUT)
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+    try:
+        # Connection: close lets the response own the socket
+        connection.request("GET", path, headers={"Connection": "close", "Accept": "image/*"})
+        response = connection.getresponse()
+    except (OSError, http.client.HTTPException) as e:
+        connection.close()
+        raise ValueError(f"Could not fetch image {url}: {e}")
+
+    try:
+        if response.status != 200:
+            raise ValueError(f"Image {url} returned HTTP {response.status}")
+        content_type = response.getheader("Content-Type", "")
+        if not content_type.lower().startswith("image/"):
+            raise ValueError(f"Image {url} is not an image ({content_type or 'no content type'})")
+        length = response.getheader("Content-Length")
+        if length and length.isdigit() and int(length) > MAX_UPLOAD_SIZE:
+            raise ValueError(f"Image {url} exceeds the {MAX_UPLOAD_SIZE // (1024 * 1024)} MB limit")
+    except ValueError:
+        response.close()
+        connection.close()
+        raise
+    return response
+
+
+def _open_image_source(reference: str, archive: Optional[zipfile.ZipFile]):
+    if reference.startswith(("http://", "https://")):
+        return fetch_image_url(reference)
+    if archive is None:
+        raise ValueError(f"Image {reference} is not a URL and no image archive was attached")
+    try:
+        return archive.open(reference)
+    except KeyError:
+        raise ValueError(f"Image {reference} not found in the image archive")
+
+
+async def _store_image(reference: str, archive: Optional[zipfile.ZipFile], limit: asyncio.Semaphore) -> str:
+    async with limit:
+        source = await run_in_threadpool(_open_image_source, reference, archive)
+        try:
+            filename = os.path.basename(reference.split("?", 1)[0])
+            return await store_file_object(source, filename)
+        finally:
+            await run_in_threadpool(source.close)
+
+
+async def store_row_images(
+    references: List[str],
+    archive: Optional[zipfile.ZipFile],
+    limit: Optional[asyncio.Semaphore] = None,
+) -> List[str]:
+    """Store a row's images concurrently, in order; on any failure the stored ones are released"""
+    limit = limit or asyncio.Semaphore(IMPORT_IMAGE_CONCURRENCY)
+    results = await asyncio.gather(
+        *[_store_image(reference, archive, limit) for reference in references],
+        return_exceptions=True,
+    )
+    failures = [result for result in results if isinstance(result, BaseException)]
+    if failures:
+        await release_images([result for result in results if isinstance(result, str)])
+        raise failures[0]
+    return list(results)
+
+
+async def start_import(
+    seller_id: str,
+    catalog_file: UploadFile,
+    images_archive: Optional[UploadFile],
+    background_tasks: BackgroundTasks,
+):
+    """Spool the uploaded files to disk, create the job and run it in the background"""
+    file_format = detect_format(catalog_file.filename)
+    job_id = str(ObjectId())
+    os.makedirs(IMPORT_DIRECTORY, exist_ok=True)
+
+    catalog_path = os.path.join(IMPORT_DIRECTORY, f"{job_id}.{file_format}")
+    await stream_upload_to_file(catalog_file, catalog_path, max_size=IMPORT_MAX_FILE_SIZE)
+
+    archive_path = None
+    try:
+        if images_archive and images_archive.filename:
+            archive_path = os.path.join(IMPORT_DIRECTORY, f"{job_id}.zip")
+            await stream_upload_to_file(images_archive, archive_path, max_size=IMPORT_MAX_FILE_SIZE)
+
+        await import_jobs.insert_one(
+            {
+                "_id": job_id,
+                "seller_id": seller_id,
+                "format": file_format,
+                "filename": catalog_file.filename,
+                "status": "queued",
+                "processed": 0,
+                "inserted": 0,
+                "failed": 0,
+                "errors": [],
+                "created_at": datetime.utcnow(),
+                "finished_at": None,
+            }
+        )
+    except BaseException:
+        # No job will run, so nothing else removes the spooled files
+        for path in (catalog_path, archive_path):
+            if path:
+                await run_in_threadpool(_remove_file, path)
+        raise
+
+    background_tasks.add_task(run_import, job_id, seller_id, catalog_path, file_format, archive_path)
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def _import_batch(batch: list, seller_id: str, archive: Optional[zipfile.ZipFile]):
+    """Validate and insert one batch; returns (inserted, errors)"""
+    errors = []
+    products = []
+    for line, row in batch:
+        if isinstance(row, Exception):
+            errors.append({"line": line, "error": f"Could not parse row: {row}"})
+            continue
+        try:
+            product = ProductModel(
+                product_name=row.get("product_name"),
+                description=row.get("description"),
+                price=row.get("price"),
+                category=row.get("category") or None,
+                seller_id=seller_id,
+                status="pending",
+            )
+        except Exception as e:
+            errors.append({"line": line, "error": str(e)})
+            continue
+        products.append((line, product, split_images(row.get("images"))))
+
+    # Rows' images are fetched concurrently, bounded across the whole batch
+    limit = asyncio.Semaphore(IMPORT_IMAGE_CONCURRENCY)
+    results = await asyncio.gather(
+        *[store_row_images(references, archive, limit) for _, _, references in products],
+        return_exceptions=True,
+    )
+    stored = []
+    for (line, product, _), images in zip(products, results):
+        if isinstance(images, BaseException):
+            errors.append({"line": line, "error": str(images)})
+            continue
+        product.images = images
+        stored.append((line, product))
+    products = stored
+
+    if not products:
+        return [], errors
+
+    failed_positions = {}
+    try:
+        await product_collection.insert_many(
+            [product.dict(by_alias=True) for _, product in products], ordered=False
+        )
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            failed_positions[write_error["index"]] = write_error.get("errmsg", "Insert failed")
+
+    inserted = []
+    for position, (line, product) in enumerate(products):
+        if position in failed_positions:
+            await release_images(product.images)
+            errors.append({"line": line, "error": failed_positions[position]})
+        else:
+            inserted.append(product)
+    return inserted, errors
+
+
+async def _process_batch_images(products: List[ProductModel]):
+    """Generate a batch's image variants together, IMPORT_VARIANT_CONCURRENCY products at a time"""
+    limit = asyncio.Semaphore(IMPORT_VARIANT_CONCURRENCY)
+
+    async def process(product: ProductModel):
+        async with limit:
+            await process_product_images(product.id, product.images)
+
+    await asyncio.gather(*[process(product) for product in products if product.images])
+
+
+async def run_import(
+    job_id: str,
+    seller_id: str,
+    catalog_path: str,
+    file_format: str,
+    archive_path: Optional[str] = None,
+):
+    """Import the spooled file batch by batch, recording progress on the job"""
+    await import_jobs.update_one({"_id": job_id}, {"$set": {"status": "running"}})
+    archive = None
+    rows = None
+    totals = {"inserted": 0, "failed": 0}
+    try:
+        if archive_path:
+            archive = await run_in_threadpool(zipfile.ZipFile, archive_path)
+        rows = open_rows(catalog_path, file_format)
+
+        while True:
+            batch = await run_in_threadpool(read_batch, rows, IMPORT_BATCH_SIZE)
+            if not batch:
+                break
+
+            inserted, errors = await _import_batch(batch, seller_id, archive)
+            await _process_batch_images(inserted)
+
+            totals["inserted"] += len(inserted)
+            totals["failed"] += len(errors)
+            await import_jobs.update_one(
+                {"_id": job_id},
+                {
+                    "$inc": {
+                        "processed": len(batch),
+                        "inserted": len(inserted),
+                        "failed": len(errors),
+                    },
+                    "$push": {
+                        "errors": {"$each": errors, "$slice": IMPORT_MAX_REPORTED_ERRORS}
+                    },
+                },
+            )
+
+        await import_jobs.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "completed", "finished_at": datetime.utcnow()}},
+        )
+        if totals["inserted"]:
+            await _notify_import_completed(seller_id, totals)
+
+    except Exception as e:
+        print(f"Error in import job {job_id}: {str(e)}")
+        await import_jobs.update_one(
+            {"_id": job_id},
+            {
+                "$set": {
+                    "status": "failed",
+                    "error": str(e),
+                    "finished_at": datetime.utcnow(),
+                }
+            },
+        )
+    finally:
+        if rows is not None:
+            rows.close()
+        if archive is not None:
+            await run_in_threadpool(archive.close)
+        for path in (catalog_path, archive_path):
+            if path:
+                await run_in_threadpool(_remove_file, path)
+
+
+async def _notify_import_completed(seller_id: str, totals: dict):
+    seller = await users.find_one({"business_name": seller_id}, {"email": 1})
+    if seller and seller.get("email"):
+        await enqueue_email(
+            seller["email"],
+            "Catalog Import Completed",
+            f"{totals['inserted']} product(s) were imported and submitted for review. "
+            f"{totals['failed']} row(s) could not be imported.",
+        )
+    async for admin in users.find({"role": "admin"}, {"email": 1}):
+        if admin.get("email"):
+            await enqueue_email(
+                admin["email"],
+                "New Product Submissions",
+                f"Seller {seller_id} imported {totals['inserted']} product(s) for review. "
+                f"Please review them in the admin dashboard.",
+            )
+
+
+async def get_import_job(job_id: str, seller_id: str):
+    job = await import_jobs.find_one({"_id": job_id, "seller_id": seller_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import os
+import uuid
+from pymongo import UpdateOne
+from src.config.database import orders
+from src.models.order import TrackingHistory
+from src.services.order_services import (
+    LIFECYCLE_SCHEDULE,
+    STATUS_DESCRIPTIONS,
+    next_transition_time,
+    order_status_message,
+)
+from src.services.outbox_service import enqueue_emails
+from src.services.restock_service import restock_orders, RESTOCK_PENDING
+from src.services.rollup_service import apply_pending_rollups
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LIFECYCLE_BATCH_SIZE = int(os.getenv("LIFECYCLE_BATCH_SIZE", "100"))
+LIFECYCLE_POLL_SECONDS = int(os.getenv("LIFECYCLE_POLL_SECONDS", "5"))
+# A batch claimed by a scheduler that died is picked up again after this long
+LIFECYCLE_LOCK_SECONDS = int(os.getenv("LIFECYCLE_LOCK_SECONDS", "60"))
+
+
+def local_timestamp(utc: datetime) -> str:
+    """ISO timestamp in local time, like the rest of the tracking history, for a naive UTC time"""
+    return utc.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None).isoformat()
+
+
+def plan_transitions(order: dict, now: datetime) -> Tuple[str, Optional[datetime], List[TrackingHistory]]:
+    """
+    Walk an order through every transition that is due by now. Returns the
+    resulting status, its next transition time and the tracking entries to
+    append, so an order that was overdue by several steps catches up at once;
+    each entry is stamped with the time its step fell due. An order whose
+    status has no scheduled transition is left as it is, with no next time.
+    """
+    status, due = order["status"], order.get("next_transition_at")
+    step = LIFECYCLE_SCHEDULE.get(status)
+    if step is None or due is None:
+        return status, None, []
+
+    started_at = due - timedelta(seconds=step[1])
+    tracking = []
+    while due is not None and due <= now:
+        status = LIFECYCLE_SCHEDULE[status][0]
+        tracking.append(TrackingHistory(
+            status=status,
+            timestamp=local_timestamp(due),
+            description=STATUS_DESCRIPTIONS.get(status, "Status updated"),
+        ))
+        due = next_transition_time(status, started_at)
+    return status, due, tracking
+
+
+async def claim_due_orders(limit: int) -> List[dict]:
+    """
+    Lock up to limit orders whose next transition is due, the same way the
+    email outbox claims messages, so concurrent schedulers never advance the
+    same order.
+    """
+    now = datetime.utcnow()
+    due = {
+        "next_transition_at": {"$lte": now},
+        "lifecycle_locked_until": {"$not": {"$gt": now}},
+    }
+    candidates = await orders.find(due, {"_id": 1}).sort("next_transition_at", 1).limit(limit).to_list(limit)
+    if not candidates:
+        return []
+
+    token = str(uuid.uuid4())
+    await orders.update_many(
+        {"_id": {"$in": [order["_id"] for order in candidates]}, **due},
+        {"$set": {
+            "lifecycle_lock": token,
+            "lifecycle_locked_until": now + timedelta(seconds=LIFECYCLE_LOCK_SECONDS),
+        }},
+    )
+    return await orders.find({"lifecycle_lock": token}).to_list(limit)
+
+
+def transition_update(order: dict, status: str, next_at: Optional[datetime], tracking: List[TrackingHistory]):
+    """Filter and update advancing a claimed order, unless a buyer action changed it meanwhile"""
+    query = {"_id": order["_id"], "status": order["status"], "lifecycle_lock": order["lifecycle_lock"]}
+    update = {"$unset": {"lifecycle_lock": "", "lifecycle_locked_until": ""}}
+    # Without tracking nothing was due, e.g. the status has no schedule
+    if tracking:
+        update["$set"] = {"status": status, "can_cancel": False, "can_return": status == "delivered"}
+        update["$push"] = {"tracking_history": {"$each": [entry.dict() for entry in tracking]}}
+        if status == "returned":
+            update["$set"].update(RESTOCK_PENDING)
+    if next_at:
+        update.setdefault("$set", {})["next_transition_at"] = next_at
+    else:
+        update["$unset"]["next_transition_at"] = ""
+    return query, update
+
+
+async def advance_due_orders(limit: int = LIFECYCLE_BATCH_SIZE) -> int:
+    """Advance one batch of due orders; returns how many were claimed"""
+    batch = await claim_due_orders(limit)
+    if not batch:
+        return 0
+
+    now = datetime.utcnow()
+    updates, returned = [], []
+    for order in batch:
+        status, next_at, tracking = plan_transitions(order, now)
+        updates.append(UpdateOne(*transition_update(order, status, next_at, tracking)))
+        if tracking and status == "returned":
+            returned.append(order["_id"])
+    await orders.bulk_write(updates, ordered=False)
+
+    # Only returns whose update applied are pending a restock
+    restocked = await restock_orders(returned)
+    await enqueue_emails([
+        message for message in (order_status_message(order, "returned") for order in restocked) if message
+    ])
+
+    logger.info(f"Advanced {len(batch)} orders")
+    return len(batch)
+
+
+async def finish_interrupted_work(limit: int = LIFECYCLE_BATCH_SIZE):
+    """Apply pending rollups and restock pending orders whose first attempt did not finish"""
+    await apply_pending_rollups(limit=limit)
+    restocked = await restock_orders(limit=limit)
+    await enqueue_emails([
+        message for message in (order_status_message(order, order.status) for order in restocked) if message
+    ])
+
+
+async def run_lifecycle_scheduler(interval: int = LIFECYCLE_POLL_SECONDS):
+    """
+    Advance due orders until cancelled; full batches are followed up
+    immediately. Each round also finishes rollups and restocks that failed
+    or were interrupted.
+    """
+    while True:
+        try:
+            advanced = await advance_due_orders()
+        except Exception as e:
+            logger.error(f"Error advancing orders: {str(e)}")
+            advanced = 0
+        try:
+            await finish_interrupted_work()
+        except Exception as e:
+            logger.error(f"Error finishing interrupted work: {str(e)}")
+        if advanced < LIFECYCLE_BATCH_SIZE:
+            await asyncio.sleep(interval)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import smtplib
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from smtp import SENDER_EMAIL, build_message, open_connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Authenticated SMTP connections kept open, one per sending worker
+MAIL_POOL_SIZE = int(os.getenv("MAIL_POOL_SIZE", "2"))
+# Connections idle longer than this are reopened; servers drop idle sessions
+MAIL_IDLE_SECONDS = int(os.getenv("MAIL_IDLE_SECONDS", "240"))
+
+# Errors after which a connection is considered dead and reopened. SMTP
+# protocol errors also subclass OSError but mean the server answered, so
+# they are raised rather than retried into a duplicate message.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+
+class PooledConnection:
+    """One reusable SMTP session; blocking, only used from the mailer's threads"""
+
+    def __init__(self, factory: Callable, idle_seconds: int = MAIL_IDLE_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.factory = factory
+        self.idle_seconds = idle_seconds
+        self.clock = clock
+        self.server = None
+        self.last_used = 0.0
+
+    def send(self, to: str, message: str):
+        if self.server is None or self.clock() - self.last_used > self.idle_seconds:
+            self.reconnect()
+        try:
+            self.server.sendmail(SENDER_EMAIL, to, message)
+        except CONNECTION_ERRORS:
+            # Stale or dropped session: reconnect once and retry
+            self.reconnect()
+            self.server.sendmail(SENDER_EMAIL, to, message)
+        self.last_used = self.clock()
+
+    def reconnect(self):
+        self.close()
+        self.server = self.factory()
+        self.last_used = self.clock()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+
+class Mailer:
+    """
+    Sends email from a bounded pool of persistent SMTP connections.
+    deliver() waits for a free connection and raises if the send fails;
+    the email dispatcher is its only caller.
+    """
+
+    def __init__(self, pool_size: int = MAIL_POOL_SIZE, connection_factory: Callable = open_connection):
+        self.pool_size = pool_size
+        self.connection_factory = connection_factory
+        self.pool: Optional[asyncio.Queue] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.connections = []
+        self.sent = 0
+        self.failed = 0
+
+    def open(self):
+        """Create the connection pool; connections themselves open lazily"""
+        if self.pool is not None:
+            return
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="mailer")
+        self.connections = [PooledConnection(self.connection_factory) for _ in range(self.pool_size)]
+        self.pool = asyncio.Queue()
+        for connection in self.connections:
+            self.pool.put_nowait(connection)
+
+    async def deliver(self, to: str, subject: str, body: str):
+        """Send one message over a pooled connection"""
+        self.open()
+        loop = asyncio.get_running_loop()
+        connection = await self.pool.get()
+        try:
+            message = build_message(to, subject, body).as_string()
+            await loop.run_in_executor(self.executor, connection.send, to, message)
+            self.sent += 1
+        except Exception:
+            self.failed += 1
+            await loop.run_in_executor(self.executor, connection.close)
+            raise
+        finally:
+            self.pool.put_nowait(connection)
+
+    async def stop(self):
+        """Close every connection"""
+        if self.pool is None:
+            return
+        loop = asyncio.get_running_loop()
+        for connection in self.connections:
+            await loop.run_in_executor(self.executor, connection.close)
+        self.executor.shutdown(wait=False)
+        self.connections = []
+        self.pool = None
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "connections": sum(1 for c in self.connections if c.server is not None),
+        }
@@ -1,6 +1,6 @@
 from src.config.database import users
 from fastapi import HTTPException
-from smtp import Smtp
+from src.services.outbox_service import enqueue_email
 import random
 from datetime import datetime, timedelta
 
@@ -28,7 +28,7 @@ class MFAService:
             if not user:
                 raise HTTPException(status_code=404, detail="User not found")
 
-            Smtp.trigger_email(
+            await enqueue_email(
                 email,
                 "Your Login Verification Code",
                 f"""
@@ -0,0 +1,178 @@
+from typing import AsyncIterator, Dict, Optional, Set
+import asyncio
+import logging
+import os
+from pymongo.errors import OperationFailure
+from src.config.database import orders
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fields pushed to tracking clients on every change
+ORDER_EVENT_FIELDS = {"status": 1, "tracking_history": 1, "can_cancel": 1, "can_return": 1}
+# No transition ever follows these, so their streams end
+FINAL_STATUSES = ("cancelled", "returned")
+# Seconds between keepalives, and between reads when change streams are unavailable
+ORDER_EVENTS_HEARTBEAT_SECONDS = int(os.getenv("ORDER_EVENTS_HEARTBEAT_SECONDS", "15"))
+ORDER_EVENTS_POLL_SECONDS = int(os.getenv("ORDER_EVENTS_POLL_SECONDS", "5"))
+
+# Raised by $changeStream on a standalone server
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+def event_fields(order: dict) -> dict:
+    return {field: order.get(field) for field in ("_id", *ORDER_EVENT_FIELDS)}
+
+
+# Put on subscriber queues when the shared change stream stops
+STREAM_LOST = object()
+
+
+class OrderEventHub:
+    """
+    One change stream on Orders per process, shared by every tracking
+    client. Changes are fanned out to subscriber queues keyed by order id;
+    the stream only carries ids, and an order's state is read once per
+    change and only while someone is subscribed to it.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._opened: Optional[asyncio.Future] = None
+        self._unsupported = False
+
+    async def subscribe(self, order_id: str) -> Optional[asyncio.Queue]:
+        """
+        Queue receiving the order's state after each change, None once it
+        is deleted, and STREAM_LOST if the stream stops. Returns None when
+        change streams are unavailable.
+        """
+        if self._unsupported:
+            return None
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(order_id, set()).add(queue)
+
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._opened = loop.create_future()
+            self._task = loop.create_task(self._watch(self._opened))
+        # Once the stream is open no later change can be missed
+        if not await asyncio.shield(self._opened):
+            self.unsubscribe(order_id, queue)
+            return None
+        return queue
+
+    def unsubscribe(self, order_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(order_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[order_id]
+
+    def close(self):
+        """Stop the change stream; subscribers fall back to polling"""
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _watch(self, opened: asyncio.Future):
+        pipeline = [
+            {"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}},
+            {"$project": {"operationType": 1, "documentKey": 1}},
+        ]
+        try:
+            async with orders.watch(pipeline, max_await_time_ms=ORDER_EVENTS_HEARTBEAT_SECONDS * 1000) as stream:
+                opened.set_result(True)
+                while stream.alive:
+                    change = await stream.try_next()
+                    if change is not None:
+                        await self._dispatch(change)
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                self._unsupported = True
+                logger.info("Change streams unavailable, polling order events")
+            else:
+                logger.error(f"Order change stream failed: {str(e)}")
+        except Exception as e:
+            logger.error(f"Order change stream failed: {str(e)}")
+        finally:
+            if not opened.done():
+                opened.set_result(False)
+            elif asyncio.current_task() is self._task:
+                for queues in list(self._subscribers.values()):
+                    for queue in queues:
+                        queue.put_nowait(STREAM_LOST)
+
+    async def _dispatch(self, change: dict):
+        order_id = change["documentKey"]["_id"]
+        if order_id not in self._subscribers:
+            return
+        if change["operationType"] == "delete":
+            state = None
+        else:
+            order = await orders.find_one({"_id": order_id}, ORDER_EVENT_FIELDS)
+            state = event_fields(order) if order else None
+        for queue in list(self._subscribers.get(order_id, ())):
+            queue.put_nowait(state)
+
+
+order_event_hub = OrderEventHub()
+
+
+async def order_events(order_id: str) -> AsyncIterator[Optional[dict]]:
+    """
+    Yield the tracking state of an order, then again each time it changes.
+    None is yielded as a keepalive while nothing happens. Changes come from
+    the process's shared change stream on Orders; on a standalone server,
+    which has none, or if the stream stops, the order is re-read every few
+    seconds instead. The stream ends once the order reaches a final status
+    or is deleted.
+    """
+    queue = await order_event_hub.subscribe(order_id)
+    if queue is not None:
+        try:
+            # Read once subscribed so no change falls in between
+            current = await orders.find_one({"_id": order_id}, ORDER_EVENT_FIELDS)
+            if current is None:
+                return
+            yield event_fields(current)
+            if current.get("status") in FINAL_STATUSES:
+                return
+
+            while True:
+                try:
+                    state = await asyncio.wait_for(queue.get(), ORDER_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if state is STREAM_LOST:
+                    break
+                if state is None:
+                    return
+                yield state
+                if state.get("status") in FINAL_STATUSES:
+                    return
+        finally:
+            order_event_hub.unsubscribe(order_id, queue)
+
+    async for event in _poll_order_events(order_id):
+        yield event
+
+
+async def _poll_order_events(order_id: str) -> AsyncIterator[Optional[dict]]:
+    last, idle = None, 0
+    while True:
+        order = await orders.find_one({"_id": order_id}, ORDER_EVENT_FIELDS)
+        if order is None:
+            return
+        state = event_fields(order)
+        if state != last:
+            last, idle = state, 0
+            yield state
+            if state["status"] in FINAL_STATUSES:
+                return
+        elif idle >= ORDER_EVENTS_HEARTBEAT_SECONDS:
+            idle = 0
+            yield None
+        await asyncio.sleep(ORDER_EVENTS_POLL_SECONDS)
+        idle += ORDER_EVENTS_POLL_SECONDS
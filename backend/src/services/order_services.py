@@ -1,11 +1,15 @@
 from fastapi import HTTPException
-from src.config.database import orders, product_collection
+from src.config.database import orders
 from src.models.order import OrderModel, TrackingHistory
 from src.schemas.order_schema import OrderCreateSchema, OrderUpdateSchema
 from datetime import datetime, timedelta
 import logging
-from typing import List
-from smtp import Smtp
+from typing import List, Optional, Tuple
+from pymongo import ReturnDocument
+from src.services.outbox_service import enqueue_emails, outbox_message
+from src.services.restock_service import restock_orders, RESTOCK_PENDING
+from src.utils.pagination import encode_cursor, decode_cursor, keyset_filter
+from src.services.rollup_service import apply_pending_rollups, product_sellers, REVERSED_STATUSES, ROLLUP_PENDING
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +28,32 @@ STATUS_DESCRIPTIONS = {
     "returned": "Product has been returned to seller",
 }
 
+# Automatic transitions: status -> (next status, seconds after the flow
+# started). The delivery flow starts when the order is placed, the return
+# flow when the return is requested.
+LIFECYCLE_SCHEDULE = {
+    "placed": ("shipped", 30),
+    "shipped": ("in_transit", 60),
+    "in_transit": ("delivered", 90),
+    "return_requested": ("return_pickup_scheduled", 30),
+    "return_pickup_scheduled": ("return_picked", 60),
+    "return_picked": ("return_in_transit", 90),
+    "return_in_transit": ("returned", 120),
+}
+
+
+def next_transition_time(status: str, started_at: datetime) -> Optional[datetime]:
+    """When an order in status advances, or None if it never does on its own"""
+    step = LIFECYCLE_SCHEDULE.get(status)
+    return started_at + timedelta(seconds=step[1]) if step else None
+
+
+ORDER_DEFAULT_PAGE_SIZE = 10
+ORDER_MAX_PAGE_SIZE = 50
+ORDER_HISTORY_SORT = [("order_date", -1), ("_id", -1)]
+# Order lists don't show tracking; it is the largest part of an old order
+ORDER_SUMMARY_PROJECTION = {"tracking_history": 0}
+
 EMAIL_TEMPLATES = {
     "placed": {
         "subject": "Order Confirmation",
@@ -88,73 +118,94 @@ def format_order_details(order: OrderModel) -> str:
         details.append(f"- {item.product_name} (Quantity: {item.quantity}) - ${item.price:.2f} each")
     return "\n".join(details)
 
-async def send_order_status_email(order: OrderModel, status: str):
-    """Send email notification based on order status"""
+def order_status_message(order: OrderModel, status: str) -> Optional[dict]:
+    """Outbox message for an order status, or None if the status has no email"""
+    if status not in EMAIL_TEMPLATES:
+        return None
+
+    template = EMAIL_TEMPLATES[status]
+    customer_name = order.shipping_address.get('name', 'Valued Customer')
+    order_details = format_order_details(order)
+
+    message = template["message"].format(
+        customer_name=customer_name,
+        order_id=order.id,
+        order_details=order_details,
+        total_amount=order.total_amount
+    )
+    return outbox_message(
+        order.buyer_email, template["subject"], message, dedup_key=f"order:{order.id}:{status}"
+    )
+
+
+async def send_order_status_email(order: OrderModel, status: str, session=None):
+    """Queue the email notification for an order status; pass session to write it in the caller's transaction"""
     try:
-        if status not in EMAIL_TEMPLATES:
+        message = order_status_message(order, status)
+        if message is None:
             return
 
-        template = EMAIL_TEMPLATES[status]
-        customer_name = order.shipping_address.get('name', 'Valued Customer')
-        order_details = format_order_details(order)
+        await enqueue_emails([message], session=session)
+        logger.info(f"Email queued for order {order.id} - Status: {status}")
+    except Exception as e:
+        logger.error(f"Failed to send email for order {order.id}: {str(e)}")
 
-        message = template["message"].format(
-            customer_name=customer_name,
-            order_id=order.id,
-            order_details=order_details,
-            total_amount=order.total_amount
+def build_order(order_data: OrderCreateSchema) -> OrderModel:
+    """Validate order data and build a new order with its initial tracking status"""
+    initial_tracking = TrackingHistory(
+        status="placed",
+        timestamp=datetime.now().isoformat(),
+        description=STATUS_DESCRIPTIONS["placed"],
+    )
+
+    # Ensure shipping address contains all required fields
+    if not order_data.shipping_address or not all(key in order_data.shipping_address for key in ['name', 'address', 'postal_code']):
+        raise HTTPException(
+            status_code=400,
+            detail="Shipping address must include name, address, and postal code"
         )
 
-        Smtp.trigger_email(
-            order.buyer_email,
-            template["subject"],
-            message
-        )
-        logger.info(f"Email sent successfully for order {order.id} - Status: {status}")
-    except Exception as e:
-        logger.error(f"Failed to send email for order {order.id}: {str(e)}")
+    # Create structured shipping address
+    shipping_address = {
+        "name": order_data.shipping_address["name"],
+        "address": order_data.shipping_address["address"],
+        "postal_code": order_data.shipping_address["postal_code"]
+    }
+
+    return OrderModel(
+        buyer_email=order_data.buyer_email,
+        items=order_data.items,
+        total_amount=order_data.total_amount,
+        shipping_address=shipping_address,
+        payment_method=order_data.payment_method,
+        tracking_history=[initial_tracking],
+        status="placed",
+        can_cancel=True,
+        can_return=False,
+        next_transition_at=next_transition_time("placed", datetime.utcnow()),
+    )
+
+
+async def stamp_item_sellers(order: OrderModel):
+    """Copy each product's seller and category onto its order item"""
+    products = await product_sellers([item.product_id for item in order.items])
+    for item in order.items:
+        product = products.get(item.product_id, {})
+        item.seller_id = product.get("seller_id")
+        item.category = product.get("category")
+
 
 async def create_order(order_data: OrderCreateSchema) -> OrderModel:
     """Create a new order with initial tracking status"""
     try:
-        initial_tracking = TrackingHistory(
-            status="placed",
-            timestamp=datetime.now().isoformat(),
-            description=STATUS_DESCRIPTIONS["placed"],
-        )
+        order = build_order(order_data)
+        await stamp_item_sellers(order)
 
-        # Ensure shipping address contains all required fields
-        if not order_data.shipping_address or not all(key in order_data.shipping_address for key in ['name', 'address', 'postal_code']):
-            raise HTTPException(
-                status_code=400,
-                detail="Shipping address must include name, address, and postal code"
-            )
-
-        # Create structured shipping address
-        shipping_address = {
-            "name": order_data.shipping_address["name"],
-            "address": order_data.shipping_address["address"],
-            "postal_code": order_data.shipping_address["postal_code"]
-        }
-
-        order = OrderModel(
-            buyer_email=order_data.buyer_email,
-            items=order_data.items,
-            total_amount=order_data.total_amount,
-            shipping_address=shipping_address,
-            payment_method=order_data.payment_method,
-            tracking_history=[initial_tracking],
-            status="placed",
-            can_cancel=True,
-            can_return=False,
-        )
-
-        result = await orders.insert_one(order.dict(by_alias=True))
+        result = await orders.insert_one({**order.dict(by_alias=True), **ROLLUP_PENDING})
         if result.inserted_id:
-            created_order = await orders.find_one({"_id": str(result.inserted_id)})
-            order_model = OrderModel(**created_order)
-            await send_order_status_email(order_model, "placed")
-            return order_model
+            await apply_pending_rollups([order.id])
+            await send_order_status_email(order, "placed")
+            return order
 
         raise HTTPException(status_code=500, detail="Failed to create order")
 
@@ -163,171 +214,82 @@ async def create_order(order_data: OrderCreateSchema) -> OrderModel:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-async def update_order_status_based_on_time(order: OrderModel) -> str:
-    order_date = datetime.fromisoformat(order.order_date)
-    current_time = datetime.now()
-    time_diff = (current_time - order_date).total_seconds()  # difference in seconds
-
-    # More realistic timing for testing
-    if order.status == "placed" and time_diff >= 30:  # 30 seconds after placed
-        return "shipped"
-    elif order.status == "shipped" and time_diff >= 60:  # 1 minute after placed
-        return "in_transit"
-    elif order.status == "in_transit" and time_diff >= 90:  # 1.5 minutes after placed
-        return "delivered"
-
-    return order.status
-
-
-async def handle_return_status_updates(order: OrderModel) -> str:
-    print("Starting return status update flow")
-    return_date = None
-
-    for history in reversed(order.tracking_history):
-        if history.status == "return_requested":
-            return_date = datetime.fromisoformat(history.timestamp)
-            print(f"Found return request date: {return_date}")
-            break
-
-    if not return_date:
-        print("No return date found")
-        return order.status
-
-    time_diff = (datetime.now() - return_date).total_seconds()  # Convert to minutes
-    print(f"Time difference in minutes: {time_diff}")
-
-    # Return next status based on time difference, regardless of current status
-    if time_diff > 120:  # More than 4 minutes
-        try:
-            # Update product status when return is complete
-            for item in order.items:
-                await product_collection.update_one(
-                    {"_id": item.product_id},
-                    {
-                        "$set": {
-                            "status": "approved",
-                            "buyer_email": None,
-                            "sold_at": None,
-                        }
-                    },
-                )
-            print("Products marked as available")
-            return "returned"
-        except Exception as e:
-            print(f"Error updating product status: {e}")
-            return order.status
-    elif time_diff > 90:  # 90 seconds
-        return "return_in_transit"
-    elif time_diff > 60:  #  60seconds
-        return "return_picked"
-    elif time_diff > 30:  # 30 seconds
-        return "return_pickup_scheduled"
-    else:  # Less than 1 minute
-        return "return_requested"
+def status_update(status: str) -> dict:
+    """Update moving an order to status on a buyer or admin action"""
+    new_tracking = TrackingHistory(
+        status=status,
+        timestamp=datetime.now().isoformat(),
+        description=STATUS_DESCRIPTIONS.get(status, "Status updated"),
+    )
+    update = {
+        "$set": {"status": status, "can_cancel": False, "can_return": False},
+        "$unset": {"lifecycle_lock": "", "lifecycle_locked_until": ""},
+        "$push": {"tracking_history": new_tracking.dict()},
+    }
+    next_at = next_transition_time(status, datetime.utcnow())
+    if next_at:
+        update["$set"]["next_transition_at"] = next_at
+    else:
+        update["$unset"]["next_transition_at"] = ""
+    if status in REVERSED_STATUSES:
+        update["$set"].update(RESTOCK_PENDING)
+    return update
 
 
 async def update_order_status(order_id: str, status: str) -> OrderModel:
+    """
+    Apply a buyer action (cancellation or return request) to an order. Time
+    based progression is done by the lifecycle scheduler, so any other
+    status leaves the order unchanged.
+    """
     try:
-        print(f"Updating order {order_id} to status: {status}")
         order = await get_order_by_id(order_id)
-        print(f"Current order status: {order.status}")
 
-        # Handle cancellation
         if status == "cancelled":
             if not order.can_cancel:
                 raise HTTPException(status_code=400, detail="Order cannot be cancelled")
-
-            print("Processing order cancellation")
-            # Restore products to available state
-            for item in order.items:
-                print(f"Restoring product {item.product_id}")
-                await product_collection.update_one(
-                    {"_id": item.product_id},
-                    {
-                        "$set": {
-                            "status": "approved",
-                            "buyer_email": None,
-                            "sold_at": None,
-                        }
-                    },
-                )
-            new_status = "cancelled"
-            await send_order_status_email(order, "cancelled")
-
-        # Handle automatic status progression
-        elif order.status == "placed" or order.status == "shipped" or order.status == "in_transit":
-            new_status = await update_order_status_based_on_time(order)
-            print(f"Time-based status update: {new_status}")
-            
-            # When status changes to delivered, enable returns
-            if new_status == "delivered":
-                await orders.update_one(
-                    {"_id": order_id},
-                    {"$set": {"can_return": True}}
-                )
-
-        # Handle initial return request
         elif status == "return_requested" and order.status == "delivered":
             if not order.can_return:
                 raise HTTPException(status_code=400, detail="This order is not eligible for return")
-            print("Handling initial return request")
-            new_status = "return_requested"
-
-        # Handle return flow updates
-        elif order.status.startswith("return_"):
-            print("Entering return flow")
-            new_status = await handle_return_status_updates(order)
-            print(f"Status after return flow: {new_status}")
         else:
-            new_status = status
-
-        print(f"New status to be set: {new_status}")
-
-        # Only update if status has changed
-        if new_status != order.status:
-            new_tracking = TrackingHistory(
-                status=new_status,
-                timestamp=datetime.now().isoformat(),
-                description=STATUS_DESCRIPTIONS.get(new_status, "Status updated"),
-            )
-
-            update_data = {
-                "status": new_status,
-                "can_cancel": False,  # Once status changes, can't cancel
-            }
-
-            # Don't disable returns if the order is delivered
-            if new_status != "delivered":
-                update_data["can_return"] = False
-
-            result = await orders.update_one(
-                {"_id": order_id},
-                {
-                    "$set": update_data,
-                    "$push": {"tracking_history": new_tracking.dict()},
-                },
-            )
-
-            if result.modified_count == 0:
-                raise HTTPException(status_code=404, detail="Order not found")
-
-        updated_order = await get_order_by_id(order_id)
-        print(f"Returning order with final status: {updated_order.status}")
-        return updated_order
+            return order
+
+        # Conditional on the status we read, so concurrent requests can't
+        # both apply the transition
+        updated = await orders.find_one_and_update(
+            {"_id": order_id, "status": order.status},
+            status_update(status),
+            return_document=ReturnDocument.AFTER,
+        )
+        if not updated:
+            raise HTTPException(status_code=409, detail="Order status was changed concurrently")
+
+        if status == "cancelled" and await restock_orders([order_id]):
+            await send_order_status_email(order, "cancelled")
+
+        return OrderModel(**updated)
 
     except Exception as e:
-        print(f"Error in update_order_status: {str(e)}")
         logger.error(f"Error updating order status: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
 
-async def restore_cancelled_products(order: OrderModel):
-    """Restore products to available state when order is cancelled"""
-    for item in order.items:
-        await product_collection.update_one(
-            {"_id": item.product_id},
-            {"$set": {"status": "approved", "buyer_email": None, "sold_at": None}},
-        )
+async def cancel_orders(order_ids: List[str]) -> List[str]:
+    """
+    Cancel many orders at once. Orders that can no longer be cancelled are
+    skipped; the rest are updated, restocked and notified in a fixed number
+    of round trips. Returns the ids of the orders cancelled.
+    """
+    await orders.update_many(
+        {"_id": {"$in": order_ids}, "can_cancel": True},
+        status_update("cancelled"),
+    )
+    cancelled = [order for order in await restock_orders(order_ids) if order.status == "cancelled"]
+    await enqueue_emails([
+        message for message in (order_status_message(order, "cancelled") for order in cancelled) if message
+    ])
+    logger.info(f"Cancelled {len(cancelled)} of {len(order_ids)} orders")
+    return [order.id for order in cancelled]
 
 
 def is_valid_status_transition(current_status: str, new_status: str) -> bool:
@@ -343,12 +305,12 @@ def is_valid_status_transition(current_status: str, new_status: str) -> bool:
     return new_status in valid_transitions.get(current_status, [])
 
 
-# Existing functions remain the same
-async def get_user_orders(buyer_email: str) -> List[OrderModel]:
-    """Get all orders for a specific user"""
+async def get_user_orders(buyer_email: str, summary: bool = False) -> List[OrderModel]:
+    """Get all orders for a specific user, newest first"""
     try:
         user_orders = []
-        async for order in orders.find({"buyer_email": buyer_email}):
+        projection = ORDER_SUMMARY_PROJECTION if summary else None
+        async for order in orders.find({"buyer_email": buyer_email}, projection).sort(ORDER_HISTORY_SORT):
             user_orders.append(OrderModel(**order))
         return user_orders
     except Exception as e:
@@ -356,6 +318,38 @@ async def get_user_orders(buyer_email: str) -> List[OrderModel]:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+async def get_user_orders_page(
+    buyer_email: str,
+    limit: int = ORDER_DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    summary: bool = False,
+) -> Tuple[List[OrderModel], Optional[str]]:
+    """
+    One page of a buyer's orders, newest first, and the cursor of the next
+    page (None on the last one). Each page is a range scan on the
+    buyer_email/order_date index however many orders the buyer has.
+    """
+    limit = max(1, min(limit, ORDER_MAX_PAGE_SIZE))
+    query = {"buyer_email": buyer_email}
+    if cursor:
+        order_date, last_id = decode_cursor(cursor)
+        query.update(keyset_filter("order_date", -1, order_date, last_id))
+
+    try:
+        page = await orders.find(
+            query, ORDER_SUMMARY_PROJECTION if summary else None
+        ).sort(ORDER_HISTORY_SORT).limit(limit + 1).to_list(limit + 1)
+    except Exception as e:
+        logger.error(f"Error fetching user orders: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(page[-1]["order_date"], page[-1]["_id"])
+    return [OrderModel(**order) for order in page], next_cursor
+
+
 async def get_order_by_id(order_id: str) -> OrderModel:
     """Get a specific order by ID"""
     try:
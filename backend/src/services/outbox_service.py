@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+import logging
+import os
+import uuid
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from src.config.database import email_outbox
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Attempts before a message is parked as failed
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+# First retry delay; doubles with every failed attempt up to OUTBOX_MAX_BACKOFF_SECONDS
+OUTBOX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+# A claimed message whose dispatcher died is retried after this long
+OUTBOX_LOCK_SECONDS = int(os.getenv("OUTBOX_LOCK_SECONDS", "300"))
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def outbox_message(to: str, subject: str, body: str, dedup_key: Optional[str] = None) -> dict:
+    """
+    Build an outbox document. Messages sharing a dedup_key are only stored
+    once, e.g. one confirmation per order status per recipient.
+    """
+    now = datetime.utcnow()
+    message = {
+        "_id": str(uuid.uuid4()),
+        "to": to,
+        "subject": subject,
+        "body": body,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    }
+    if dedup_key:
+        message["dedup_key"] = dedup_key
+    return message
+
+
+async def enqueue_email(to: str, subject: str, body: str, dedup_key: Optional[str] = None, session=None) -> bool:
+    """
+    Store a message for the dispatcher. Pass the session of the business
+    write's transaction so the email is committed (or dropped) with it.
+    Returns False when a message with the same dedup_key already exists.
+    """
+    try:
+        await email_outbox.insert_one(outbox_message(to, subject, body, dedup_key), session=session)
+        return True
+    except DuplicateKeyError:
+        logger.info(f"Skipping duplicate email {dedup_key} to {to}")
+        return False
+
+
+async def enqueue_emails(messages: List[dict], session=None) -> int:
+    """Store several outbox_message documents in one write; duplicates are skipped"""
+    if not messages:
+        return 0
+    try:
+        result = await email_outbox.insert_many(messages, ordered=False, session=session)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), OUTBOX_MAX_BACKOFF_SECONDS))
+
+
+async def claim_batch(limit: int) -> List[dict]:
+    """
+    Claim up to limit due messages for this dispatcher. Claimed messages
+    move to "sending" with a lock expiry, so concurrent dispatchers never
+    pick up the same message and a crashed one's batch is retried later.
+    """
+    now = datetime.utcnow()
+    due = {
+        "$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "locked_until": {"$lt": now}},
+        ]
+    }
+    candidates = await email_outbox.find(due, {"_id": 1}).sort("next_attempt_at", 1).limit(limit).to_list(limit)
+    if not candidates:
+        return []
+
+    token = str(uuid.uuid4())
+    await email_outbox.update_many(
+        {"_id": {"$in": [message["_id"] for message in candidates]}, **due},
+        {"$set": {
+            "status": "sending",
+            "lock": token,
+            "locked_until": now + timedelta(seconds=OUTBOX_LOCK_SECONDS),
+        }},
+    )
+    return await email_outbox.find({"lock": token}).to_list(limit)
+
+
+async def mark_sent(message_ids: List[str]):
+    if message_ids:
+        await email_outbox.update_many(
+            {"_id": {"$in": message_ids}},
+            {"$set": {"status": "sent", "sent_at": datetime.utcnow()}, "$unset": {"lock": "", "locked_until": ""}},
+        )
+
+
+async def mark_failed(message: dict, error: str):
+    """Schedule a retry with exponential backoff, or park the message once attempts run out"""
+    attempts = message.get("attempts", 0) + 1
+    update = {"attempts": attempts, "last_error": error}
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        update["status"] = "failed"
+        logger.error(f"Giving up on email {message['_id']} to {message['to']}: {error}")
+    else:
+        update["status"] = "pending"
+        update["next_attempt_at"] = datetime.utcnow() + retry_delay(attempts)
+    await email_outbox.update_one(
+        {"_id": message["_id"]}, {"$set": update, "$unset": {"lock": "", "locked_until": ""}}
+    )
+
+
+async def defer(message_ids: List[str], until: datetime):
+    """Put claimed messages back without counting an attempt (rate limited)"""
+    if message_ids:
+        await email_outbox.update_many(
+            {"_id": {"$in": message_ids}},
+            {"$set": {"status": "pending", "next_attempt_at": until}, "$unset": {"lock": "", "locked_until": ""}},
+        )
+
+
+async def get_outbox_stats() -> dict:
+    counts = await email_outbox.aggregate([
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]).to_list(None)
+    return {entry["_id"]: entry["count"] for entry in counts}
@@ -1,10 +1,12 @@
+import asyncio
 import datetime
+from collections import Counter
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.models.product import ProductModel, Category
 import os
-from smtp import Smtp
+from src.services.outbox_service import enqueue_email
 from fastapi import UploadFile, HTTPException
-from src.config.database import product_collection, users
+from src.config.database import product_collection, users, cart
 from fastapi import BackgroundTasks
 from src.schemas.product_schema import (
     UpdateProductRequest,
@@ -14,91 +16,206 @@ from src.schemas.product_schema import (
 )
 from typing import List, Optional
 from bson import ObjectId
-from uuid import uuid4
+from pymongo.errors import BulkWriteError
+from src.utils.pagination import encode_cursor, decode_cursor, keyset_filter
+from src.utils.cart_totals import CART_TOTALS_STAGE, set_line_fields
+from src.services.cache_service import catalog_cache, MISSING
+from src.services.image_service import (
+    UPLOAD_DIRECTORY,
+    build_image_variants,
+    pick_thumbnail,
+    store_upload,
+    release_images,
+)
 
-UPLOAD_DIRECTORY = "./uploaded_images"
+# Approved products that have not been sold; `sold_at: None` also matches a
+# missing field, which keeps the query on the status/sold_at index
+BUYER_VISIBLE_FILTER = {"status": "approved", "sold_at": None}
+
+# Images saved in parallel during a bulk product upload
+UPLOAD_IMAGE_CONCURRENCY = int(os.getenv("UPLOAD_IMAGE_CONCURRENCY", "4"))
+
+CATALOG_DEFAULT_PAGE_SIZE = 24
+CATALOG_MAX_PAGE_SIZE = 100
+
+# Sort options for the catalog: (field, direction); ties are broken on _id
+CATALOG_SORTS = {
+    "newest": ("_id", -1),
+    "price_asc": ("price", 1),
+    "price_desc": ("price", -1),
+}
+
+# Fields buyers may request through the catalog projection
+CATALOG_FIELDS = {
+    "product_name",
+    "description",
+    "price",
+    "seller_id",
+    "category",
+    "images",
+    "status",
+}
 
 if not os.path.exists(UPLOAD_DIRECTORY):
     os.makedirs(UPLOAD_DIRECTORY)
 
 
 async def save_image(image: UploadFile):
-    filename = f"{uuid4()}_{image.filename}"
-    file_path = os.path.join(UPLOAD_DIRECTORY, filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(await image.read())
-    return filename
+    """Store an upload by content hash; re-uploads of the same photo share one file"""
+    return await store_upload(image)
 
 
+async def process_product_images(product_id: str, filenames: List[str]):
+    """Generate resized/WebP variants off the event loop and record them on the product"""
+    variants = await build_image_variants(filenames)
+    if variants:
+        await product_collection.update_one(
+            {"_id": product_id}, {"$push": {"image_variants": {"$each": variants}}}
+        )
+        await invalidate_product_cache(product_id)
 
-async def upload_products(product_data: dict, images: List[UploadFile],background_tasks: BackgroundTasks):
-    try:
-        # Save images
-        image_filenames = []
-        for image in images:
-            if image:
-                filename = await save_image(image)
-                image_filenames.append(filename)
 
-        # Create product data
-        validated_data = {
-            "product_name": product_data["product_name"],
-            "description": product_data["description"],
-            "price": float(product_data["price"]),
-            "category": product_data["category"],
-            "seller_id": product_data["seller_id"],
-            "images": image_filenames,
-            "status": "pending",
-            "admin_comments": None,
-            "reviewed_at": None,
-        }
+async def _save_row_images(images: List[UploadFile], semaphore: asyncio.Semaphore):
+    """Save one row's images concurrently; on failure release the ones already stored"""
+
+    async def save_bounded(image: UploadFile):
+        async with semaphore:
+            return await save_image(image)
 
-        # Create ProductModel instance
-        product = ProductModel(**validated_data)
+    saved = await asyncio.gather(
+        *[save_bounded(image) for image in images if image], return_exceptions=True
+    )
+    errors = [result for result in saved if isinstance(result, BaseException)]
+    if errors:
+        await release_images([name for name in saved if isinstance(name, str)])
+        raise errors[0]
+    return list(saved)
 
-        # Insert into database
-        result = await product_collection.insert_one(product.dict(by_alias=True))
 
-        if result.inserted_id:
-            created_product = await product_collection.find_one(
-                {"_id": str(result.inserted_id)}
+async def bulk_upload_products(
+    rows: List[dict],
+    row_images: List[List[UploadFile]],
+    background_tasks: BackgroundTasks,
+):
+    """
+    Ingest a batch of seller products.
+    Rows are validated before any image is written, images are saved with
+    bounded concurrency, valid rows are written with a single insert_many,
+    and sellers/admins get one digest email per batch.
+    Returns the created products and a result entry per row.
+    """
+    results = [None] * len(rows)
+
+    # Validate every row before doing any work
+    candidates = []
+    for index, row in enumerate(rows):
+        try:
+            product = ProductModel(
+                product_name=row["product_name"],
+                description=row["description"],
+                price=float(row["price"]),
+                category=row["category"],
+                seller_id=row["seller_id"],
+                images=[],
+                status="pending",
+                admin_comments=None,
+                reviewed_at=None,
             )
-            
-            # Fetch seller details for email notification
-            seller = await users.find_one({"business_name": product_data["seller_id"]})
-            #print("seller", seller)
-            # Send confirmation email to seller
-            if seller and seller.get("email"):
-                background_tasks.add_task(
-                    Smtp.trigger_email,  # Using the static method directly
-                    seller["email"],
-                    "Product Submission Confirmation",
-                    f"Your product '{product_data['product_name']}' has been submitted for review. "
-                    f"You can track its status in your seller dashboard."
-                )
-                
-
-            # Send notification to all admins
-            admin_users = users.find({"role": "admin"})
-            async for admin in admin_users:
-                if admin.get("email"):
-                    background_tasks.add_task(
-                        Smtp.trigger_email,
-                        admin["email"],
-                        "New Product Submission",
-                        f"A new product '{product_data['product_name']}' has been submitted for review by seller "
-                        f"{product_data['seller_id']}. Please review it in the admin dashboard."
-                    )
-
-            return ProductModel(**created_product)
-
-        raise HTTPException(status_code=500, detail="Failed to create product")
-
-    except HTTPException as he:
-        raise he
-    except Exception as e:
-        print(f"Error in upload_products: {str(e)}")
-        raise HTTPException(status_code=400, detail=str(e))
+            candidates.append((index, product))
+        except Exception as e:
+            results[index] = {"row": index, "status": "error", "error": str(e)}
+
+    # Save images for all valid rows, at most UPLOAD_IMAGE_CONCURRENCY at a time
+    semaphore = asyncio.Semaphore(UPLOAD_IMAGE_CONCURRENCY)
+    saved_images = await asyncio.gather(
+        *[_save_row_images(row_images[index], semaphore) for index, _ in candidates],
+        return_exceptions=True,
+    )
+
+    to_insert = []
+    for (index, product), images in zip(candidates, saved_images):
+        if isinstance(images, BaseException):
+            results[index] = {"row": index, "status": "error", "error": str(images)}
+            if isinstance(images, HTTPException):
+                # e.g. 413 for an oversized image, kept for the single upload
+                results[index].update(error=images.detail, status_code=images.status_code)
+        else:
+            product.images = images
+            to_insert.append((index, product))
+
+    created = []
+    if to_insert:
+        failed_positions = {}
+        try:
+            await product_collection.insert_many(
+                [product.dict(by_alias=True) for _, product in to_insert], ordered=False
+            )
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                failed_positions[write_error["index"]] = write_error.get("errmsg", "Insert failed")
+
+        for position, (index, product) in enumerate(to_insert):
+            if position in failed_positions:
+                await release_images(product.images)
+                results[index] = {
+                    "row": index,
+                    "status": "error",
+                    "error": failed_positions[position],
+                }
+                continue
+            created.append(product)
+            results[index] = {"row": index, "status": "created", "product_id": product.id}
+            if product.images:
+                background_tasks.add_task(process_product_images, product.id, product.images)
+
+    if created:
+        await _notify_product_submissions(created)
+
+    return {"products": created, "results": results}
+
+
+async def _notify_product_submissions(products: List[ProductModel]):
+    """One digest per seller and one per admin for a batch of submissions"""
+    by_seller = {}
+    for product in products:
+        by_seller.setdefault(product.seller_id, []).append(product.product_name)
+
+    sellers = users.find(
+        {"business_name": {"$in": list(by_seller)}}, {"email": 1, "business_name": 1}
+    )
+    async for seller in sellers:
+        names = by_seller.get(seller.get("business_name"), [])
+        if seller.get("email") and names:
+            await enqueue_email(
+                seller["email"],
+                "Product Submission Confirmation",
+                f"{len(names)} product(s) have been submitted for review:\n"
+                + "\n".join(f"- {name}" for name in names)
+                + "\nYou can track their status in your seller dashboard.",
+            )
+
+    summary = "\n".join(
+        f"- {seller_id}: {', '.join(names)}" for seller_id, names in by_seller.items()
+    )
+    admin_users = users.find({"role": "admin"}, {"email": 1})
+    async for admin in admin_users:
+        if admin.get("email"):
+            await enqueue_email(
+                admin["email"],
+                "New Product Submissions",
+                f"{len(products)} new product(s) have been submitted for review:\n"
+                f"{summary}\nPlease review them in the admin dashboard.",
+            )
+
+
+async def upload_products(product_data: dict, images: List[UploadFile],background_tasks: BackgroundTasks):
+    """Submit a single product for review"""
+    outcome = await bulk_upload_products([product_data], [images], background_tasks)
+    result = outcome["results"][0]
+    if result["status"] != "created":
+        raise HTTPException(status_code=result.get("status_code", 400), detail=result["error"])
+    return outcome["products"][0]
+
 
 async def get_seller_products_by_id(seller_id: str):
     products = []
@@ -114,19 +231,92 @@ async def get_unapproved_products():
     return products
 
 
+async def invalidate_product_cache(*product_ids: str):
+    """Drop cached listings and the given products after a write"""
+    await catalog_cache.invalidate("approved", *[f"product:{pid}" for pid in product_ids])
+    await catalog_cache.invalidate_prefix("page:")
+
+
 async def get_approved_products():
     """Products visible to buyers"""
+    cached = await catalog_cache.get("approved")
+    if cached is not MISSING:
+        return cached
+
     products = []
-    async for product in product_collection.find(
-        {
-            "status": "approved",
-            "$or": [{"sold_at": {"$exists": False}}, {"sold_at": None}],
-        }
-    ):
+    async for product in product_collection.find(BUYER_VISIBLE_FILTER):
         products.append(product)
+    await catalog_cache.set("approved", products)
     return products
 
 
+async def get_catalog_page(
+    limit: int = CATALOG_DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    sort: str = "newest",
+):
+    """
+    One page of buyer-visible products using keyset pagination.
+    Pages are ordered by the chosen sort key with _id as tie breaker, so
+    each page is a single range scan on the status/sold_at/<sort key> index.
+    """
+    if sort not in CATALOG_SORTS:
+        raise HTTPException(status_code=400, detail=f"Unsupported sort: {sort}")
+    sort_field, direction = CATALOG_SORTS[sort]
+    limit = max(1, min(limit, CATALOG_MAX_PAGE_SIZE))
+
+    cache_key = f"page:{sort}:{limit}:{cursor or ''}:{','.join(sorted(fields or []))}"
+    cached = await catalog_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+
+    query = dict(BUYER_VISIBLE_FILTER)
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor)
+        query.update(keyset_filter(sort_field, direction, sort_value, last_id))
+
+    projection = None
+    if fields:
+        unknown = set(fields) - CATALOG_FIELDS
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+            )
+        # The sort key is always returned so the next cursor can be built
+        projection = {field: 1 for field in fields}
+        projection[sort_field] = 1
+        if "images" in projection:
+            projection["image_variants"] = 1
+
+    sort_spec = [(sort_field, direction)]
+    if sort_field != "_id":
+        sort_spec.append(("_id", direction))
+
+    products = (
+        await product_collection.find(query, projection)
+        .sort(sort_spec)
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+
+    # Grids show the small variant instead of the full-size upload
+    for product in products:
+        if "images" in product:
+            product["thumbnail"] = pick_thumbnail(product)
+
+    page = {"products": products, "next_cursor": next_cursor}
+    await catalog_cache.set(cache_key, page)
+    return page
+
+
 async def get_seller_products(seller_id: str):
     """All products visible to seller including rejected ones"""
     products = []
@@ -141,7 +331,11 @@ async def get_seller_products(seller_id: str):
 
 
 async def fetch_product_by_id(product_id: str):  # Changed function name
-    product = await product_collection.find_one({"_id": product_id})
+    cache_key = f"product:{product_id}"
+    product = await catalog_cache.get(cache_key)
+    if product is MISSING:
+        product = await product_collection.find_one({"_id": product_id})
+        await catalog_cache.set(cache_key, product)
     if product:
         return ProductModel(**product)
     return None
@@ -155,12 +349,24 @@ async def update_product_status(product_id: str, isApproved: dict):
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    await invalidate_product_cache(product_id)
     updated_product = await product_collection.find_one({"_id": product_id})
     return ProductModel(**updated_product)
 
 
+async def refresh_cart_prices(product_id: str, price: float):
+    """Re-snapshot a product's price on every cart holding it and recompute those carts' totals"""
+    await cart.update_many(
+        {"products.productId": product_id},
+        [set_line_fields(product_id, {"price": price}), CART_TOTALS_STAGE],
+    )
+
+
 async def update_product_info(
-    product_id: str, product: dict, new_images: Optional[List[UploadFile]] = None
+    product_id: str,
+    product: dict,
+    new_images: Optional[List[UploadFile]] = None,
+    background_tasks: Optional[BackgroundTasks] = None,
 ):
     update_data = {
         "product_name": product["product_name"],
@@ -170,12 +376,17 @@ async def update_product_info(
     }
 
     # Handle images
+    uploaded_filenames = []
+    previous_images = []
     if new_images:
+        current = await product_collection.find_one({"_id": product_id}, {"images": 1})
+        previous_images = (current or {}).get("images", [])
         image_filenames = []
         for image in new_images:
             if image:
                 filename = await save_image(image)
                 image_filenames.append(filename)
+        uploaded_filenames = list(image_filenames)
 
         # Combine with existing images
         if product.get("images"):
@@ -188,8 +399,24 @@ async def update_product_info(
     )
 
     if result.modified_count == 0:
+        await release_images(uploaded_filenames)
         raise HTTPException(status_code=404, detail="Product not found")
 
+    if uploaded_filenames:
+        # Images dropped from the listing no longer hold a reference
+        kept = Counter(update_data["images"])
+        removed = []
+        for name in previous_images:
+            if kept[name]:
+                kept[name] -= 1
+            else:
+                removed.append(name)
+        await release_images(removed)
+
+    await invalidate_product_cache(product_id)
+    await refresh_cart_prices(product_id, update_data["price"])
+    if uploaded_filenames and background_tasks is not None:
+        background_tasks.add_task(process_product_images, product_id, uploaded_filenames)
     updated_product = await product_collection.find_one({"_id": product_id})
     return updated_product
 
@@ -224,6 +451,8 @@ async def resubmit_product(product_id: str):
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="Failed to resubmit product")
 
+        await invalidate_product_cache(product_id)
+
         # Return updated product
         updated_product = await product_collection.find_one({"_id": product_id})
         return ProductModel(**updated_product)
@@ -235,16 +464,19 @@ async def resubmit_product(product_id: str):
 
 # New function to delete seller's product
 async def delete_seller_product(product_id: str, seller_id: str):
-    result = await product_collection.delete_one(
+    deleted = await product_collection.find_one_and_delete(
         {
             "_id": product_id,
             "seller_id": seller_id,  # Ensure seller can only delete their own products
-        }
+        },
+        projection={"images": 1},
     )
 
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Product not found or unauthorized")
 
+    await release_images(deleted.get("images", []))
+    await invalidate_product_cache(product_id)
     return {"message": "Product deleted successfully"}
 
 
@@ -262,6 +494,8 @@ async def review_product(product_id: str, review_data: dict, background_tasks: B
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    await invalidate_product_cache(product_id)
+
     # Fetch updated product
     updated_product = await product_collection.find_one({"_id": product_id})
     
@@ -278,8 +512,7 @@ async def review_product(product_id: str, review_data: dict, background_tasks: B
         
         if not review_data["isApproved"]:
             message += "\nYou can make the suggested changes and resubmit the product for review."
-        background_tasks.add_task(          
-            Smtp.trigger_email,
+        await enqueue_email(
             seller["email"],
             f"Product {status.capitalize()}",
             message
@@ -301,6 +534,7 @@ async def update_product_sold_status(product_id: str, buyer_email: str):
         )
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Product not found")
+        await invalidate_product_cache(product_id)
         return True
     except Exception as e:
         print(f"Error updating product sold status: {str(e)}")
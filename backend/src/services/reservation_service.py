@@ -0,0 +1,117 @@
+from fastapi import HTTPException
+from datetime import datetime, timedelta
+from typing import List, Optional
+import asyncio
+import logging
+import os
+import uuid
+from src.config.database import product_collection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How long a buyer's hold on an item lasts before others may claim it
+RESERVATION_TTL_MINUTES = int(os.getenv("RESERVATION_TTL_MINUTES", "15"))
+# Seconds between sweeps releasing expired holds
+RESERVATION_SWEEP_SECONDS = int(os.getenv("RESERVATION_SWEEP_SECONDS", "60"))
+
+# Hold fields are unset on release so the sparse reserved_until index stays small
+RESERVATION_FIELDS = {"reserved_by": "", "reserved_until": "", "reservation_id": ""}
+
+
+def claimable_filter(product_ids: List[str], email: str, now: datetime) -> dict:
+    """Products still for sale and either unheld, held by this buyer, or held past expiry"""
+    return {
+        "_id": {"$in": product_ids},
+        "status": "approved",
+        "sold_at": None,
+        "$or": [
+            {"reserved_until": None},
+            {"reserved_until": {"$lt": now}},
+            {"reserved_by": email},
+        ],
+    }
+
+
+async def reserve_products(email: str, product_ids: List[str]) -> datetime:
+    """
+    Atomically hold every product for the buyer until the returned expiry.
+    The conditional update_many only claims items that are still free, so two
+    buyers can never hold the same item; items the buyer already holds have
+    their hold extended. If any item is unavailable the holds taken by this
+    call are dropped, earlier ones are left alone, and a 409 lists the
+    conflicting items.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    if not product_ids:
+        raise HTTPException(status_code=400, detail="No products to reserve")
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=RESERVATION_TTL_MINUTES)
+    token = str(uuid.uuid4())
+    for_sale = {"_id": {"$in": product_ids}, "status": "approved", "sold_at": None}
+    # Holds the buyer already has are only extended and keep their own
+    # reservation_id, so a conflict below drops only what this call took
+    own_holds = {**for_sale, "reserved_by": email, "reserved_until": {"$gte": now}, "reservation_id": {"$ne": token}}
+
+    result = await product_collection.update_many(
+        {**for_sale, "$or": [{"reserved_until": None}, {"reserved_until": {"$lt": now}}]},
+        {"$set": {
+            "reserved_by": email,
+            "reserved_until": expires_at,
+            "reservation_id": token,
+        }},
+    )
+    held = result.matched_count
+    if held < len(product_ids) and await product_collection.count_documents(own_holds) == len(product_ids) - held:
+        extended = await product_collection.update_many(own_holds, {"$set": {"reserved_until": expires_at}})
+        held += extended.matched_count
+    if held == len(product_ids):
+        return expires_at
+
+    available = set(await product_collection.distinct(
+        "_id", {"_id": {"$in": product_ids}, "reserved_by": email, "reserved_until": {"$gte": now}}
+    ))
+    unavailable = [product_id for product_id in product_ids if product_id not in available]
+    await product_collection.update_many(
+        {"reservation_id": token},
+        {"$unset": RESERVATION_FIELDS},
+    )
+    logger.info(f"Reservation conflict for {email}: {unavailable}")
+    raise HTTPException(
+        status_code=409,
+        detail={"message": "Some products are no longer available", "product_ids": unavailable},
+    )
+
+
+async def release_reservations(email: str, product_ids: Optional[List[str]] = None) -> int:
+    """Drop the buyer's holds, on the given products or on all of them"""
+    query = {"reserved_by": email}
+    if product_ids is not None:
+        query["_id"] = {"$in": product_ids}
+    result = await product_collection.update_many(
+        query,
+        {"$unset": RESERVATION_FIELDS},
+    )
+    return result.modified_count
+
+
+async def release_expired_reservations() -> int:
+    """Clear holds whose expiry has passed"""
+    result = await product_collection.update_many(
+        {"reserved_until": {"$lt": datetime.utcnow()}},
+        {"$unset": RESERVATION_FIELDS},
+    )
+    if result.modified_count:
+        logger.info(f"Released {result.modified_count} expired reservations")
+    return result.modified_count
+
+
+async def run_reservation_sweeper(interval: int = RESERVATION_SWEEP_SECONDS):
+    """Periodically release expired holds until cancelled"""
+    while True:
+        try:
+            await release_expired_reservations()
+        except Exception as e:
+            logger.error(f"Error sweeping reservations: {str(e)}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,60 @@
+from datetime import datetime
+from typing import List, Optional
+import logging
+from src.config.database import orders, product_collection
+from src.models.order import OrderModel
+from src.services.product_service import invalidate_product_cache
+from src.services.rollup_service import apply_orders_to_rollups
+from src.utils.markers import claim_marked, complete_marked
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Set together with the cancelled/returned status; restock_orders consumes it
+RESTOCK_PENDING = {"restock_pending": True}
+
+
+async def restock_products(orders_: List[OrderModel]):
+    """
+    Make the products of several orders available again with one write.
+    Each product is only restored while it is still sold to that order's
+    buyer, so a product that has been bought again is left alone.
+    """
+    product_ids = {}
+    for order in orders_:
+        product_ids.setdefault(order.buyer_email, []).extend(item.product_id for item in order.items)
+    if not product_ids:
+        return
+
+    await product_collection.update_many(
+        {"$or": [
+            {"_id": {"$in": ids}, "buyer_email": buyer_email}
+            for buyer_email, ids in product_ids.items()
+        ]},
+        {"$set": {"status": "approved", "buyer_email": None, "sold_at": None}},
+    )
+    await invalidate_product_cache(*[pid for ids in product_ids.values() for pid in ids])
+
+
+async def restock_orders(order_ids: Optional[List[str]] = None, limit: Optional[int] = None) -> List[OrderModel]:
+    """
+    Restock orders that were cancelled or returned and are not restocked
+    yet, either the given ones or up to limit of any, and take their sales
+    out of the seller rollups. The pending marker is claimed with a token,
+    so concurrent calls never restock the same order, and only dropped once
+    both writes succeeded; an order whose restock failed midway is picked
+    up again by a later call. Returns the orders restocked by this call.
+    """
+    if order_ids is not None and not order_ids:
+        return []
+
+    token, claimed = await claim_marked(orders, "restock", order_ids, limit)
+    if not claimed:
+        return []
+
+    restocked = [OrderModel(**order) for order in claimed]
+    await restock_products(restocked)
+    await apply_orders_to_rollups(restocked, sign=-1)
+    await complete_marked(orders, "restock", token, {"restocked_at": datetime.utcnow()})
+    logger.info(f"Restocked {len(restocked)} orders")
+    return restocked
@@ -0,0 +1,182 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+from pymongo import UpdateOne
+from src.config.database import orders, product_collection, seller_sales_rollups, seller_sales_summary
+from src.models.order import OrderModel
+from src.utils.markers import claim_marked, complete_marked
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sales kept on each seller's summary document for the dashboard
+RECENT_SALES_LIMIT = 10
+# Orders whose sales no longer count towards a seller's figures
+REVERSED_STATUSES = ("cancelled", "returned")
+# Orders replayed per bulk write when rebuilding
+REBUILD_BATCH_SIZE = 500
+# Set on a new order; apply_pending_rollups consumes it
+ROLLUP_PENDING = {"rollup_pending": True}
+
+
+async def product_sellers(product_ids: List[str], session=None) -> Dict[str, dict]:
+    """Seller and category of each product, keyed by product id"""
+    products = await product_collection.find(
+        {"_id": {"$in": product_ids}}, {"seller_id": 1, "category": 1}, session=session
+    ).to_list(None)
+    return {str(product["_id"]): product for product in products}
+
+
+def unstamped_product_ids(orders_: List[OrderModel]) -> List[str]:
+    """Products of items placed before seller_id was stamped onto order items"""
+    return list({
+        item.product_id for order in orders_ for item in order.items if not item.seller_id
+    })
+
+
+def item_seller(item, products: Dict[str, dict]):
+    """(seller_id, category) of an order item, falling back to the product for old orders"""
+    if item.seller_id:
+        return item.seller_id, item.category
+    product = products.get(item.product_id) or {}
+    return product.get("seller_id"), product.get("category")
+
+
+def rollup_operations(order: OrderModel, products: Dict[str, dict], sign: int = 1):
+    """
+    Counter updates for one order: one document per seller, day and
+    category, plus the seller's recent-sales list. sign=-1 reverses an
+    order that was cancelled or returned. products only needs to cover
+    items without a stamped seller_id.
+    """
+    ordered_at = datetime.fromisoformat(order.order_date)
+    day = ordered_at.strftime("%Y-%m-%d")
+
+    counters = {}
+    recent = {}
+    for item in order.items:
+        seller_id, category = item_seller(item, products)
+        if not seller_id:
+            continue
+        total = item.price * item.quantity
+        counter = counters.setdefault((seller_id, category), {"revenue": 0.0, "quantity": 0})
+        counter["revenue"] += total
+        counter["quantity"] += item.quantity
+        recent.setdefault(seller_id, []).append({
+            "order_id": order.id,
+            "order_date": order.order_date,
+            "product_name": item.product_name,
+            "quantity": item.quantity,
+            "price": item.price,
+            "total": total,
+            "category": category,
+        })
+
+    rollups = [
+        UpdateOne(
+            {"_id": f"{seller_id}:{day}:{category}"},
+            {
+                "$inc": {
+                    "revenue": sign * counter["revenue"],
+                    "quantity": sign * counter["quantity"],
+                    "orders": sign,
+                },
+                "$setOnInsert": {
+                    "seller_id": seller_id,
+                    "day": day,
+                    "year": ordered_at.year,
+                    "month": ordered_at.month,
+                    "category": category,
+                },
+            },
+            upsert=True,
+        )
+        for (seller_id, category), counter in counters.items()
+    ]
+    if sign > 0:
+        summaries = [
+            UpdateOne(
+                {"_id": seller_id},
+                {"$push": {"recent_sales": {
+                    "$each": sales,
+                    "$sort": {"order_date": -1},
+                    "$slice": RECENT_SALES_LIMIT,
+                }}},
+                upsert=True,
+            )
+            for seller_id, sales in recent.items()
+        ]
+    else:
+        summaries = [
+            UpdateOne({"_id": seller_id}, {"$pull": {"recent_sales": {"order_id": order.id}}})
+            for seller_id in recent
+        ]
+    return rollups, summaries
+
+
+async def apply_orders_to_rollups(orders_: List[OrderModel], sign: int = 1, session=None):
+    """Add several orders' sales to the rollups in one write per collection, or remove them with sign=-1"""
+    missing = unstamped_product_ids(orders_)
+    products = await product_sellers(missing, session=session) if missing else {}
+    rollups, summaries = [], []
+    for order in orders_:
+        order_rollups, order_summaries = rollup_operations(order, products, sign)
+        rollups.extend(order_rollups)
+        summaries.extend(order_summaries)
+    if rollups:
+        await seller_sales_rollups.bulk_write(rollups, ordered=False, session=session)
+    if summaries:
+        await seller_sales_summary.bulk_write(summaries, ordered=False, session=session)
+
+
+async def apply_order_to_rollups(order: OrderModel, sign: int = 1, session=None):
+    """Add an order's sales to its sellers' rollups, or remove them with sign=-1"""
+    await apply_orders_to_rollups([order], sign, session=session)
+
+
+async def apply_pending_rollups(order_ids: Optional[List[str]] = None, limit: Optional[int] = None) -> int:
+    """
+    Add the sales of orders still marked rollup_pending to the rollups,
+    either the given orders or up to limit of any. The rollups are written
+    outside the order's transaction, so their shared documents never make
+    a checkout conflict; the marker is only dropped once they are written,
+    and orders left pending by a failure are applied by a later call.
+    Returns how many orders were applied.
+    """
+    token, claimed = await claim_marked(orders, "rollup", order_ids, limit)
+    if not claimed:
+        return 0
+    await apply_orders_to_rollups([OrderModel(**order) for order in claimed])
+    await complete_marked(orders, "rollup", token)
+    return len(claimed)
+
+
+async def rebuild_rollups() -> int:
+    """Recompute every rollup from the order history; returns the number of orders replayed"""
+    await seller_sales_rollups.delete_many({})
+    await seller_sales_summary.delete_many({})
+    # The replay below covers orders still waiting for their rollups
+    await orders.update_many(
+        ROLLUP_PENDING, {"$unset": {"rollup_pending": "", "rollup_token": "", "rollup_claimed_until": ""}}
+    )
+
+    replayed = 0
+    batch = []
+    # Cancelled or returned orders still pending a restock are replayed
+    # too, since the restock will take their sales out again
+    cursor = orders.find({"$or": [
+        {"status": {"$nin": list(REVERSED_STATUSES)}},
+        {"restock_pending": True},
+    ]}).batch_size(REBUILD_BATCH_SIZE)
+    async for document in cursor:
+        batch.append(OrderModel(**document))
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            await apply_orders_to_rollups(batch)
+            replayed += len(batch)
+            batch = []
+    if batch:
+        await apply_orders_to_rollups(batch)
+        replayed += len(batch)
+    logger.info(f"Rebuilt seller rollups from {replayed} orders")
+    return replayed
+
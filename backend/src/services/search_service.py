@@ -0,0 +1,149 @@
+from fastapi import HTTPException
+from typing import Optional
+from src.config.database import product_collection
+from src.services.product_service import BUYER_VISIBLE_FILTER
+
+SEARCH_DEFAULT_PAGE_SIZE = 24
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Lower bounds of the price facet buckets; anything above the last one
+# falls into the open-ended bucket
+PRICE_BUCKET_BOUNDARIES = [0, 25, 50, 100, 200, 500]
+OPEN_PRICE_BUCKET = "open"
+
+SEARCH_RESULT_FIELDS = {
+    "product_name": 1,
+    "description": 1,
+    "price": 1,
+    "category": 1,
+    "seller_id": 1,
+    "images": 1,
+}
+
+
+def build_search_match(
+    q: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    seller_id: Optional[str] = None,
+) -> dict:
+    """
+    Build the $match stage shared by the results and the facet counts. The
+    category filter is applied per facet instead, so the category counts
+    still offer the other categories once one is selected.
+    """
+    match = dict(BUYER_VISIBLE_FILTER)
+    if q:
+        match["$text"] = {"$search": q}
+    if seller_id:
+        match["seller_id"] = seller_id
+    if min_price is not None or max_price is not None:
+        price = {}
+        if min_price is not None:
+            price["$gte"] = min_price
+        if max_price is not None:
+            price["$lte"] = max_price
+        match["price"] = price
+    return match
+
+
+def format_price_buckets(buckets: list) -> list:
+    """Turn $bucket output into explicit min/max ranges"""
+    upper_bounds = dict(zip(PRICE_BUCKET_BOUNDARIES, PRICE_BUCKET_BOUNDARIES[1:]))
+    ranges = []
+    for bucket in buckets:
+        if bucket["_id"] == OPEN_PRICE_BUCKET:
+            ranges.append(
+                {"min": PRICE_BUCKET_BOUNDARIES[-1], "max": None, "count": bucket["count"]}
+            )
+        else:
+            ranges.append(
+                {
+                    "min": bucket["_id"],
+                    "max": upper_bounds[bucket["_id"]],
+                    "count": bucket["count"],
+                }
+            )
+    return ranges
+
+
+async def search_products(
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    seller_id: Optional[str] = None,
+    page: int = 1,
+    limit: int = SEARCH_DEFAULT_PAGE_SIZE,
+):
+    """
+    Search buyer-visible products.
+    Results, total and facet counts are computed in a single $facet aggregation.
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot exceed max_price")
+
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    page = max(1, page)
+
+    pipeline = [{"$match": build_search_match(q, min_price, max_price, seller_id)}]
+    in_category = [{"$match": {"category": category}}] if category else []
+
+    result_fields = dict(SEARCH_RESULT_FIELDS)
+    if q:
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+        sort = {"score": -1, "_id": -1}
+        result_fields["score"] = 1
+    else:
+        sort = {"_id": -1}
+
+    pipeline.append(
+        {
+            "$facet": {
+                "results": in_category + [
+                    {"$sort": sort},
+                    {"$skip": (page - 1) * limit},
+                    {"$limit": limit},
+                    {"$project": result_fields},
+                ],
+                "total": in_category + [{"$count": "count"}],
+                "categories": [
+                    {"$group": {"_id": "$category", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1, "_id": 1}},
+                ],
+                "price_ranges": in_category + [
+                    {
+                        "$bucket": {
+                            "groupBy": "$price",
+                            "boundaries": PRICE_BUCKET_BOUNDARIES,
+                            "default": OPEN_PRICE_BUCKET,
+                            "output": {"count": {"$sum": 1}},
+                        }
+                    }
+                ],
+            }
+        }
+    )
+
+    try:
+        facets = await product_collection.aggregate(pipeline).to_list(1)
+    except Exception as e:
+        print(f"Error in search_products: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    facets = facets[0] if facets else {}
+    total = facets.get("total") or [{"count": 0}]
+
+    return {
+        "results": facets.get("results", []),
+        "total": total[0]["count"],
+        "page": page,
+        "limit": limit,
+        "facets": {
+            "categories": [
+                {"category": c["_id"], "count": c["count"]}
+                for c in facets.get("categories", [])
+            ],
+            "price_ranges": format_price_buckets(facets.get("price_ranges", [])),
+        },
+    }
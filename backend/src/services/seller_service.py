@@ -1,6 +1,6 @@
 from fastapi import HTTPException
-from src.config.database import orders, product_collection
-from datetime import datetime
+from src.config.database import product_collection, seller_sales_rollups, seller_sales_summary
+import asyncio
 
 async def get_seller_analytics(seller_id: str):
     try:
@@ -16,75 +16,46 @@ async def get_seller_analytics(seller_id: str):
         stats = {stat["_id"]: stat["count"] for stat in product_stats}
         total_products = sum(stats.values())
 
-        # Get recent sales
-        recent_sales = await orders.aggregate([
-            {"$match": {"items.product_id": {"$in": await get_seller_product_ids(seller_id)}}},
-            {"$unwind": "$items"},
-            {"$lookup": {
-                "from": "ProductDetails",
-                "localField": "items.product_id",
-                "foreignField": "_id",
-                "as": "product_info"
-            }},
-            {"$unwind": "$product_info"},
-            {"$match": {"product_info.seller_id": seller_id}},
-            {"$project": {
-                "order_date": 1,
-                "product_name": "$items.product_name",
-                "quantity": "$items.quantity",
-                "price": "$items.price",
-                "total": {"$multiply": ["$items.price", "$items.quantity"]},
-                "category": "$product_info.category"
-            }},
-            {"$sort": {"order_date": -1}},
-            {"$limit": 10}  # Get last 10 sales
-        ]).to_list(None)
-        if(len(recent_sales) >5): 
-            recent_sales = recent_sales[-5:]
-        # Get monthly revenue trend
-        revenue_trend = await orders.aggregate([
-            {"$match": {"items.product_id": {"$in": await get_seller_product_ids(seller_id)}}},
-            {"$unwind": "$items"},
-            {"$lookup": {
-                "from": "ProductDetails",
-                "localField": "items.product_id",
-                "foreignField": "_id",
-                "as": "product_info"
-            }},
-            {"$unwind": "$product_info"},
-            {"$match": {"product_info.seller_id": seller_id}},
-            {"$group": {
-                "_id": {
-                    "year": {"$year": {"$dateFromString": {"dateString": "$order_date"}}},
-                    "month": {"$month": {"$dateFromString": {"dateString": "$order_date"}}}
-                },
-                "revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}
-            }},
-            {"$sort": {"_id.year": 1, "_id.month": 1}}
-        ]).to_list(None)
+        # Sales figures come from the rollups kept by rollup_service, one
+        # document per seller, day and category
+        rollups, summary = await asyncio.gather(
+            seller_sales_rollups.aggregate([
+                {"$match": {"seller_id": seller_id}},
+                {"$facet": {
+                    "totals": [
+                        {"$group": {
+                            "_id": None,
+                            "quantity": {"$sum": "$quantity"},
+                            "revenue": {"$sum": "$revenue"}
+                        }}
+                    ],
+                    "revenue_trend": [
+                        {"$group": {
+                            "_id": {"year": "$year", "month": "$month"},
+                            "revenue": {"$sum": "$revenue"}
+                        }},
+                        {"$sort": {"_id.year": 1, "_id.month": 1}}
+                    ],
+                    "category_sales": [
+                        {"$group": {
+                            "_id": "$category",
+                            "total_quantity": {"$sum": "$quantity"},
+                            "total_revenue": {"$sum": "$revenue"}
+                        }},
+                        {"$match": {"total_quantity": {"$gt": 0}}}
+                    ]
+                }}
+            ]).to_list(None),
+            seller_sales_summary.find_one({"_id": seller_id}, {"recent_sales": {"$slice": 5}})
+        )
+        facets = rollups[0] if rollups else {}
+        totals = facets.get("totals") or [{"quantity": 0, "revenue": 0}]
+        recent_sales = (summary or {}).get("recent_sales", [])
+        revenue_trend = facets.get("revenue_trend", [])
+        category_sales = facets.get("category_sales", [])
 
-
-        category_sales = await orders.aggregate([
-            {"$match": {"items.product_id": {"$in": await get_seller_product_ids(seller_id)}}},
-            {"$unwind": "$items"},
-            {"$lookup": {
-                "from": "ProductDetails",
-                "localField": "items.product_id",
-                "foreignField": "_id",
-                "as": "product_info"
-            }},
-            {"$unwind": "$product_info"},
-            {"$match": {"product_info.seller_id": seller_id}},
-            {"$group": {
-                "_id": "$product_info.category",
-                "total_quantity": {"$sum": "$items.quantity"},
-                "total_revenue": {"$sum": {"$multiply": ["$items.price", "$items.quantity"]}}
-            }}
-        ]).to_list(None)
-
-        # Calculate totals
-        total_sales = sum(sale["quantity"] for sale in recent_sales)
-        total_revenue = sum(sale["total"] for sale in recent_sales)
+        total_sales = totals[0]["quantity"]
+        total_revenue = totals[0]["revenue"]
 
         return {
             "stats": {
@@ -101,10 +72,3 @@ async def get_seller_analytics(seller_id: str):
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
-async def get_seller_product_ids(seller_id: str):
-    products = await product_collection.find(
-        {"seller_id": seller_id},
-        {"_id": 1}
-    ).to_list(None)
-    return [str(p["_id"]) for p in products]
\ No newline at end of file
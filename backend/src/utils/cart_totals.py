@@ -0,0 +1,73 @@
+"""Update pipelines that keep a cart's denormalized subtotal and item_count in step with its lines"""
+
+# Recomputes subtotal and item_count from the cart's lines and their price
+# snapshots; lines whose product was deleted or sold add nothing
+CART_TOTALS_STAGE = {
+    "$set": {
+        "subtotal": {
+            "$sum": {
+                "$map": {
+                    "input": {"$ifNull": ["$products", []]},
+                    "in": {"$cond": [
+                        {"$eq": ["$$this.available", False]},
+                        0,
+                        {"$multiply": [
+                            {"$ifNull": ["$$this.price", 0]},
+                            {"$ifNull": ["$$this.quantity", 0]},
+                        ]},
+                    ]},
+                }
+            }
+        },
+        "item_count": {"$sum": {"$ifNull": ["$products.quantity", []]}},
+    }
+}
+
+# Values of an emptied cart
+EMPTY_CART_TOTALS = {"subtotal": 0, "item_count": 0}
+
+
+def line_snapshot(product) -> dict:
+    """Fields snapshotted onto a cart line: the product's price and whether it can still be bought"""
+    if product is None:
+        return {"available": False}
+    available = product.get("status") == "approved" and product.get("sold_at") is None
+    return {"price": product.get("price", 0), "available": available}
+
+
+def line_is_stale(line: dict, product) -> bool:
+    """Whether a line's snapshot no longer matches its product; lines default to available"""
+    current = {"price": line.get("price"), "available": line.get("available", True)}
+    return any(current[field] != value for field, value in line_snapshot(product).items())
+
+
+def set_line_fields(product_id: str, fields: dict) -> dict:
+    """Stage merging fields into the line for product_id, leaving other lines untouched"""
+    return {
+        "$set": {
+            "products": {
+                "$map": {
+                    "input": "$products",
+                    "in": {"$cond": [
+                        {"$eq": ["$$this.productId", product_id]},
+                        {"$mergeObjects": ["$$this", fields]},
+                        "$$this",
+                    ]},
+                }
+            }
+        }
+    }
+
+
+def remove_line(product_id: str) -> dict:
+    """Stage dropping the line for product_id"""
+    return {
+        "$set": {
+            "products": {
+                "$filter": {
+                    "input": "$products",
+                    "cond": {"$ne": ["$$this.productId", product_id]},
+                }
+            }
+        }
+    }
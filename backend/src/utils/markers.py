@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import os
+import uuid
+
+# A claim whose holder died is given up after this long and claimed again
+MARKER_LEASE_SECONDS = int(os.getenv("MARKER_LEASE_SECONDS", "300"))
+
+
+async def claim_marked(
+    collection, name: str, ids: Optional[List[str]] = None, limit: Optional[int] = None
+) -> Tuple[str, List[dict]]:
+    """
+    Claim documents carrying the <name>_pending marker, either the given ids
+    or up to limit of any, and return the claim token with the claimed
+    documents. The marker stays until complete_marked is called, so work
+    that fails or crashes after the claim is claimed again once the lease
+    runs out instead of being lost.
+    """
+    now = datetime.utcnow()
+    claimable = {
+        f"{name}_pending": True,
+        f"{name}_claimed_until": {"$not": {"$gt": now}},
+    }
+    if ids is None:
+        candidates = await collection.find(claimable, {"_id": 1}).limit(limit or 0).to_list(limit)
+        ids = [document["_id"] for document in candidates]
+    if not ids:
+        return "", []
+
+    token = str(uuid.uuid4())
+    await collection.update_many(
+        {"_id": {"$in": ids}, **claimable},
+        {"$set": {
+            f"{name}_token": token,
+            f"{name}_claimed_until": now + timedelta(seconds=MARKER_LEASE_SECONDS),
+        }},
+    )
+    return token, await collection.find({"_id": {"$in": ids}, f"{name}_token": token}).to_list(None)
+
+
+async def complete_marked(collection, name: str, token: str, done: Optional[dict] = None):
+    """Drop the marker of the documents claimed with token, optionally setting done on them"""
+    update = {"$unset": {f"{name}_pending": "", f"{name}_token": "", f"{name}_claimed_until": ""}}
+    if done:
+        update["$set"] = done
+    await collection.update_many({f"{name}_token": token}, update)
@@ -0,0 +1,35 @@
+import base64
+import json
+from fastapi import HTTPException
+
+
+def encode_cursor(sort_value, last_id: str) -> str:
+    """Encode the sort key and _id of the last document of a page as an opaque cursor"""
+    payload = json.dumps({"k": sort_value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Decode a cursor produced by encode_cursor into (sort_value, last_id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return payload["k"], payload["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+def keyset_filter(sort_field: str, direction: int, sort_value, last_id: str) -> dict:
+    """
+    Build the filter selecting documents strictly after (sort_value, last_id)
+    for a sort on (sort_field, _id) in the given direction.
+    """
+    op = "$gt" if direction == 1 else "$lt"
+    if sort_field == "_id":
+        return {"_id": {op: last_id}}
+    return {
+        "$or": [
+            {sort_field: {op: sort_value}},
+            {sort_field: sort_value, "_id": {op: last_id}},
+        ]
+    }
@@ -0,0 +1,125 @@
+"""
+Drains the EmailOutbox collection and fans out email campaigns into it.
+Run it next to the API:
+
+    python -m src.workers.email_dispatcher
+
+Set SMTP_BACKEND=sink to record messages in smtp.SmtpSink instead of
+sending them.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from src.config.database import run_with_client
+from src.services.mail_service import Mailer
+from src.services.outbox_service import claim_batch, defer, mark_failed, mark_sent
+from src.services.campaign_service import run_campaign_chunk
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+# Messages per second across all recipients; 0 disables the limit
+OUTBOX_SEND_RATE = float(os.getenv("OUTBOX_SEND_RATE", "10"))
+# At most OUTBOX_RECIPIENT_LIMIT messages to one address per window
+OUTBOX_RECIPIENT_LIMIT = int(os.getenv("OUTBOX_RECIPIENT_LIMIT", "5"))
+OUTBOX_RECIPIENT_WINDOW = int(os.getenv("OUTBOX_RECIPIENT_WINDOW", "60"))
+
+
+class EmailDispatcher:
+    def __init__(
+        self,
+        mailer: Optional[Mailer] = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        send_rate: float = OUTBOX_SEND_RATE,
+        recipient_limit: int = OUTBOX_RECIPIENT_LIMIT,
+        recipient_window: int = OUTBOX_RECIPIENT_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.mailer = mailer or Mailer()
+        self.batch_size = batch_size
+        self.send_rate = send_rate
+        self.recipient_limit = recipient_limit
+        self.recipient_window = recipient_window
+        self.clock = clock
+        self.recent = defaultdict(deque)
+
+    def _take_recipient_slot(self, to: str) -> bool:
+        """Record a send to `to` if it is still under its per-window limit"""
+        now = self.clock()
+        sends = self.recent[to]
+        while sends and now - sends[0] >= self.recipient_window:
+            sends.popleft()
+        if len(sends) >= self.recipient_limit:
+            return False
+        sends.append(now)
+        return True
+
+    async def _deliver(self, message: dict):
+        await self.mailer.deliver(message["to"], message["subject"], message["body"])
+
+    async def dispatch_once(self) -> int:
+        """Claim and process one batch; returns how many messages were claimed"""
+        batch = await claim_batch(self.batch_size)
+        if not batch:
+            return 0
+
+        allowed, limited = [], []
+        for message in batch:
+            (allowed if self._take_recipient_slot(message["to"]) else limited).append(message)
+        await defer(
+            [message["_id"] for message in limited],
+            datetime.utcnow() + timedelta(seconds=self.recipient_window),
+        )
+
+        started = self.clock()
+        results = await asyncio.gather(
+            *[self._deliver(message) for message in allowed], return_exceptions=True
+        )
+        sent = []
+        for message, result in zip(allowed, results):
+            if isinstance(result, Exception):
+                await mark_failed(message, str(result))
+            else:
+                sent.append(message["_id"])
+        await mark_sent(sent)
+        logger.info(f"Outbox batch: {len(sent)} sent, {len(allowed) - len(sent)} failed, {len(limited)} deferred")
+
+        if self.send_rate and allowed:
+            # Keep the average rate under send_rate
+            remaining = len(allowed) / self.send_rate - (self.clock() - started)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+        return len(batch)
+
+    async def run(self, poll_seconds: float = OUTBOX_POLL_SECONDS):
+        logger.info("Email dispatcher started")
+        try:
+            while True:
+                try:
+                    written = await run_campaign_chunk()
+                except Exception as e:
+                    logger.error(f"Error advancing campaign: {str(e)}")
+                    written = 0
+                try:
+                    claimed = await self.dispatch_once()
+                except Exception as e:
+                    logger.error(f"Error dispatching outbox batch: {str(e)}")
+                    claimed = 0
+                if not claimed and not written:
+                    await asyncio.sleep(poll_seconds)
+        finally:
+            await self.mailer.stop()
+
+
+def main():
+    run_with_client(EmailDispatcher().run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from fastapi import HTTPException
+from src.services.auth_services import (
+    create_access_token,
+    get_current_user,
+    invalidate_principal,
+    update_user_role_service,
+)
+from src.services.cache_service import principal_cache, MISSING
+
+"""Test suite for the authenticated-principal cache"""
+
+
+@pytest.mark.asyncio
+class TestPrincipalCache:
+
+    async def test_repeat_requests_skip_the_user_lookup(self):
+        await principal_cache.clear()
+        token = create_access_token({"sub": "buyer@example.com", "role": "buyer"})
+        user = {"email": "buyer@example.com", "role": "buyer"}
+
+        with patch("src.services.auth_services.users") as mock_users:
+            mock_users.find_one = AsyncMock(return_value=user)
+
+            assert await get_current_user(token) == user
+            assert await get_current_user(token) == user
+            mock_users.find_one.assert_awaited_once()
+            assert mock_users.find_one.call_args[0][1] == {"password": 0}
+
+            await invalidate_principal("buyer@example.com")
+            await get_current_user(token)
+            assert mock_users.find_one.await_count == 2
+
+    async def test_role_update_invalidates_principal(self):
+        await principal_cache.clear()
+        await principal_cache.set("seller@example.com", {"email": "seller@example.com", "role": "buyer"})
+
+        with patch("src.services.auth_services.users") as mock_users:
+            mock_users.find_one_and_update = AsyncMock(return_value={"email": "seller@example.com"})
+
+            await update_user_role_service(str(ObjectId()), "seller")
+
+        assert await principal_cache.get("seller@example.com") is MISSING
+
+    async def test_unknown_subject_is_rejected(self):
+        await principal_cache.clear()
+        token = create_access_token({"sub": "ghost@example.com", "role": "buyer"})
+
+        with patch("src.services.auth_services.users") as mock_users:
+            mock_users.find_one = AsyncMock(return_value=None)
+
+            with pytest.raises(HTTPException) as exc_info:
+                await get_current_user(token)
+
+        assert exc_info.value.status_code == 401
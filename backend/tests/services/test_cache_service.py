@@ -0,0 +1,49 @@
+import pytest
+from src.services.cache_service import InMemoryCache, Cache, MISSING
+
+"""Test suite for the catalog read cache"""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.asyncio
+class TestInMemoryCache:
+
+    async def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        backend = InMemoryCache(clock=clock)
+        await backend.set("product:p1", {"_id": "p1"}, ttl=30)
+
+        assert await backend.get("product:p1") == {"_id": "p1"}
+        clock.now += 31
+        assert await backend.get("product:p1") is MISSING
+        assert len(backend) == 0
+
+    async def test_least_recently_used_entry_is_evicted(self):
+        backend = InMemoryCache(max_entries=2)
+        await backend.set("a", 1, ttl=30)
+        await backend.set("b", 2, ttl=30)
+        await backend.get("a")
+        await backend.set("c", 3, ttl=30)
+
+        assert await backend.get("b") is MISSING
+        assert await backend.get("a") == 1
+        assert await backend.get("c") == 3
+
+    async def test_cache_counts_hits_and_misses_and_invalidates(self):
+        cache = Cache(InMemoryCache(), "catalog", default_ttl=30)
+
+        assert await cache.get("approved") is MISSING
+        await cache.set("approved", [])
+        assert await cache.get("approved") == []
+        await cache.set("page:newest:24::", {"products": []})
+        await cache.invalidate_prefix("page:")
+        assert await cache.get("page:newest:24::") is MISSING
+
+        assert cache.stats() == {"hits": 1, "misses": 2, "hit_ratio": 0.3333}
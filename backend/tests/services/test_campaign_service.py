@@ -0,0 +1,62 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from bson import ObjectId
+from src.services.campaign_service import run_campaign_chunk
+
+"""Test suite for resumable email campaigns"""
+
+
+def mock_users(buyers):
+    collection = MagicMock()
+    collection.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=buyers)
+    return collection
+
+
+@pytest.mark.asyncio
+class TestCouponCampaign:
+
+    @pytest.fixture
+    def campaign(self):
+        return {
+            "_id": "c1",
+            "coupon": {"code": "SPRING10", "discount_percentage": 10, "expiry_date": "2026-05-01"},
+            "status": "running",
+            "last_user_id": None,
+            "enqueued": 0,
+        }
+
+    async def test_chunk_is_rendered_written_and_checkpointed(self, campaign):
+        buyers = [
+            {"_id": ObjectId(), "email": "a@example.com", "first_name": "Ada"},
+            {"_id": ObjectId(), "email": "b@example.com", "first_name": "Ben"},
+        ]
+        users = mock_users(buyers)
+        with patch("src.services.campaign_service.email_campaigns") as mock_campaigns, \
+             patch("src.services.campaign_service.users", users), \
+             patch("src.services.campaign_service.enqueue_emails", AsyncMock(return_value=2)) as mock_enqueue:
+            mock_campaigns.find_one_and_update = AsyncMock(return_value=campaign)
+            mock_campaigns.update_one = AsyncMock()
+
+            assert await run_campaign_chunk(chunk_size=2) == 2
+
+        messages = mock_enqueue.call_args[0][0]
+        assert "Hi Ada," in messages[0]["body"] and "SPRING10" in messages[0]["body"]
+        assert messages[1]["dedup_key"] == "coupon:SPRING10:b@example.com"
+        checkpoint = mock_campaigns.update_one.call_args[0][1]
+        assert checkpoint["$set"]["last_user_id"] == buyers[-1]["_id"]
+        assert "status" not in checkpoint["$set"]
+        assert checkpoint["$inc"] == {"enqueued": 2}
+
+    async def test_resumes_after_checkpoint_and_finishes(self, campaign):
+        campaign["last_user_id"] = ObjectId()
+        users = mock_users([{"_id": ObjectId(), "email": "c@example.com", "first_name": "Cy"}])
+        with patch("src.services.campaign_service.email_campaigns") as mock_campaigns, \
+             patch("src.services.campaign_service.users", users), \
+             patch("src.services.campaign_service.enqueue_emails", AsyncMock(return_value=1)):
+            mock_campaigns.find_one_and_update = AsyncMock(return_value=campaign)
+            mock_campaigns.update_one = AsyncMock()
+
+            await run_campaign_chunk(chunk_size=2)
+
+        assert users.find.call_args[0][0]["_id"] == {"$gt": campaign["last_user_id"]}
+        assert mock_campaigns.update_one.call_args[0][1]["$set"]["status"] == "done"
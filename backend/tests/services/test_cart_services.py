@@ -2,7 +2,8 @@ import pytest
 from unittest.mock import AsyncMock, patch
 from fastapi import HTTPException
 from src.models.cart import Cart, CartItem
-from src.services.cart_service import add_to_cart
+from src.services.cart_service import add_to_cart, fetch_cart_items, get_cart_total
+from src.utils.cart_totals import CART_TOTALS_STAGE
 from src.config.database import cart, product_collection
 
 """Test suite for cart service with focus on add to cart functionality"""
@@ -14,109 +15,89 @@ class TestCartService:
         adding a new product to cart that already contains products
     """
     async def test_add_to_cart_with_existing_and_new_products(self):
-        
-        # Mocking the initial cart data
-        mock_existing_cart = {
-            "email": "test@buyer.com",
-            "buyed": False,
-            "products": [
-                {
-                    "productId": "101",
-                    "quantity": 2
-                }
-            ]
-        }
 
         # Mock product data
-        mock_products = {
-            "101": {
-                "productId": "101",
-                "quantity": 5,
-                "status": "approved"
-            },
-            "103": {
-                "productId": "103",
-                "quantity": 1,
-                "status": "approved"
-            }
-        }
+        mock_products = [
+            {"_id": "101", "status": "approved", "price": 10.0},
+            {"_id": "103", "status": "approved", "price": 4.5},
+        ]
 
         # Setup mocks
-        with patch('src.services.buyer_service.verify_buyer', new_callable=AsyncMock) as mock_verify_buyer:
-            with patch('src.config.database.cart.find_one', new_callable=AsyncMock) as mock_find_cart:
-                with patch('src.config.database.product_collection.find_one', new_callable=AsyncMock) as mock_find_product:
-                    with patch('src.config.database.cart.update_one', new_callable=AsyncMock) as mock_update_cart:
-                       
-                        mock_verify_buyer.return_value = {"email": "test@buyer.com"}
-                        mock_find_cart.return_value = mock_existing_cart
-                        mock_find_product.side_effect = lambda filter_dict: (
-                            mock_products.get(filter_dict.get("_id"))
-                        )
-                        mock_update_cart.return_value = AsyncMock(modified_count=1)
-
-                        # Create cart request
-                        cart_request = Cart(
-                            email="test@buyer.com",
-                            products=[
-                                CartItem(
-                                    productId="103",
-                                    quantity=1
-                                )
-                            ]
-                        )
-
-                        result = await add_to_cart(cart_request)
-
-                        # Assert
-                        # Verify the cart was updated correctly
-                        mock_update_cart.assert_called_once()
-                        call_args = mock_update_cart.call_args[0]
-                        
-                        # Verify filter condition
-                        assert call_args[0]["email"] == "test@buyer.com"
-                        
-                        # Verify updated products array
-                        updated_products = call_args[1]["$set"]["products"]
-                        assert len(updated_products) == 2
-                        
-                        # Verify existing product remained unchanged
-                        product1 = next(p for p in updated_products if p["productId"] == "101")
-                        assert product1["quantity"] == 2
-                        
-                        # Verify new product was added correctly
-                        product3 = next(p for p in updated_products if p["productId"] == "103")
-                        assert product3["quantity"] == 1
-                        
-                        # Verify success message
-                        assert result["message"] == "Products added to cart successfully"
+        with patch('src.services.cart_service.verify_buyer', new_callable=AsyncMock) as mock_verify_buyer:
+            with patch('src.services.cart_service.product_collection') as mock_product_collection:
+                with patch('src.services.cart_service.cart') as mock_cart:
+
+                    mock_verify_buyer.return_value = {"email": "test@buyer.com"}
+                    mock_product_collection.find.return_value.to_list = AsyncMock(return_value=mock_products)
+                    mock_cart.bulk_write = AsyncMock()
+
+                    # Create cart request; the same product twice is merged
+                    cart_request = Cart(
+                        email="test@buyer.com",
+                        products=[
+                            CartItem(productId="101", quantity=1),
+                            CartItem(productId="103", quantity=1),
+                            CartItem(productId="101", quantity=2),
+                        ]
+                    )
+
+                    result = await add_to_cart(cart_request)
+
+                    # Assert
+                    # Products were validated with a single $in query
+                    mock_product_collection.find.assert_called_once()
+                    assert mock_product_collection.find.call_args[0][0] == {"_id": {"$in": ["101", "103"]}}
+
+                    # The cart was written in one bulk_write
+                    mock_cart.bulk_write.assert_awaited_once()
+                    operations = [op._doc for op in mock_cart.bulk_write.call_args[0][0]]
+                    filters = [op._filter for op in mock_cart.bulk_write.call_args[0][0]]
+
+                    # Cart is upserted first
+                    assert operations[0] == {"$setOnInsert": {"products": [], "buyed": False}}
+
+                    # Each product is pushed only if absent, then incremented atomically
+                    assert filters[1] == {"email": "test@buyer.com", "products.productId": {"$ne": "101"}}
+                    assert operations[1]["$push"]["products"]["price"] == 10.0
+                    assert operations[2]["$inc"] == {"products.$.quantity": 3}
+                    assert filters[3] == {"email": "test@buyer.com", "products.productId": {"$ne": "103"}}
+                    assert operations[4]["$inc"] == {"products.$.quantity": 1}
+
+                    # Running totals are recomputed last
+                    assert operations[5] == [CART_TOTALS_STAGE]
+
+                    # Verify success message
+                    assert result["message"] == "Products added to cart successfully"
 
     """Test adding a non-existent product to cart"""
     async def test_add_to_cart_with_invalid_product(self):
-        
-        with patch('src.services.buyer_service.verify_buyer', new_callable=AsyncMock) as mock_verify_buyer:
-            with patch('src.config.database.product_collection.find_one', new_callable=AsyncMock) as mock_find_product:
-                mock_verify_buyer.return_value = {"email": "test@buyer.com"}
-                mock_find_product.return_value = None
 
-                cart_request = Cart(
-                    email="test@buyer.com",
-                    products=[CartItem(productId="999", quantity=1)]
-                )
-
-                with pytest.raises(HTTPException) as exc_info:
-                    await add_to_cart(cart_request)
-                assert exc_info.value.status_code == 404
-                assert "Product not found" in str(exc_info.value.detail)
+        with patch('src.services.cart_service.verify_buyer', new_callable=AsyncMock) as mock_verify_buyer:
+            with patch('src.services.cart_service.product_collection') as mock_product_collection:
+                with patch('src.services.cart_service.cart') as mock_cart:
+                    mock_verify_buyer.return_value = {"email": "test@buyer.com"}
+                    mock_product_collection.find.return_value.to_list = AsyncMock(return_value=[])
+                    mock_cart.bulk_write = AsyncMock()
+
+                    cart_request = Cart(
+                        email="test@buyer.com",
+                        products=[CartItem(productId="999", quantity=1)]
+                    )
+
+                    with pytest.raises(HTTPException) as exc_info:
+                        await add_to_cart(cart_request)
+                    assert exc_info.value.status_code == 404
+                    assert "Product not found" in str(exc_info.value.detail)
+                    mock_cart.bulk_write.assert_not_awaited()
     """Test adding an unapproved product to cart"""
     async def test_add_to_cart_with_unapproved_product(self):
-        
-        with patch('src.services.buyer_service.verify_buyer', new_callable=AsyncMock) as mock_verify_buyer:
-            with patch('src.config.database.product_collection.find_one', new_callable=AsyncMock) as mock_find_product:
+
+        with patch('src.services.cart_service.verify_buyer', new_callable=AsyncMock) as mock_verify_buyer:
+            with patch('src.services.cart_service.product_collection') as mock_product_collection:
                 mock_verify_buyer.return_value = {"email": "test@buyer.com"}
-                mock_find_product.return_value = {
-                    "productId": "103",
-                    "status": "pending"
-                }
+                mock_product_collection.find.return_value.to_list = AsyncMock(return_value=[
+                    {"_id": "103", "status": "pending"}
+                ])
 
                 cart_request = Cart(
                     email="test@buyer.com",
@@ -158,26 +139,107 @@ class TestCartService:
         """
         Test case for fetching cart items with their details.
         """
-        # Mock data
-        mock_cart = {
-            "email": "test@buyer.com",
-            "products": [{"productId": "101", "quantity": 2}],
-        }
-        mock_product = [{"_id": "101", "price": 10.0, "product_name": "Test Product"}]
+        # Mock aggregation result: the buyer with hydrated cart lines
+        mock_result = [{
+            "role": "buyer",
+            "items": [{
+                "_id": "101",
+                "price": 10.0,
+                "product_name": "Test Product",
+                "quantity": 2,
+                "available": True,
+            }],
+        }]
 
         # Setup mocks
-        with patch("src.services.buyer_service.verify_buyer", new_callable=AsyncMock) as mock_verify_buyer:
-            with patch("src.config.database.cart.find_one", new_callable=AsyncMock) as mock_find_cart:
-                with patch("src.config.database.product_collection.find", new_callable=AsyncMock) as mock_find_products:
-                    mock_verify_buyer.return_value = {"email": "test@buyer.com"}
-                    mock_find_cart.return_value = mock_cart
-                    mock_find_products.return_value = mock_product
-
-                    # Execute
-                    response = await fetch_cart_items("test@buyer.com")
-
-                    # Assertions
-                    assert len(response) == 1
-                    assert response[0]["productId"] == "101"
-                    assert response[0]["quantity"] == 2
-                    assert response[0]["price"] == 10.0                                            
\ No newline at end of file
+        with patch("src.services.cart_service.users") as mock_users:
+            mock_users.aggregate.return_value.to_list = AsyncMock(return_value=mock_result)
+
+            # Execute
+            response = await fetch_cart_items("test@buyer.com")
+
+            # Assertions: one round trip, joined in the database
+            mock_users.aggregate.assert_called_once()
+            pipeline = mock_users.aggregate.call_args[0][0]
+            assert pipeline[0] == {"$match": {"email": "test@buyer.com"}}
+            assert len(response) == 1
+            assert response[0]["_id"] == "101"
+            assert response[0]["quantity"] == 2
+            assert response[0]["price"] == 10.0
+            assert response[0]["available"] is True
+
+    async def test_fetch_cart_items_requires_buyer(self):
+        with patch("src.services.cart_service.users") as mock_users:
+            mock_users.aggregate.return_value.to_list = AsyncMock(
+                return_value=[{"role": "seller", "items": []}]
+            )
+
+            with pytest.raises(HTTPException) as exc_info:
+                await fetch_cart_items("seller@example.com")
+            assert exc_info.value.status_code == 403
+
+    async def test_get_cart_total_reads_running_subtotal(self):
+        with patch("src.services.cart_service.verify_buyer", AsyncMock()), \
+             patch("src.services.cart_service.product_collection") as mock_products, \
+             patch("src.services.cart_service.cart") as mock_cart:
+            mock_cart.find_one = AsyncMock(return_value={
+                "subtotal": 24.5,
+                "item_count": 3,
+                "products": [{"productId": "p1", "price": 10.0}, {"productId": "p2", "price": 4.5}],
+            })
+            mock_products.find.return_value.to_list = AsyncMock(return_value=[
+                {"_id": "p1", "price": 10.0, "status": "approved", "sold_at": None},
+                {"_id": "p2", "price": 4.5, "status": "approved", "sold_at": None},
+            ])
+            mock_cart.find_one_and_update = AsyncMock()
+
+            response = await get_cart_total("test@buyer.com")
+
+            assert response == {"total": 24.5, "item_count": 3}
+            mock_cart.find_one.assert_awaited_once()
+            mock_cart.find_one_and_update.assert_not_awaited()
+
+    async def test_get_cart_total_drops_sold_and_deleted_lines(self):
+        with patch("src.services.cart_service.verify_buyer", AsyncMock()), \
+             patch("src.services.cart_service.product_collection") as mock_products, \
+             patch("src.services.cart_service.cart") as mock_cart:
+            lines = [
+                {"productId": "p1", "price": 10.0},
+                {"productId": "p2", "price": 4.5},
+                {"productId": "p3", "price": 7.0},
+            ]
+            mock_cart.find_one = AsyncMock(side_effect=[
+                {"subtotal": 21.5, "item_count": 3, "products": lines},
+                {"products": lines},
+            ])
+            # p2 was sold to someone else and p3 was deleted
+            mock_products.find.return_value.to_list = AsyncMock(return_value=[
+                {"_id": "p1", "price": 10.0, "status": "approved", "sold_at": None},
+                {"_id": "p2", "price": 4.5, "status": "sold", "sold_at": "2026-03-14"},
+            ])
+            mock_cart.find_one_and_update = AsyncMock(return_value={"subtotal": 10.0, "item_count": 3})
+
+            response = await get_cart_total("test@buyer.com")
+
+        assert response == {"total": 10.0, "item_count": 3}
+        mock_products.find.assert_called_once()
+        stages = mock_cart.find_one_and_update.call_args.args[1]
+        snapshots = [stage["$set"]["products"]["$map"]["in"]["$cond"][1]["$mergeObjects"][1] for stage in stages[:3]]
+        assert snapshots == [
+            {"price": 10.0, "available": True},
+            {"price": 4.5, "available": False},
+            {"available": False},
+        ]
+        assert stages[3] == CART_TOTALS_STAGE
+
+    async def test_get_cart_total_requires_buyer(self):
+        with patch("src.services.cart_service.verify_buyer",
+                   AsyncMock(side_effect=HTTPException(status_code=403, detail="Only buyers"))), \
+             patch("src.services.cart_service.cart") as mock_cart:
+            mock_cart.find_one = AsyncMock()
+
+            with pytest.raises(HTTPException) as exc_info:
+                await get_cart_total("seller@example.com")
+
+        assert exc_info.value.status_code == 403
+        mock_cart.find_one.assert_not_awaited()
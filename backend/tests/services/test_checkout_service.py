@@ -0,0 +1,169 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from pymongo.errors import PyMongoError
+from src.schemas.cart_schema import UpdatePaymentStatus
+from src.services.checkout_service import checkout
+
+"""Test suite for transactional checkout"""
+
+
+class AsyncContext:
+    def __init__(self, value=None):
+        self.value = value
+
+    async def __aenter__(self):
+        return self.value
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def mock_session():
+    session = MagicMock()
+    session.start_transaction.return_value = AsyncContext()
+    session.commit_transaction = AsyncMock()
+    client = MagicMock()
+    client.start_session = AsyncMock(return_value=AsyncContext(session))
+    return client, session
+
+
+class TestCheckout:
+
+    @pytest.fixture
+    def request_data(self):
+        return UpdatePaymentStatus(
+            email="buyer@example.com",
+            buyed=True,
+            shipping_address={"name": "Buyer", "address": "1 Main St", "postal_code": "12345"},
+            payment_method={"type": "card"},
+        )
+
+    @pytest.mark.asyncio
+    async def test_checkout_writes_in_one_transaction(self, request_data):
+        client, session = mock_session()
+        products = [
+            {"_id": "p1", "product_name": "Jacket", "price": 40.0, "images": ["a.jpg"], "seller_id": "Shop"},
+            {"_id": "p2", "product_name": "Scarf", "price": 10.0, "images": []},
+        ]
+        with patch("src.services.checkout_service.client", client), \
+             patch("src.services.checkout_service.verify_buyer", AsyncMock()), \
+             patch("src.services.checkout_service.cart") as mock_cart, \
+             patch("src.services.checkout_service.product_collection") as mock_products, \
+             patch("src.services.checkout_service.orders") as mock_orders, \
+             patch("src.services.checkout_service.invalidate_product_cache", AsyncMock()) as invalidate, \
+             patch("src.services.checkout_service.send_order_status_email", AsyncMock()) as send_email, \
+             patch("src.services.checkout_service.apply_pending_rollups", AsyncMock()) as rollups:
+            mock_cart.find_one = AsyncMock(return_value={
+                "email": "buyer@example.com",
+                "products": [{"productId": "p1", "quantity": 1}, {"productId": "p2", "quantity": 2}],
+            })
+            mock_cart.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+            mock_products.find.return_value.to_list = AsyncMock(return_value=products)
+            mock_products.update_many = AsyncMock(return_value=MagicMock(modified_count=2))
+            mock_orders.insert_one = AsyncMock()
+
+            result = await checkout(request_data)
+
+        assert result == {"message": "Payment status updated successfully"}
+        mock_products.update_many.assert_awaited_once()
+        sold_filter = mock_products.update_many.call_args.args[0]
+        assert sold_filter["_id"] == {"$in": ["p1", "p2"]}
+        assert sold_filter["status"] == "approved"
+        for call in (mock_products.update_many, mock_cart.update_one, mock_orders.insert_one):
+            assert call.call_args.kwargs["session"] is session
+        order = mock_orders.insert_one.call_args.args[0]
+        assert order["total_amount"] == 60.0
+        assert [item["seller_id"] for item in order["items"]] == ["Shop", None]
+        invalidate.assert_awaited_once_with("p1", "p2")
+        send_email.assert_awaited_once()
+        # Rollups are applied after commit, outside the transaction
+        assert order["rollup_pending"] is True
+        session.commit_transaction.assert_awaited_once()
+        rollups.assert_awaited_once_with([order["_id"]])
+
+    @pytest.mark.asyncio
+    async def test_unknown_commit_result_retries_only_the_commit(self, request_data):
+        client, session = mock_session()
+        session.commit_transaction = AsyncMock(side_effect=[
+            PyMongoError("network error", error_labels=["UnknownTransactionCommitResult"]),
+            None,
+        ])
+        with patch("src.services.checkout_service.client", client), \
+             patch("src.services.checkout_service.verify_buyer", AsyncMock()), \
+             patch("src.services.checkout_service.cart") as mock_cart, \
+             patch("src.services.checkout_service.product_collection") as mock_products, \
+             patch("src.services.checkout_service.orders") as mock_orders, \
+             patch("src.services.checkout_service.invalidate_product_cache", AsyncMock()), \
+             patch("src.services.checkout_service.send_order_status_email", AsyncMock()), \
+             patch("src.services.checkout_service.apply_pending_rollups", AsyncMock()):
+            mock_cart.find_one = AsyncMock(return_value={
+                "email": "buyer@example.com",
+                "products": [{"productId": "p1", "quantity": 1}],
+            })
+            mock_cart.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+            mock_products.find.return_value.to_list = AsyncMock(
+                return_value=[{"_id": "p1", "product_name": "Jacket", "price": 40.0}]
+            )
+            mock_products.update_many = AsyncMock(return_value=MagicMock(modified_count=1))
+            mock_orders.insert_one = AsyncMock()
+
+            await checkout(request_data)
+
+        assert session.commit_transaction.await_count == 2
+        mock_orders.insert_one.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_checkout_invalid_address_writes_nothing(self, request_data):
+        client, _ = mock_session()
+        request_data.shipping_address = {"name": "Buyer"}
+        with patch("src.services.checkout_service.client", client), \
+             patch("src.services.checkout_service.verify_buyer", AsyncMock()), \
+             patch("src.services.checkout_service.cart") as mock_cart, \
+             patch("src.services.checkout_service.product_collection") as mock_products, \
+             patch("src.services.checkout_service.orders") as mock_orders:
+            mock_cart.find_one = AsyncMock(return_value={
+                "email": "buyer@example.com",
+                "products": [{"productId": "p1", "quantity": 1}],
+            })
+            mock_cart.update_one = AsyncMock()
+            mock_products.find.return_value.to_list = AsyncMock(
+                return_value=[{"_id": "p1", "product_name": "Jacket", "price": 40.0}]
+            )
+            mock_products.update_many = AsyncMock()
+            mock_orders.insert_one = AsyncMock()
+
+            with pytest.raises(HTTPException) as exc_info:
+                await checkout(request_data)
+
+        assert exc_info.value.status_code == 400
+        mock_products.update_many.assert_not_awaited()
+        mock_cart.update_one.assert_not_awaited()
+        mock_orders.insert_one.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_checkout_conflict_aborts_before_order(self, request_data):
+        client, _ = mock_session()
+        with patch("src.services.checkout_service.client", client), \
+             patch("src.services.checkout_service.verify_buyer", AsyncMock()), \
+             patch("src.services.checkout_service.cart") as mock_cart, \
+             patch("src.services.checkout_service.product_collection") as mock_products, \
+             patch("src.services.checkout_service.orders") as mock_orders:
+            mock_cart.find_one = AsyncMock(return_value={
+                "email": "buyer@example.com",
+                "products": [{"productId": "p1", "quantity": 1}],
+            })
+            mock_cart.update_one = AsyncMock()
+            mock_products.find.return_value.to_list = AsyncMock(
+                return_value=[{"_id": "p1", "product_name": "Jacket", "price": 40.0}]
+            )
+            # Another buyer holds or bought the item, so nothing matches
+            mock_products.update_many = AsyncMock(return_value=MagicMock(modified_count=0))
+            mock_orders.insert_one = AsyncMock()
+
+            with pytest.raises(HTTPException) as exc_info:
+                await checkout(request_data)
+
+        assert exc_info.value.status_code == 409
+        mock_cart.update_one.assert_not_awaited()
+        mock_orders.insert_one.assert_not_awaited()
@@ -0,0 +1,46 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+from src.services.cache_service import coupon_cache
+from src.services.coupon_service import redeem_coupon, validate_coupon
+
+"""Test suite for coupon validation and redemption"""
+
+
+@pytest.mark.asyncio
+class TestCouponRedemption:
+
+    async def test_redeem_claims_a_use_in_one_conditional_update(self):
+        await coupon_cache.clear()
+        with patch("src.services.coupon_service.coupon_collection") as mock_coupons:
+            mock_coupons.find_one_and_update = AsyncMock(return_value={
+                "code": "SPRING10", "discount_percentage": 10, "used_count": 3, "max_uses": 5
+            })
+
+            coupon = await redeem_coupon("SPRING10")
+
+        assert coupon["discount_percentage"] == 10
+        query, update = mock_coupons.find_one_and_update.call_args[0]
+        assert query["code"] == "SPRING10" and query["is_active"] is True
+        assert {"$expr": {"$lt": ["$used_count", "$max_uses"]}} in query["$and"][1]["$or"]
+        assert update == {"$inc": {"used_count": 1}}
+
+    async def test_exhausted_coupon_is_not_redeemed(self):
+        with patch("src.services.coupon_service.coupon_collection") as mock_coupons:
+            mock_coupons.find_one_and_update = AsyncMock(return_value=None)
+
+            assert await redeem_coupon("SPRING10") is None
+
+    async def test_validation_results_are_cached(self):
+        await coupon_cache.clear()
+        coupon = {"code": "SPRING10", "discount_percentage": 10,
+                  "expiry_date": datetime.now() + timedelta(days=1)}
+        with patch("src.services.coupon_service.coupon_collection") as mock_coupons:
+            mock_coupons.find_one = AsyncMock(side_effect=[coupon, None])
+
+            assert await validate_coupon("SPRING10") == coupon
+            assert await validate_coupon("SPRING10") == coupon
+            assert await validate_coupon("NOPE") is None
+            assert await validate_coupon("NOPE") is None
+
+        assert mock_coupons.find_one.await_count == 2
@@ -0,0 +1,195 @@
+import hashlib
+import io
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException, UploadFile
+from pymongo.errors import DuplicateKeyError
+from src.services.image_service import (
+    stream_upload_to_file,
+    blob_name,
+    is_content_addressed,
+    parse_range,
+    etag_matches,
+    blob_files,
+    collect_unreferenced_images,
+    commit_blob,
+    generate_variants,
+    variant_filename,
+)
+
+"""Test suite for streaming image uploads"""
+
+
+@pytest.mark.asyncio
+class TestStreamUpload:
+
+    async def test_upload_is_written_in_chunks_and_hashed(self, tmp_path):
+        content = os.urandom(10_000)
+        upload = UploadFile(filename="photo.jpg", file=io.BytesIO(content))
+        target = str(tmp_path / "photo.jpg")
+
+        size, digest = await stream_upload_to_file(upload, target, max_size=20_000, chunk_size=1024)
+
+        assert size == len(content)
+        assert digest == hashlib.sha256(content).hexdigest()
+        with open(target, "rb") as saved:
+            assert saved.read() == content
+        assert not os.path.exists(target + ".part")
+
+    async def test_oversized_upload_is_rejected_and_removed(self, tmp_path):
+        upload = UploadFile(filename="huge.jpg", file=io.BytesIO(b"x" * 5000))
+        target = str(tmp_path / "huge.jpg")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await stream_upload_to_file(upload, target, max_size=4096, chunk_size=1024)
+
+        assert exc_info.value.status_code == 413
+        assert os.listdir(tmp_path) == []
+
+
+class TestContentAddressedNames:
+
+    def test_blob_name_is_sharded_by_digest(self):
+        digest = hashlib.sha256(b"photo").hexdigest()
+        name = blob_name(digest, "Summer Dress.JPG")
+
+        assert name == f"{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        assert is_content_addressed(name)
+
+    def test_unsafe_extensions_are_dropped(self):
+        assert blob_name("ab" * 32, "evil.php/../x").endswith("abab")
+        assert not is_content_addressed("0f8e_legacy.jpg")
+
+
+@pytest.mark.asyncio
+class TestBlobCollection:
+
+    async def test_files_are_removed_before_the_document(self, tmp_path):
+        name = blob_name("ab" * 32, "photo.jpg")
+        os.makedirs(tmp_path / os.path.dirname(name))
+        (tmp_path / name).write_bytes(b"old")
+
+        async def delete_one(query):
+            assert not (tmp_path / name).exists()
+            return MagicMock(deleted_count=1)
+
+        with patch("src.services.image_service.UPLOAD_DIRECTORY", str(tmp_path)), \
+             patch("src.services.image_service.image_blobs") as mock_blobs:
+            mock_blobs.find.return_value.to_list = AsyncMock(return_value=[{"_id": name}])
+            mock_blobs.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+            mock_blobs.delete_one = AsyncMock(side_effect=delete_one)
+
+            assert await collect_unreferenced_images() == 1
+
+        claim_filter, claim = mock_blobs.update_one.call_args.args
+        assert claim_filter["refs"] == {"$lte": 0}
+        until = claim["$set"]["collecting_until"]
+        assert mock_blobs.delete_one.call_args.args[0] == {"_id": name, "collecting_until": until}
+
+    async def test_upload_during_collection_is_stored_afresh(self, tmp_path):
+        content = b"same photo"
+        digest = hashlib.sha256(content).hexdigest()
+        name = blob_name(digest, "photo.jpg")
+        os.makedirs(tmp_path / os.path.dirname(name))
+        (tmp_path / name).write_bytes(content)
+        temp_path = tmp_path / "incoming"
+        temp_path.write_bytes(content)
+
+        steps = iter(["collecting", "still collecting", "collected"])
+
+        async def update_one(query, update, **kwargs):
+            step = next(steps)
+            if step == "collecting":
+                raise DuplicateKeyError("blob is being collected")
+            if step == "still collecting":
+                # The collector deletes the old file while the upload waits
+                os.remove(tmp_path / name)
+                return MagicMock(modified_count=0)
+            return MagicMock(upserted_id=name)
+
+        with patch("src.services.image_service.UPLOAD_DIRECTORY", str(tmp_path)), \
+             patch("src.services.image_service.BLOB_COLLECT_WAIT_SECONDS", 0), \
+             patch("src.services.image_service.image_blobs") as mock_blobs:
+            mock_blobs.update_one = AsyncMock(side_effect=update_one)
+
+            assert await commit_blob(str(temp_path), len(content), digest, "photo.jpg") == name
+
+        assert (tmp_path / name).read_bytes() == content
+        assert not temp_path.exists()
+        upsert_filter = mock_blobs.update_one.call_args.args[0]
+        assert upsert_filter == {"_id": name, "collecting_until": {"$exists": False}}
+
+
+class TestImageDelivery:
+
+    def test_parse_range_variants(self):
+        assert parse_range("bytes=0-99", 1000) == (0, 99)
+        assert parse_range("bytes=900-", 1000) == (900, 999)
+        assert parse_range("bytes=-100", 1000) == (900, 999)
+        assert parse_range("bytes=990-2000", 1000) == (990, 999)
+        assert parse_range("bytes=0-1,5-6", 1000) is None
+        assert parse_range("items=0-1", 1000) is None
+        assert parse_range(None, 1000) is None
+
+    def test_unsatisfiable_range_raises(self):
+        with pytest.raises(ValueError):
+            parse_range("bytes=1000-", 1000)
+
+    def test_if_none_match_uses_weak_comparison(self):
+        etag = '"abcd.jpg"'
+        assert etag_matches('W/"abcd.jpg"', etag)
+        assert etag_matches('"other", "abcd.jpg"', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+        assert not etag_matches(None, etag)
+
+
+class TestImageVariants:
+
+    def test_variant_filename(self):
+        assert variant_filename("ab/cd/abcd.jpg", "thumb", "webp") == "ab/cd/abcd_thumb.webp"
+        assert variant_filename("ab/cd/abcd.png", "", "webp") == "ab/cd/abcd.webp"
+        assert variant_filename("0f8e_photo.jpeg", "medium", "jpg") == "0f8e_photo_medium.jpg"
+
+    @pytest.mark.parametrize("source_format, filename", [("JPEG", "photo.jpg"), ("PNG", "photo.png")])
+    def test_resized_and_webp_variants_are_written(self, tmp_path, source_format, filename):
+        Image = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), "blue").save(buffer, source_format)
+        (tmp_path / filename).write_bytes(buffer.getvalue())
+
+        variants = generate_variants(str(tmp_path), filename)
+
+        stem = os.path.splitext(filename)[0]
+        assert variants == {
+            "original": filename,
+            "webp": f"{stem}.webp",
+            "thumb": f"{stem}_thumb.jpg",
+            "thumb_webp": f"{stem}_thumb.webp",
+            "medium": f"{stem}_medium.jpg",
+            "medium_webp": f"{stem}_medium.webp",
+        }
+        with Image.open(tmp_path / variants["thumb"]) as thumb:
+            assert thumb.format == "JPEG" and max(thumb.size) == 240
+        with Image.open(tmp_path / variants["medium_webp"]) as medium:
+            assert medium.format == "WEBP" and medium.size == (720, 480)
+        with Image.open(tmp_path / variants["webp"]) as full_size:
+            assert full_size.format == "WEBP" and full_size.size == (1200, 800)
+
+    def test_webp_upload_is_not_overwritten(self, tmp_path):
+        Image = pytest.importorskip("PIL.Image")
+        buffer = io.BytesIO()
+        Image.new("RGB", (600, 400), "red").save(buffer, "WEBP")
+        content = buffer.getvalue()
+        name = blob_name(hashlib.sha256(content).hexdigest(), "photo.webp")
+        os.makedirs(tmp_path / os.path.dirname(name))
+        (tmp_path / name).write_bytes(content)
+
+        variants = generate_variants(str(tmp_path), name)
+
+        assert variants["webp"] == name
+        assert (tmp_path / name).read_bytes() == content
+        files = blob_files(name)
+        assert len(files) == len(set(files))
+        assert all((tmp_path / file).exists() for file in files)
@@ -0,0 +1,170 @@
+import asyncio
+import io
+import os
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException, UploadFile
+from src.models.product import ProductModel
+from src.services.import_service import (
+    _process_batch_images,
+    detect_format,
+    fetch_image_url,
+    open_rows,
+    read_batch,
+    resolve_public_address,
+    split_images,
+    start_import,
+    store_row_images,
+)
+
+"""Test suite for streaming catalog imports"""
+
+
+class TestImportParsing:
+
+    def test_csv_rows_are_read_in_batches(self, tmp_path):
+        path = tmp_path / "catalog.csv"
+        path.write_text(
+            "product_name,description,price,category,images\n"
+            'Denim Jacket,"Blue, size M",45,Jackets,a.jpg;b.jpg\n'
+            "Scarf,Wool,12.5,Accessories,\n"
+            "Boots,Leather,80,Shoes,https://example.com/boots.jpg\n"
+        )
+        rows = open_rows(str(path), "csv")
+
+        first = read_batch(rows, 2)
+        second = read_batch(rows, 2)
+
+        assert [row["product_name"] for _, row in first] == ["Denim Jacket", "Scarf"]
+        assert first[0][1]["description"] == "Blue, size M"
+        assert [row["product_name"] for _, row in second] == ["Boots"]
+        assert read_batch(rows, 2) == []
+
+    def test_ndjson_parse_errors_become_error_rows(self, tmp_path):
+        path = tmp_path / "catalog.ndjson"
+        path.write_text('{"product_name": "Scarf", "price": 12.5}\n\n{broken\n{"product_name": "Hat"}\n')
+
+        batch = read_batch(open_rows(str(path), "ndjson"), 10)
+
+        assert batch[0] == (1, {"product_name": "Scarf", "price": 12.5})
+        assert batch[1][0] == 3 and isinstance(batch[1][1], ValueError)
+        assert batch[2] == (4, {"product_name": "Hat"})
+
+    def test_image_references_and_formats(self):
+        assert split_images("a.jpg; b.jpg|c.jpg") == ["a.jpg", "b.jpg", "c.jpg"]
+        assert split_images(["x.png"]) == ["x.png"]
+        assert split_images(None) == []
+        assert detect_format("Catalog.JSONL") == "ndjson"
+        with pytest.raises(HTTPException):
+            detect_format("catalog.xlsx")
+
+
+class _ImageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"GIF89a" if self.path == "/photo.gif" else b"<html></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "image/gif" if self.path == "/photo.gif" else "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def image_server():
+    server = HTTPServer(("127.0.0.1", 0), _ImageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://images.example.com:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestImageUrlFetching:
+
+    @pytest.mark.parametrize("host", ["127.0.0.1", "10.0.0.5", "169.254.169.254", "::1", "localhost"])
+    def test_internal_hosts_are_refused(self, host):
+        with pytest.raises(ValueError):
+            resolve_public_address(host, 80)
+
+    def test_only_http_urls_are_fetched(self):
+        with pytest.raises(ValueError):
+            fetch_image_url("file:///etc/passwd")
+
+    def test_fetch_connects_to_the_checked_address(self, image_server):
+        with patch("src.services.import_service.resolve_public_address", return_value="127.0.0.1") as resolve:
+            response = fetch_image_url(f"{image_server}/photo.gif")
+            try:
+                assert response.read() == b"GIF89a"
+            finally:
+                response.close()
+        assert resolve.call_args.args[0] == "images.example.com"
+
+    def test_non_image_responses_are_refused(self, image_server):
+        with patch("src.services.import_service.resolve_public_address", return_value="127.0.0.1"):
+            with pytest.raises(ValueError, match="not an image"):
+                fetch_image_url(f"{image_server}/page.html")
+
+
+class TestRowImages:
+
+    @pytest.mark.asyncio
+    async def test_failed_image_releases_the_row_images(self):
+        def open_source(reference, archive):
+            if reference == "missing.jpg":
+                raise ValueError("Image missing.jpg not found in the image archive")
+            return MagicMock()
+
+        with patch("src.services.import_service._open_image_source", side_effect=open_source), \
+             patch("src.services.import_service.store_file_object", AsyncMock(side_effect=lambda source, name: name)), \
+             patch("src.services.import_service.release_images", AsyncMock()) as release:
+            with pytest.raises(ValueError):
+                await store_row_images(["a.jpg", "missing.jpg", "b.jpg"], archive=None)
+
+        release.assert_awaited_once_with(["a.jpg", "b.jpg"])
+
+
+@pytest.mark.asyncio
+class TestImportJobs:
+
+    async def test_batch_variants_run_concurrently_with_a_bound(self):
+        running, peak, done = 0, 0, []
+
+        async def process(product_id, images):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            done.append(product_id)
+
+        products = [
+            ProductModel(product_name=f"Item {i}", description="", price=1.0, seller_id="s1",
+                         images=[f"{i}.jpg"] if i else [])
+            for i in range(6)
+        ]
+        with patch("src.services.import_service.IMPORT_VARIANT_CONCURRENCY", 2), \
+             patch("src.services.import_service.process_product_images", side_effect=process):
+            await _process_batch_images(products)
+
+        assert sorted(done) == sorted(product.id for product in products[1:])
+        assert peak == 2
+
+    async def test_failed_archive_spool_removes_the_catalog(self, tmp_path):
+        catalog = UploadFile(filename="catalog.csv", file=io.BytesIO(b"product_name,price\nHat,5\n"))
+        archive = UploadFile(filename="images.zip", file=io.BytesIO(b"x" * 64))
+
+        with patch("src.services.import_service.IMPORT_DIRECTORY", str(tmp_path)), \
+             patch("src.services.import_service.IMPORT_MAX_FILE_SIZE", 32), \
+             patch("src.services.import_service.import_jobs") as mock_jobs:
+            mock_jobs.insert_one = AsyncMock()
+            with pytest.raises(HTTPException) as exc_info:
+                await start_import("s1", catalog, archive, MagicMock())
+
+        assert exc_info.value.status_code == 413
+        assert os.listdir(tmp_path) == []
+        mock_jobs.insert_one.assert_not_awaited()
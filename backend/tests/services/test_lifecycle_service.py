@@ -0,0 +1,177 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.models.order import OrderModel
+from src.services.lifecycle_service import (
+    advance_due_orders,
+    finish_interrupted_work,
+    local_timestamp,
+    plan_transitions,
+)
+from src.services.order_services import update_order_status
+
+
+def order_doc(status, next_transition_at, **fields):
+    return {
+        "_id": "order-1",
+        "buyer_email": "buyer@example.com",
+        "order_date": "2026-03-14T10:00:00",
+        "items": [{"product_id": "p1", "product_name": "Jacket", "quantity": 1, "price": 40.0}],
+        "total_amount": 40.0,
+        "shipping_address": {"name": "Buyer"},
+        "payment_method": {"type": "card"},
+        "status": status,
+        "next_transition_at": next_transition_at,
+        "lifecycle_lock": "token",
+        **fields,
+    }
+
+
+class TestLifecycleScheduler:
+    def test_plan_catches_up_overdue_steps(self):
+        placed_at = datetime(2026, 3, 14, 10, 0, 0)
+        order = order_doc("placed", placed_at + timedelta(seconds=30))
+
+        status, next_at, tracking = plan_transitions(order, placed_at + timedelta(seconds=70))
+
+        assert status == "in_transit"
+        assert next_at == placed_at + timedelta(seconds=90)
+        assert [entry.status for entry in tracking] == ["shipped", "in_transit"]
+
+    def test_plan_stops_at_delivered(self):
+        placed_at = datetime(2026, 3, 14, 10, 0, 0)
+        order = order_doc("in_transit", placed_at + timedelta(seconds=90))
+
+        status, next_at, _ = plan_transitions(order, placed_at + timedelta(days=1))
+
+        assert (status, next_at) == ("delivered", None)
+
+    def test_catch_up_entries_carry_their_due_times(self):
+        placed_at = datetime(2026, 3, 14, 10, 0, 0)
+        order = order_doc("placed", placed_at + timedelta(seconds=30))
+
+        _, _, tracking = plan_transitions(order, placed_at + timedelta(days=1))
+
+        assert [entry.timestamp for entry in tracking] == [
+            local_timestamp(placed_at + timedelta(seconds=seconds)) for seconds in (30, 60, 90)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_unscheduled_status_stops_scheduling_without_failing_batch(self):
+        due = datetime.utcnow() - timedelta(seconds=1)
+        stale = order_doc("cancelled", due)
+        placed = {**order_doc("placed", due), "_id": "order-2"}
+        with patch("src.services.lifecycle_service.orders") as mock_orders, \
+             patch("src.services.lifecycle_service.restock_orders", AsyncMock(return_value=[])) as restock, \
+             patch("src.services.lifecycle_service.enqueue_emails", AsyncMock()):
+            mock_orders.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+                return_value=[{"_id": "order-1"}, {"_id": "order-2"}]
+            )
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=[stale, placed])
+            mock_orders.bulk_write = AsyncMock()
+
+            assert await advance_due_orders() == 2
+
+        stale_op, placed_op = mock_orders.bulk_write.call_args.args[0]
+        assert "$set" not in stale_op._doc and "$push" not in stale_op._doc
+        assert "next_transition_at" in stale_op._doc["$unset"]
+        assert placed_op._doc["$set"]["status"] == "shipped"
+        restock.assert_awaited_once_with([])
+
+    @pytest.mark.asyncio
+    async def test_advance_writes_batch_in_one_bulk_write(self):
+        due = datetime.utcnow() - timedelta(seconds=1)
+        with patch("src.services.lifecycle_service.orders") as mock_orders:
+            mock_orders.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+                return_value=[{"_id": "order-1"}]
+            )
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=[order_doc("in_transit", due)])
+            mock_orders.bulk_write = AsyncMock()
+
+            claimed = await advance_due_orders()
+
+        assert claimed == 1
+        op = mock_orders.bulk_write.call_args.args[0][0]
+        assert op._filter == {"_id": "order-1", "status": "in_transit", "lifecycle_lock": "token"}
+        assert op._doc["$set"]["status"] == "delivered"
+        assert op._doc["$set"]["can_return"] is True
+        assert "next_transition_at" in op._doc["$unset"]
+
+    @pytest.mark.asyncio
+    async def test_completed_return_is_marked_for_restock(self):
+        due = datetime.utcnow() - timedelta(seconds=1)
+        returned = OrderModel(**order_doc("returned", None))
+        with patch("src.services.lifecycle_service.orders") as mock_orders, \
+             patch("src.services.lifecycle_service.restock_orders", AsyncMock(return_value=[returned])) as restock, \
+             patch("src.services.lifecycle_service.enqueue_emails", AsyncMock()) as enqueue:
+            mock_orders.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+                return_value=[{"_id": "order-1"}]
+            )
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=[order_doc("return_in_transit", due)])
+            mock_orders.bulk_write = AsyncMock()
+
+            await advance_due_orders()
+
+        op = mock_orders.bulk_write.call_args.args[0][0]
+        assert op._doc["$set"]["restock_pending"] is True
+        restock.assert_awaited_once_with(["order-1"])
+        assert enqueue.call_args.args[0][0]["dedup_key"] == "order:order-1:returned"
+
+    @pytest.mark.asyncio
+    async def test_interrupted_restocks_are_finished(self):
+        cancelled = OrderModel(**{**order_doc("cancelled", None), "_id": "order-2"})
+        with patch("src.services.lifecycle_service.apply_pending_rollups", AsyncMock()) as rollups, \
+             patch("src.services.lifecycle_service.restock_orders", AsyncMock(return_value=[cancelled])) as restock, \
+             patch("src.services.lifecycle_service.enqueue_emails", AsyncMock()) as enqueue:
+            await finish_interrupted_work(limit=10)
+
+        rollups.assert_awaited_once_with(limit=10)
+        restock.assert_awaited_once_with(limit=10)
+        assert enqueue.call_args.args[0][0]["dedup_key"] == "order:order-2:cancelled"
+
+
+class TestUpdateOrderStatus:
+    @pytest.mark.asyncio
+    async def test_polling_does_not_advance(self):
+        with patch("src.services.order_services.orders") as mock_orders:
+            mock_orders.find_one = AsyncMock(return_value=order_doc("placed", datetime.utcnow()))
+            mock_orders.find_one_and_update = AsyncMock()
+
+            order = await update_order_status("order-1", "placed")
+
+        assert order.status == "placed"
+        mock_orders.find_one_and_update.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_cancel_is_conditional_on_current_status(self):
+        with patch("src.services.order_services.orders") as mock_orders, \
+             patch("src.services.order_services.restock_orders", AsyncMock(return_value=[])) as restock, \
+             patch("src.services.order_services.send_order_status_email", AsyncMock()) as send_email:
+            mock_orders.find_one = AsyncMock(return_value=order_doc("placed", datetime.utcnow(), can_cancel=True))
+            mock_orders.find_one_and_update = AsyncMock(return_value=order_doc("cancelled", None))
+
+            order = await update_order_status("order-1", "cancelled")
+
+        assert order.status == "cancelled"
+        query, update = mock_orders.find_one_and_update.call_args.args
+        assert query == {"_id": "order-1", "status": "placed"}
+        assert "next_transition_at" in update["$unset"]
+        assert update["$set"]["restock_pending"] is True
+        restock.assert_awaited_once_with(["order-1"])
+        # Restocked by an earlier attempt: no second email
+        send_email.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_lost_race_does_not_restore_products(self):
+        with patch("src.services.order_services.orders") as mock_orders, \
+             patch("src.services.order_services.restock_orders", AsyncMock()) as restock:
+            mock_orders.find_one = AsyncMock(return_value=order_doc("placed", datetime.utcnow(), can_cancel=True))
+            mock_orders.find_one_and_update = AsyncMock(return_value=None)
+
+            with pytest.raises(Exception):
+                await update_order_status("order-1", "cancelled")
+
+        restock.assert_not_awaited()
@@ -0,0 +1,94 @@
+import asyncio
+import smtplib
+import pytest
+from src.services.mail_service import Mailer, PooledConnection
+
+"""Test suite for the pooled async mailer"""
+
+
+class FakeServer:
+    def __init__(self, fail_first: bool = False, error: Exception = None):
+        self.sent = []
+        self.fail_first = fail_first
+        self.error = error or smtplib.SMTPServerDisconnected("gone")
+        self.closed = False
+
+    def sendmail(self, sender, to, message):
+        if self.fail_first:
+            self.fail_first = False
+            raise self.error
+        self.sent.append(to)
+
+    def quit(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPooledConnection:
+
+    def test_connection_is_reused_and_reopened_after_idle(self):
+        servers = []
+        clock = FakeClock()
+
+        def factory():
+            servers.append(FakeServer())
+            return servers[-1]
+
+        connection = PooledConnection(factory, idle_seconds=60, clock=clock)
+        connection.send("a@example.com", "hi")
+        connection.send("b@example.com", "hi")
+        assert len(servers) == 1 and servers[0].sent == ["a@example.com", "b@example.com"]
+
+        clock.now += 61
+        connection.send("c@example.com", "hi")
+        assert len(servers) == 2 and servers[0].closed
+
+    def test_dropped_connection_is_reopened_and_retried(self):
+        servers = [FakeServer(fail_first=True), FakeServer()]
+        connection = PooledConnection(lambda: servers.pop(0))
+
+        connection.send("a@example.com", "hi")
+
+        assert connection.server.sent == ["a@example.com"]
+
+    def test_protocol_error_is_raised_not_retried(self):
+        error = smtplib.SMTPDataError(451, b"Requested action aborted")
+        servers = [FakeServer(fail_first=True, error=error), FakeServer()]
+        connection = PooledConnection(lambda: servers.pop(0))
+
+        with pytest.raises(smtplib.SMTPDataError):
+            connection.send("a@example.com", "hi")
+
+        # No second connection was opened to resend the message
+        assert len(servers) == 1
+
+
+@pytest.mark.asyncio
+class TestMailer:
+
+    async def test_deliveries_share_the_pool(self):
+        servers = []
+
+        def factory():
+            servers.append(FakeServer())
+            return servers[-1]
+
+        mailer = Mailer(pool_size=2, connection_factory=factory)
+        await asyncio.gather(*[
+            mailer.deliver(f"user{i}@example.com", "Welcome", "Hello") for i in range(5)
+        ])
+
+        await mailer.stop()
+
+        assert sorted(to for server in servers for to in server.sent) == [
+            f"user{i}@example.com" for i in range(5)
+        ]
+        assert len(servers) <= 2
+        assert mailer.stats()["sent"] == 5
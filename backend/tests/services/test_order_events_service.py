@@ -0,0 +1,128 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from pymongo.errors import OperationFailure
+from src.services.order_events_service import order_events, OrderEventHub, CHANGE_STREAMS_UNSUPPORTED
+
+
+class FakeChangeStream:
+    def __init__(self):
+        self.changes = asyncio.Queue()
+        self.alive = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.alive = False
+
+    def push(self, order_id, operation="update"):
+        self.changes.put_nowait({"operationType": operation, "documentKey": {"_id": order_id}})
+
+    async def try_next(self):
+        try:
+            return await asyncio.wait_for(self.changes.get(), 0.01)
+        except asyncio.TimeoutError:
+            return None
+
+
+class UnsupportedChangeStream:
+    async def __aenter__(self):
+        raise OperationFailure("$changeStream is only supported on replica sets", code=CHANGE_STREAMS_UNSUPPORTED)
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+def order_state(status, **fields):
+    return {"_id": "order-1", "status": status, "tracking_history": [], "can_cancel": False, **fields}
+
+
+async def collect(events, limit=10):
+    received = []
+    async for event in events:
+        received.append(event)
+        if len(received) >= limit:
+            break
+    return received
+
+
+class TestOrderEvents:
+    @pytest.mark.asyncio
+    async def test_clients_share_one_change_stream(self):
+        hub = OrderEventHub()
+        stream = FakeChangeStream()
+        states = {"order-1": order_state("placed", can_cancel=True), "order-2": order_state("placed")}
+        with patch("src.services.order_events_service.orders") as mock_orders, \
+             patch("src.services.order_events_service.order_event_hub", hub):
+            mock_orders.watch = MagicMock(return_value=stream)
+            mock_orders.find_one = AsyncMock(side_effect=lambda query, fields: states[query["_id"]])
+
+            first, second = order_events("order-1"), order_events("order-1")
+            assert (await first.__anext__())["status"] == "placed"
+            assert (await second.__anext__())["status"] == "placed"
+            reads = mock_orders.find_one.await_count
+
+            # Nobody follows order-2, so its change is not read
+            stream.push("order-2")
+            states["order-1"] = order_state("shipped")
+            stream.push("order-1")
+            assert (await first.__anext__())["status"] == "shipped"
+            assert (await second.__anext__())["status"] == "shipped"
+            assert mock_orders.find_one.await_count == reads + 1
+
+            states["order-1"] = order_state("cancelled")
+            stream.push("order-1")
+            assert [event["status"] for event in await collect(first)] == ["cancelled"]
+            assert [event["status"] for event in await collect(second)] == ["cancelled"]
+            hub.close()
+
+        mock_orders.watch.assert_called_once()
+        assert mock_orders.watch.call_args.args[0][0]["$match"] == {
+            "operationType": {"$in": ["update", "replace", "delete"]}
+        }
+
+    @pytest.mark.asyncio
+    async def test_idle_stream_yields_heartbeats_and_ends_on_delete(self):
+        hub = OrderEventHub()
+        stream = FakeChangeStream()
+        with patch("src.services.order_events_service.orders") as mock_orders, \
+             patch("src.services.order_events_service.order_event_hub", hub), \
+             patch("src.services.order_events_service.ORDER_EVENTS_HEARTBEAT_SECONDS", 0.01):
+            mock_orders.watch = MagicMock(return_value=stream)
+            mock_orders.find_one = AsyncMock(return_value=order_state("placed"))
+
+            events = order_events("order-1")
+            assert (await events.__anext__())["status"] == "placed"
+            assert await events.__anext__() is None
+            stream.push("order-1", "delete")
+            received = await collect(events)
+            hub.close()
+
+        assert all(event is None for event in received)
+
+    @pytest.mark.asyncio
+    async def test_final_order_ends_immediately(self):
+        hub = OrderEventHub()
+        with patch("src.services.order_events_service.orders") as mock_orders, \
+             patch("src.services.order_events_service.order_event_hub", hub):
+            mock_orders.watch = MagicMock(return_value=FakeChangeStream())
+            mock_orders.find_one = AsyncMock(return_value=order_state("returned"))
+
+            received = await collect(order_events("order-1"))
+            hub.close()
+
+        assert [event["status"] for event in received] == ["returned"]
+
+    @pytest.mark.asyncio
+    async def test_standalone_server_falls_back_to_polling(self):
+        reads = [order_state("placed"), order_state("placed"), order_state("shipped"), order_state("cancelled")]
+        with patch("src.services.order_events_service.orders") as mock_orders, \
+             patch("src.services.order_events_service.order_event_hub", OrderEventHub()), \
+             patch("src.services.order_events_service.asyncio.sleep", AsyncMock()):
+            mock_orders.watch = MagicMock(return_value=UnsupportedChangeStream())
+            mock_orders.find_one = AsyncMock(side_effect=reads)
+
+            received = await collect(order_events("order-1"))
+
+        assert [event and event["status"] for event in received] == ["placed", "shipped", "cancelled"]
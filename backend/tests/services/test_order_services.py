@@ -1,7 +1,8 @@
 import pytest
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from fastapi import HTTPException
-from src.services.order_services import get_user_orders
+from src.services.order_services import get_user_orders, get_user_orders_page, ORDER_SUMMARY_PROJECTION
+from src.utils.pagination import decode_cursor, encode_cursor
 from src.models.order import OrderModel, OrderItem
 
 """Test suite for order service with focus on viewing orders functionality"""
@@ -113,4 +114,52 @@ class TestOrderService:
         
         with pytest.raises(ValueError) as exc_info:
             await get_user_orders("invalid-email")
-        assert "Invalid email format" in str(exc_info.value)
\ No newline at end of file
+        assert "Invalid email format" in str(exc_info.value)
+
+
+def order_history(count):
+    return [
+        {
+            "_id": f"order-{i}",
+            "buyer_email": "test@buyer.com",
+            "order_date": f"2026-03-{20 - i:02d}T10:00:00",
+            "items": [],
+            "total_amount": 10.0,
+            "shipping_address": {"name": "Buyer"},
+            "payment_method": {"type": "card"},
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.asyncio
+class TestOrderHistoryPages:
+
+    async def test_first_page_returns_next_cursor(self):
+        with patch("src.services.order_services.orders") as mock_orders:
+            mock_orders.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+                return_value=order_history(3)
+            )
+
+            page, next_cursor = await get_user_orders_page("test@buyer.com", limit=2, summary=True)
+
+        assert [order.id for order in page] == ["order-0", "order-1"]
+        assert decode_cursor(next_cursor) == ("2026-03-19T10:00:00", "order-1")
+        query, projection = mock_orders.find.call_args.args
+        assert query == {"buyer_email": "test@buyer.com"}
+        assert projection == ORDER_SUMMARY_PROJECTION
+        mock_orders.find.return_value.sort.return_value.limit.assert_called_once_with(3)
+
+    async def test_cursor_continues_after_last_order(self):
+        cursor = encode_cursor("2026-03-19T10:00:00", "order-1")
+        with patch("src.services.order_services.orders") as mock_orders:
+            mock_orders.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(
+                return_value=order_history(1)
+            )
+
+            page, next_cursor = await get_user_orders_page("test@buyer.com", limit=2, cursor=cursor)
+
+        assert next_cursor is None
+        query = mock_orders.find.call_args.args[0]
+        assert query["$or"][0] == {"order_date": {"$lt": "2026-03-19T10:00:00"}}
+        assert mock_orders.find.call_args.args[1] is None
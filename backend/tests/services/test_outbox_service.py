@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from pymongo.errors import DuplicateKeyError
+from smtp import SmtpSink
+from src.services.mail_service import Mailer
+from src.services.outbox_service import enqueue_email, mark_failed, outbox_message, OUTBOX_MAX_ATTEMPTS
+from src.config.database import client
+from src.workers import email_dispatcher
+from src.workers.email_dispatcher import EmailDispatcher
+
+"""Test suite for the email outbox and its dispatcher"""
+
+
+@pytest.mark.asyncio
+class TestOutbox:
+
+    async def test_duplicate_dedup_key_is_skipped(self):
+        with patch("src.services.outbox_service.email_outbox") as mock_outbox:
+            mock_outbox.insert_one = AsyncMock(side_effect=[None, DuplicateKeyError("dup")])
+
+            assert await enqueue_email("a@example.com", "Order placed", "...", dedup_key="order:1:placed") is True
+            assert await enqueue_email("a@example.com", "Order placed", "...", dedup_key="order:1:placed") is False
+
+        stored = mock_outbox.insert_one.call_args_list[0][0][0]
+        assert stored["status"] == "pending" and stored["dedup_key"] == "order:1:placed"
+
+    async def test_failures_back_off_then_park(self):
+        message = outbox_message("a@example.com", "Hi", "...")
+        with patch("src.services.outbox_service.email_outbox") as mock_outbox:
+            mock_outbox.update_one = AsyncMock()
+
+            await mark_failed(message, "timeout")
+            retry = mock_outbox.update_one.call_args[0][1]["$set"]
+            assert retry["status"] == "pending" and retry["attempts"] == 1
+            assert retry["next_attempt_at"] > datetime.utcnow()
+
+            await mark_failed({**message, "attempts": OUTBOX_MAX_ATTEMPTS - 1}, "timeout")
+            assert mock_outbox.update_one.call_args[0][1]["$set"]["status"] == "failed"
+
+
+@pytest.mark.asyncio
+class TestEmailDispatcher:
+
+    async def test_batch_is_sent_to_sink_with_recipient_limit(self):
+        SmtpSink.messages.clear()
+        batch = [outbox_message("a@example.com", f"Update {i}", "...") for i in range(3)]
+        batch.append(outbox_message("b@example.com", "Welcome", "..."))
+        dispatcher = EmailDispatcher(
+            mailer=Mailer(pool_size=2, connection_factory=SmtpSink),
+            send_rate=0,
+            recipient_limit=2,
+        )
+
+        with patch("src.workers.email_dispatcher.claim_batch", AsyncMock(return_value=batch)), \
+             patch("src.workers.email_dispatcher.defer", AsyncMock()) as mock_defer, \
+             patch("src.workers.email_dispatcher.mark_failed", AsyncMock()) as mock_failed, \
+             patch("src.workers.email_dispatcher.mark_sent", AsyncMock()) as mock_sent:
+            assert await dispatcher.dispatch_once() == 4
+            await dispatcher.mailer.stop()
+
+        assert sorted(entry["to"] for entry in SmtpSink.messages) == ["a@example.com", "a@example.com", "b@example.com"]
+        assert mock_defer.call_args[0][0] == [batch[2]["_id"]]
+        assert sorted(mock_sent.call_args[0][0]) == sorted(m["_id"] for m in batch if m is not batch[2])
+        mock_failed.assert_not_awaited()
+
+
+class TestEmailDispatcherEntrypoint:
+
+    def test_main_runs_on_the_database_client_loop(self):
+        loops = []
+
+        async def run(self):
+            loops.append(asyncio.get_running_loop())
+
+        with patch.object(EmailDispatcher, "run", run):
+            email_dispatcher.main()
+
+        assert loops == [client.get_io_loop()]
@@ -1,8 +1,15 @@
 import pytest
-from unittest.mock import AsyncMock, patch, ANY
+from unittest.mock import AsyncMock, MagicMock, patch, ANY
 from datetime import datetime
 from fastapi import HTTPException
-from src.services.product_service import review_product
+from src.services.product_service import (
+    review_product,
+    get_catalog_page,
+    bulk_upload_products,
+    process_product_images,
+    upload_products,
+)
+from src.utils.pagination import encode_cursor, decode_cursor
 from src.schemas.product_schema import UpdateProductRequest
 from src.models.product import ProductModel
 
@@ -144,4 +151,140 @@ class TestProductService:
                     )
 
                     assert result.status == "rejected"
-                    assert result.admin_comments == "Product does not meet quality standards"
\ No newline at end of file
+                    assert result.admin_comments == "Product does not meet quality standards"
+
+"""Test suite for the paginated buyer catalog"""
+@pytest.mark.asyncio
+class TestCatalogPagination:
+
+    def _mock_collection(self, docs):
+        cursor = MagicMock()
+        cursor.sort.return_value = cursor
+        cursor.limit.return_value = cursor
+        cursor.to_list = AsyncMock(return_value=docs)
+        collection = MagicMock()
+        collection.find.return_value = cursor
+        return collection, cursor
+
+    async def test_catalog_page_returns_next_cursor(self):
+        docs = [{"_id": f"p{i}", "price": 10.0 + i} for i in (3, 2, 1)]
+        collection, cursor = self._mock_collection(docs)
+
+        with patch("src.services.product_service.product_collection", collection):
+            page = await get_catalog_page(limit=2)
+
+        assert [p["_id"] for p in page["products"]] == ["p3", "p2"]
+        assert decode_cursor(page["next_cursor"]) == ("p2", "p2")
+        cursor.limit.assert_called_once_with(3)
+        cursor.sort.assert_called_once_with([("_id", -1)])
+
+    async def test_catalog_page_applies_cursor_and_projection(self):
+        collection, cursor = self._mock_collection([{"_id": "p1", "price": 5.0}])
+        after = encode_cursor(9.5, "p7")
+
+        with patch("src.services.product_service.product_collection", collection):
+            page = await get_catalog_page(
+                limit=2, cursor=after, fields=["product_name"], sort="price_asc"
+            )
+
+        query, projection = collection.find.call_args[0]
+        assert query["status"] == "approved"
+        assert query["$or"] == [
+            {"price": {"$gt": 9.5}},
+            {"price": 9.5, "_id": {"$gt": "p7"}},
+        ]
+        assert projection == {"product_name": 1, "price": 1}
+        assert page["next_cursor"] is None
+
+    async def test_catalog_page_rejects_unknown_fields(self):
+        with pytest.raises(HTTPException) as exc_info:
+            await get_catalog_page(fields=["admin_comments"])
+        assert exc_info.value.status_code == 400
+
+
+class AsyncIter:
+    def __init__(self, items):
+        self.items = list(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.items:
+            raise StopAsyncIteration
+        return self.items.pop(0)
+
+
+"""Test suite for bulk product ingestion"""
+@pytest.mark.asyncio
+class TestBulkUpload:
+
+    async def test_bulk_upload_validates_rows_and_inserts_once(self):
+        rows = [
+            {"product_name": "Denim Jacket", "description": "Blue", "price": 45.0,
+             "category": "Jackets", "seller_id": "s123"},
+            {"product_name": "Scarf", "description": "Wool", "price": "free",
+             "category": "Accessories", "seller_id": "s123"},
+            {"product_name": "Boots", "description": "Leather", "price": 80.0,
+             "category": "Shoes", "seller_id": "s123"},
+        ]
+        row_images = [[MagicMock()], [MagicMock()], [MagicMock(), MagicMock()]]
+        collection = MagicMock()
+        collection.insert_many = AsyncMock()
+        user_collection = MagicMock()
+        user_collection.find.side_effect = [
+            AsyncIter([{"email": "seller@example.com", "business_name": "s123"}]),
+            AsyncIter([{"email": "admin@example.com"}]),
+        ]
+        background_tasks = MagicMock()
+
+        with patch("src.services.product_service.product_collection", collection), \
+                patch("src.services.product_service.users", user_collection), \
+                patch("src.services.product_service.enqueue_email", AsyncMock()) as mock_enqueue, \
+                patch("src.services.product_service.save_image",
+                      AsyncMock(side_effect=["a.jpg", "b.jpg", "c.jpg"])) as mock_save:
+            outcome = await bulk_upload_products(rows, row_images, background_tasks)
+
+        statuses = [result["status"] for result in outcome["results"]]
+        assert statuses == ["created", "error", "created"]
+        assert mock_save.await_count == 3
+        collection.insert_many.assert_awaited_once()
+        inserted = collection.insert_many.call_args[0][0]
+        assert [doc["product_name"] for doc in inserted] == ["Denim Jacket", "Boots"]
+        assert sorted(sum((doc["images"] for doc in inserted), [])) == ["a.jpg", "b.jpg", "c.jpg"]
+
+        # Two variant jobs, plus one seller digest and one admin digest in the outbox
+        assert background_tasks.add_task.call_count == 2
+        assert [call[0][0] for call in mock_enqueue.call_args_list] == [
+            "seller@example.com", "admin@example.com"
+        ]
+
+    async def test_oversized_image_is_reported_as_413(self):
+        rows = [
+            {"product_name": "Denim Jacket", "description": "Blue", "price": 45.0,
+             "category": "Jackets", "seller_id": "s123"},
+            {"product_name": "Boots", "description": "Leather", "price": 80.0,
+             "category": "Shoes", "seller_id": "s123"},
+        ]
+        too_large = HTTPException(status_code=413, detail="Image exceeds the upload size limit")
+        collection = MagicMock()
+        collection.insert_many = AsyncMock()
+
+        with patch("src.services.product_service.product_collection", collection), \
+                patch("src.services.product_service._notify_product_submissions", AsyncMock()), \
+                patch("src.services.product_service.release_images", AsyncMock()), \
+                patch("src.services.product_service.save_image", AsyncMock(side_effect=[too_large, "b.jpg"])):
+            outcome = await bulk_upload_products(rows, [[MagicMock()], [MagicMock()]], MagicMock())
+
+        assert outcome["results"][0] == {
+            "row": 0, "status": "error", "error": "Image exceeds the upload size limit", "status_code": 413,
+        }
+        assert outcome["results"][1]["status"] == "created"
+
+        with patch("src.services.product_service.product_collection", collection), \
+                patch("src.services.product_service.save_image", AsyncMock(side_effect=too_large)), \
+                patch("src.services.product_service.release_images", AsyncMock()):
+            with pytest.raises(HTTPException) as exc_info:
+                await upload_products(rows[0], [MagicMock()], MagicMock())
+
+        assert exc_info.value.status_code == 413
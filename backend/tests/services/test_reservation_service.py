@@ -0,0 +1,71 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import HTTPException
+from src.services.reservation_service import reserve_products
+
+"""Test suite for inventory reservations"""
+
+
+class TestReservations:
+
+    @pytest.mark.asyncio
+    async def test_reserve_products_claims_all(self):
+        with patch("src.services.reservation_service.product_collection") as mock_products:
+            mock_products.update_many = AsyncMock(return_value=MagicMock(matched_count=2))
+
+            expires_at = await reserve_products("buyer@example.com", ["p1", "p2", "p1"])
+
+        assert expires_at > datetime.utcnow()
+        query, update = mock_products.update_many.call_args.args
+        assert query["_id"] == {"$in": ["p1", "p2"]}
+        assert query["status"] == "approved"
+        assert {"reserved_until": None} in query["$or"]
+        assert update["$set"]["reserved_by"] == "buyer@example.com"
+
+    @pytest.mark.asyncio
+    async def test_reserve_products_conflict_releases_own_holds(self):
+        with patch("src.services.reservation_service.product_collection") as mock_products:
+            mock_products.update_many = AsyncMock(return_value=MagicMock(matched_count=1))
+            mock_products.count_documents = AsyncMock(return_value=0)
+            mock_products.distinct = AsyncMock(return_value=["p1"])
+
+            with pytest.raises(HTTPException) as exc_info:
+                await reserve_products("buyer@example.com", ["p1", "p2"])
+
+        assert exc_info.value.status_code == 409
+        assert exc_info.value.detail["product_ids"] == ["p2"]
+        token = mock_products.update_many.call_args_list[0].args[1]["$set"]["reservation_id"]
+        release_query, release = mock_products.update_many.call_args_list[1].args
+        assert release_query == {"reservation_id": token}
+        assert "reserved_by" in release["$unset"]
+
+    @pytest.mark.asyncio
+    async def test_reserve_products_extends_existing_holds(self):
+        with patch("src.services.reservation_service.product_collection") as mock_products:
+            mock_products.update_many = AsyncMock(side_effect=[MagicMock(matched_count=1), MagicMock(matched_count=1)])
+            mock_products.count_documents = AsyncMock(return_value=1)
+
+            expires_at = await reserve_products("buyer@example.com", ["p1", "p2"])
+
+        claim, extend = mock_products.update_many.call_args_list
+        token = claim.args[1]["$set"]["reservation_id"]
+        assert extend.args[0]["reserved_by"] == "buyer@example.com"
+        assert extend.args[0]["reservation_id"] == {"$ne": token}
+        assert extend.args[1] == {"$set": {"reserved_until": expires_at}}
+
+    @pytest.mark.asyncio
+    async def test_reserve_products_conflict_keeps_earlier_holds(self):
+        with patch("src.services.reservation_service.product_collection") as mock_products:
+            # p1 is newly claimed, p2 was already held by the buyer, p3 is taken
+            mock_products.update_many = AsyncMock(return_value=MagicMock(matched_count=1))
+            mock_products.count_documents = AsyncMock(return_value=1)
+            mock_products.distinct = AsyncMock(return_value=["p1", "p2"])
+
+            with pytest.raises(HTTPException) as exc_info:
+                await reserve_products("buyer@example.com", ["p1", "p2", "p3"])
+
+        assert exc_info.value.detail["product_ids"] == ["p3"]
+        # The buyer's earlier hold on p2 is neither extended nor released
+        claim, release = mock_products.update_many.call_args_list
+        assert release.args[0] == {"reservation_id": claim.args[1]["$set"]["reservation_id"]}
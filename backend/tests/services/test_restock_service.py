@@ -0,0 +1,106 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from src.models.order import OrderModel
+from src.services.order_services import cancel_orders
+from src.services.restock_service import restock_orders
+
+
+def cancelled_order(order_id, buyer_email, product_ids):
+    return {
+        "_id": order_id,
+        "buyer_email": buyer_email,
+        "items": [
+            {"product_id": product_id, "product_name": "Item", "quantity": 1, "price": 10.0}
+            for product_id in product_ids
+        ],
+        "total_amount": 10.0 * len(product_ids),
+        "shipping_address": {"name": "Buyer"},
+        "payment_method": {"type": "card"},
+        "status": "cancelled",
+    }
+
+
+class TestRestockService:
+    @pytest.mark.asyncio
+    async def test_restock_claims_marker_and_restores_in_one_write(self):
+        claimed = [
+            cancelled_order("o1", "a@example.com", ["p1", "p2"]),
+            cancelled_order("o2", "b@example.com", ["p3"]),
+        ]
+        with patch("src.services.restock_service.orders") as mock_orders, \
+             patch("src.services.restock_service.product_collection") as mock_products, \
+             patch("src.services.restock_service.invalidate_product_cache", AsyncMock()) as invalidate, \
+             patch("src.services.restock_service.apply_orders_to_rollups", AsyncMock()) as rollups:
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=claimed)
+            mock_products.update_many = AsyncMock()
+
+            restocked = await restock_orders(["o1", "o2"])
+
+        assert [order.id for order in restocked] == ["o1", "o2"]
+        claim, done = mock_orders.update_many.call_args_list
+        claim_filter, claim_update = claim.args
+        assert claim_filter["_id"] == {"$in": ["o1", "o2"]} and claim_filter["restock_pending"] is True
+        token = claim_update["$set"]["restock_token"]
+        assert done.args[0] == {"restock_token": token}
+        assert "restock_pending" in done.args[1]["$unset"] and "restocked_at" in done.args[1]["$set"]
+        mock_products.update_many.assert_awaited_once()
+        assert mock_products.update_many.call_args.args[0] == {"$or": [
+            {"_id": {"$in": ["p1", "p2"]}, "buyer_email": "a@example.com"},
+            {"_id": {"$in": ["p3"]}, "buyer_email": "b@example.com"},
+        ]}
+        invalidate.assert_awaited_once_with("p1", "p2", "p3")
+        assert rollups.call_args.kwargs["sign"] == -1
+
+    @pytest.mark.asyncio
+    async def test_failure_midway_keeps_order_pending(self):
+        claimed = [cancelled_order("o1", "a@example.com", ["p1"])]
+        with patch("src.services.restock_service.orders") as mock_orders, \
+             patch("src.services.restock_service.product_collection") as mock_products, \
+             patch("src.services.restock_service.invalidate_product_cache", AsyncMock()), \
+             patch("src.services.restock_service.apply_orders_to_rollups", AsyncMock()) as rollups:
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=claimed)
+            mock_products.update_many = AsyncMock()
+
+            # The products were restored but the rollups could not be written
+            rollups.side_effect = ConnectionError("lost")
+            with pytest.raises(ConnectionError):
+                await restock_orders(["o1"])
+            mock_orders.update_many.assert_awaited_once()
+            assert "$unset" not in mock_orders.update_many.call_args.args[1]
+
+            # A later call claims the order again and finishes it
+            rollups.side_effect = None
+            assert [order.id for order in await restock_orders(["o1"])] == ["o1"]
+
+        assert "restock_pending" in mock_orders.update_many.call_args.args[1]["$unset"]
+        assert mock_products.update_many.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_repeat_restock_does_nothing(self):
+        with patch("src.services.restock_service.orders") as mock_orders, \
+             patch("src.services.restock_service.product_collection") as mock_products:
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=[])
+            mock_products.update_many = AsyncMock()
+
+            assert await restock_orders(["o1"]) == []
+
+        mock_products.update_many.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_bulk_cancel_skips_orders_it_did_not_cancel(self):
+        restocked = [OrderModel(**cancelled_order("o1", "a@example.com", ["p1"]))]
+        with patch("src.services.order_services.orders") as mock_orders, \
+             patch("src.services.order_services.restock_orders", AsyncMock(return_value=restocked)), \
+             patch("src.services.order_services.enqueue_emails", AsyncMock()) as enqueue:
+            mock_orders.update_many = AsyncMock()
+
+            cancelled = await cancel_orders(["o1", "o2"])
+
+        assert cancelled == ["o1"]
+        cancel_filter, cancel_update = mock_orders.update_many.call_args.args
+        assert cancel_filter == {"_id": {"$in": ["o1", "o2"]}, "can_cancel": True}
+        assert cancel_update["$set"]["restock_pending"] is True
+        assert len(enqueue.call_args.args[0]) == 1
@@ -0,0 +1,229 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from src.models.order import OrderItem, OrderModel, TrackingHistory
+from src.services.rollup_service import apply_order_to_rollups, apply_pending_rollups, rebuild_rollups, rollup_operations
+from src.services.restock_service import restock_orders
+from src.services.seller_service import get_seller_analytics
+from src.migrations.backfill_order_sellers import backfill_batch
+
+
+@pytest.fixture
+def order():
+    return OrderModel(
+        _id="order-1",
+        buyer_email="buyer@example.com",
+        items=[
+            OrderItem(product_id="p1", product_name="Jacket", quantity=1, price=40.0),
+            OrderItem(product_id="p2", product_name="Scarf", quantity=2, price=10.0),
+            OrderItem(product_id="p3", product_name="Hat", quantity=1, price=5.0),
+        ],
+        total_amount=65.0,
+        shipping_address={"name": "Buyer"},
+        payment_method={"type": "card"},
+        order_date="2026-03-14T10:00:00",
+        status="placed",
+        tracking_history=[TrackingHistory(status="placed", timestamp="2026-03-14T10:00:00", description="")],
+    )
+
+
+PRODUCTS = {
+    "p1": {"_id": "p1", "seller_id": "Shop", "category": "Outerwear"},
+    "p2": {"_id": "p2", "seller_id": "Shop", "category": "Accessories"},
+    "p3": {"_id": "p3", "seller_id": "Other", "category": "Accessories"},
+}
+
+
+class TestRollupService:
+    def test_rollup_operations_counts_per_seller_day_and_category(self, order):
+        rollups, summaries = rollup_operations(order, PRODUCTS)
+
+        updates = {op._filter["_id"]: op._doc for op in rollups}
+        assert set(updates) == {
+            "Shop:2026-03-14:Outerwear", "Shop:2026-03-14:Accessories", "Other:2026-03-14:Accessories"
+        }
+        accessories = updates["Shop:2026-03-14:Accessories"]
+        assert accessories["$inc"] == {"revenue": 20.0, "quantity": 2, "orders": 1}
+        assert accessories["$setOnInsert"]["month"] == 3
+        assert {op._filter["_id"] for op in summaries} == {"Shop", "Other"}
+
+    def test_reversal_negates_counters_and_pulls_recent_sales(self, order):
+        rollups, summaries = rollup_operations(order, PRODUCTS, sign=-1)
+
+        assert all(op._doc["$inc"]["orders"] == -1 for op in rollups)
+        jacket = next(op for op in rollups if op._filter["_id"] == "Shop:2026-03-14:Outerwear")
+        assert jacket._doc["$inc"]["revenue"] == -40.0
+        assert all(op._doc == {"$pull": {"recent_sales": {"order_id": "order-1"}}} for op in summaries)
+
+    @pytest.mark.asyncio
+    async def test_apply_order_looks_up_sellers_once(self, order):
+        with patch("src.services.rollup_service.product_collection") as mock_products, \
+             patch("src.services.rollup_service.seller_sales_rollups") as mock_rollups, \
+             patch("src.services.rollup_service.seller_sales_summary") as mock_summary:
+            mock_products.find.return_value.to_list = AsyncMock(return_value=list(PRODUCTS.values()))
+            mock_rollups.bulk_write = AsyncMock()
+            mock_summary.bulk_write = AsyncMock()
+
+            await apply_order_to_rollups(order)
+
+        mock_products.find.assert_called_once()
+        assert len(mock_rollups.bulk_write.call_args.args[0]) == 3
+        assert len(mock_summary.bulk_write.call_args.args[0]) == 2
+
+    @pytest.mark.asyncio
+    async def test_pending_rollups_keep_marker_until_written(self, order):
+        with patch("src.services.rollup_service.orders") as mock_orders, \
+             patch("src.services.rollup_service.apply_orders_to_rollups", AsyncMock()) as apply:
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=[order.dict(by_alias=True)])
+
+            apply.side_effect = ConnectionError("lost")
+            with pytest.raises(ConnectionError):
+                await apply_pending_rollups(["order-1"])
+            # Only the claim was written; the marker is still there
+            mock_orders.update_many.assert_awaited_once()
+            claim_filter, claim_update = mock_orders.update_many.call_args.args
+            assert claim_filter["rollup_pending"] is True
+            assert "rollup_token" in claim_update["$set"]
+
+            apply.side_effect = None
+            assert await apply_pending_rollups(["order-1"]) == 1
+
+        done_filter, done_update = mock_orders.update_many.call_args.args
+        assert list(done_filter) == ["rollup_token"]
+        assert "rollup_pending" in done_update["$unset"]
+
+
+class AsyncIter:
+    def __init__(self, items):
+        self.items = list(items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.items:
+            raise StopAsyncIteration
+        return self.items.pop(0)
+
+
+class TestRebuildRollups:
+
+    @pytest.mark.asyncio
+    async def test_rebuild_then_pending_restock_nets_to_zero(self, order):
+        order.items = [OrderItem(product_id="p1", product_name="Jacket", quantity=1, price=40.0, seller_id="Shop",
+                                 category="Outerwear")]
+        cancelled = {**order.dict(by_alias=True), "status": "cancelled", "restock_pending": True}
+        totals = {}
+
+        async def bulk_write(operations, **kwargs):
+            for op in operations:
+                counter = totals.setdefault(op._filter["_id"], {"revenue": 0, "quantity": 0, "orders": 0})
+                for field, value in op._doc["$inc"].items():
+                    counter[field] += value
+
+        with patch("src.services.rollup_service.orders") as mock_orders, \
+             patch("src.services.rollup_service.seller_sales_rollups") as mock_rollups, \
+             patch("src.services.rollup_service.seller_sales_summary") as mock_summary:
+            mock_rollups.delete_many = AsyncMock()
+            mock_rollups.bulk_write = AsyncMock(side_effect=bulk_write)
+            mock_summary.delete_many = AsyncMock()
+            mock_summary.bulk_write = AsyncMock()
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.batch_size.return_value = AsyncIter([cancelled])
+
+            assert await rebuild_rollups() == 1
+
+        assert {"restock_pending": True} in mock_orders.find.call_args.args[0]["$or"]
+        assert totals["Shop:2026-03-14:Outerwear"]["orders"] == 1
+
+        with patch("src.services.restock_service.orders") as mock_orders, \
+             patch("src.services.restock_service.product_collection") as mock_products, \
+             patch("src.services.restock_service.invalidate_product_cache", AsyncMock()), \
+             patch("src.services.rollup_service.seller_sales_rollups") as mock_rollups, \
+             patch("src.services.rollup_service.seller_sales_summary") as mock_summary:
+            mock_orders.update_many = AsyncMock()
+            mock_orders.find.return_value.to_list = AsyncMock(return_value=[cancelled])
+            mock_products.update_many = AsyncMock()
+            mock_rollups.bulk_write = AsyncMock(side_effect=bulk_write)
+            mock_summary.bulk_write = AsyncMock()
+
+            await restock_orders(["order-1"])
+
+        assert totals["Shop:2026-03-14:Outerwear"] == {"revenue": 0, "quantity": 0, "orders": 0}
+
+
+class TestSellerAnalytics:
+    @pytest.mark.asyncio
+    async def test_dashboard_reads_rollups(self):
+        facets = {
+            "totals": [{"_id": None, "quantity": 3, "revenue": 60.0}],
+            "revenue_trend": [{"_id": {"year": 2026, "month": 3}, "revenue": 60.0}],
+            "category_sales": [{"_id": "Outerwear", "total_quantity": 1, "total_revenue": 40.0}],
+        }
+        with patch("src.services.seller_service.product_collection") as mock_products, \
+             patch("src.services.seller_service.seller_sales_rollups") as mock_rollups, \
+             patch("src.services.seller_service.seller_sales_summary") as mock_summary:
+            mock_products.aggregate.return_value.to_list = AsyncMock(
+                return_value=[{"_id": "approved", "count": 2}, {"_id": "pending", "count": 1}]
+            )
+            mock_rollups.aggregate.return_value.to_list = AsyncMock(return_value=[facets])
+            mock_summary.find_one = AsyncMock(return_value={"recent_sales": [{"order_id": "order-1"}]})
+
+            result = await get_seller_analytics("Shop")
+
+        assert result["stats"] == {
+            "total_products": 3,
+            "pending_approvals": 1,
+            "rejected_products": 0,
+            "total_sales": 3,
+            "revenue": 60.0,
+        }
+        assert result["recent_sales"] == [{"order_id": "order-1"}]
+        assert result["revenue_trend"] == facets["revenue_trend"]
+        assert mock_rollups.aggregate.call_args.args[0][0] == {"$match": {"seller_id": "Shop"}}
+
+    @pytest.mark.asyncio
+    async def test_dashboard_without_sales(self):
+        with patch("src.services.seller_service.product_collection") as mock_products, \
+             patch("src.services.seller_service.seller_sales_rollups") as mock_rollups, \
+             patch("src.services.seller_service.seller_sales_summary") as mock_summary:
+            mock_products.aggregate.return_value.to_list = AsyncMock(return_value=[])
+            mock_rollups.aggregate.return_value.to_list = AsyncMock(
+                return_value=[{"totals": [], "revenue_trend": [], "category_sales": []}]
+            )
+            mock_summary.find_one = AsyncMock(return_value=None)
+
+            result = await get_seller_analytics("Shop")
+
+        assert result["stats"]["revenue"] == 0
+        assert result["recent_sales"] == []
+
+
+class TestStampedSellers:
+    def test_stamped_items_skip_product_lookup(self, order):
+        for item in order.items:
+            item.seller_id, item.category = "Shop", "Outerwear"
+
+        rollups, _ = rollup_operations(order, {})
+
+        assert [op._filter["_id"] for op in rollups] == ["Shop:2026-03-14:Outerwear"]
+        assert rollups[0]._doc["$inc"]["quantity"] == 4
+
+    @pytest.mark.asyncio
+    async def test_backfill_stamps_unstamped_items(self):
+        batch = [{"_id": "o1", "items": [
+            {"product_id": "p1", "seller_id": "Shop", "category": "Outerwear"},
+            {"product_id": "p3"},
+        ]}]
+        with patch("src.migrations.backfill_order_sellers.orders") as mock_orders, \
+             patch("src.migrations.backfill_order_sellers.product_sellers",
+                   AsyncMock(return_value={"p3": PRODUCTS["p3"]})) as lookup:
+            mock_orders.find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=batch)
+            mock_orders.bulk_write = AsyncMock(return_value=MagicMock(modified_count=1))
+
+            updated, last_id = await backfill_batch()
+
+        assert (updated, last_id) == (1, "o1")
+        assert lookup.call_args.args[0] == ["p3"]
+        items = mock_orders.bulk_write.call_args.args[0][0]._doc["$set"]["items"]
+        assert items[1] == {"product_id": "p3", "seller_id": "Other", "category": "Accessories"}
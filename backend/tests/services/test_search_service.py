@@ -0,0 +1,83 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+from fastapi import HTTPException
+from src.services.search_service import search_products, format_price_buckets, OPEN_PRICE_BUCKET
+
+"""Test suite for product search"""
+
+
+def mock_aggregate(mock_products, facets):
+    mock_products.aggregate.return_value.to_list = AsyncMock(return_value=facets)
+
+
+@pytest.mark.asyncio
+class TestSearchProducts:
+
+    async def test_text_search_pipeline(self):
+        facets = [{
+            "results": [{"_id": "p1", "product_name": "Denim Jacket", "score": 1.5}],
+            "total": [{"count": 31}],
+            "categories": [{"_id": "Jackets", "count": 20}, {"_id": "Shirts", "count": 11}],
+            "price_ranges": [{"_id": 25, "count": 31}],
+        }]
+        with patch("src.services.search_service.product_collection") as mock_products:
+            mock_aggregate(mock_products, facets)
+
+            response = await search_products(q="denim", page=2, limit=10)
+
+        pipeline = mock_products.aggregate.call_args.args[0]
+        assert pipeline[0]["$match"]["$text"] == {"$search": "denim"}
+        assert pipeline[1] == {"$addFields": {"score": {"$meta": "textScore"}}}
+        results = pipeline[2]["$facet"]["results"]
+        assert results[:3] == [{"$sort": {"score": -1, "_id": -1}}, {"$skip": 10}, {"$limit": 10}]
+        assert results[3]["$project"]["score"] == 1
+
+        assert response["total"] == 31
+        assert response["results"][0]["_id"] == "p1"
+        assert response["facets"]["categories"][0] == {"category": "Jackets", "count": 20}
+        assert response["facets"]["price_ranges"] == [{"min": 25, "max": 50, "count": 31}]
+
+    async def test_category_counts_ignore_selected_category(self):
+        with patch("src.services.search_service.product_collection") as mock_products:
+            mock_aggregate(mock_products, [])
+
+            await search_products(category="Jackets")
+
+        pipeline = mock_products.aggregate.call_args.args[0]
+        assert "category" not in pipeline[0]["$match"]
+        facet = pipeline[1]["$facet"]
+        for branch in ("results", "total", "price_ranges"):
+            assert facet[branch][0] == {"$match": {"category": "Jackets"}}
+        assert facet["categories"][0]["$group"]["_id"] == "$category"
+
+    async def test_empty_results_default_total_to_zero(self):
+        with patch("src.services.search_service.product_collection") as mock_products:
+            mock_aggregate(mock_products, [{"results": [], "total": [], "categories": [], "price_ranges": []}])
+
+            response = await search_products(q="nothing")
+
+        assert response["results"] == []
+        assert response["total"] == 0
+        assert response["facets"] == {"categories": [], "price_ranges": []}
+
+    async def test_inverted_price_range_is_rejected(self):
+        with pytest.raises(HTTPException) as exc_info:
+            await search_products(min_price=50, max_price=10)
+
+        assert exc_info.value.status_code == 400
+
+
+class TestPriceBuckets:
+
+    def test_open_ended_bucket_has_no_max(self):
+        ranges = format_price_buckets([
+            {"_id": 0, "count": 4},
+            {"_id": 200, "count": 2},
+            {"_id": OPEN_PRICE_BUCKET, "count": 1},
+        ])
+
+        assert ranges == [
+            {"min": 0, "max": 25, "count": 4},
+            {"min": 200, "max": 500, "count": 2},
+            {"min": 500, "max": None, "count": 1},
+        ]
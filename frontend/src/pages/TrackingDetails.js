@@ -38,22 +38,18 @@ const TrackingDetails = () => {
 
         fetchOrderDetails();
 
-        // Set up polling for status updates
-        const interval = setInterval(async () => {
-            if (order && !['delivered', 'cancelled', 'returned'].includes(order.status)) {
-                try {
-                    const response = await axios.put(`http://localhost:8000/orders/${orderId}/status`, {
-                        status: order.status // Backend will calculate the correct status based on time
-                    });
-                    setOrder(response.data);
-                } catch (error) {
-                    console.error('Error updating status:', error);
-                }
+        // The backend pushes tracking updates as the order advances
+        const events = new EventSource(`http://localhost:8000/orders/${orderId}/events`);
+        events.addEventListener('order', (event) => {
+            const update = JSON.parse(event.data);
+            setOrder((current) => (current ? { ...current, ...update } : current));
+            if (['cancelled', 'returned'].includes(update.status)) {
+                events.close();
             }
-        }, 30000); // Poll every 30 seconds
+        });
 
-        return () => clearInterval(interval);
-    }, [orderId, order?.status]);
+        return () => events.close();
+    }, [orderId]);
 
     const handleBack = () => {
         navigate('/vieworders');